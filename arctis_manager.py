@@ -1,22 +1,17 @@
 import logging
-import os
 import signal
 import sys
 from typing import Coroutine, Literal
 
-from arctis_manager.dbus_manager import DBusManager
+from arctis_manager.notification_client import NotificationClient
 from arctis_manager.translations import Translations
 
 # Setup the notify logging
 NOTIFY = 19  # Right before "INFO"
-notify_enabled = os.system('which notify-send 1>/dev/null 2>&1') == 0
 
 
 def logging_notify(self: logging.Logger, summary: str, message: str, urgency: Literal['low', 'normal', 'critical'] = 'normal', *args, **kwargs):
-    if notify_enabled:
-        args = ['--app-name="Arctis Manager"', f'--urgency={urgency}', '--expire-time=2000']
-        os.system(f'notify-send {' '.join(args)} "{summary}" "{message.format(*args, **kwargs).replace('"', '\\"')}"')
-    else:
+    if not NotificationClient.get_instance().notify(summary, message.format(*args, **kwargs), urgency):
         self._log(logging.INFO, f'NOTIFICATION: {summary} :: {message}', args, **kwargs)
 
 
@@ -28,25 +23,39 @@ if __name__ == '__main__':
     import asyncio
     from argparse import ArgumentParser
 
-    from PyQt6.QtWidgets import QApplication
-    from qasync import QEventLoop
-
     from arctis_manager.arctis_manager_daemon import ArctisManagerDaemon
-    from arctis_manager.systray_app import SystrayApp
 
     args = ArgumentParser()
     args.add_argument('-v', '--verbose', action='count', default=0)
-    args.add_argument('--daemon-only', action='store_true')
+    args.add_argument('--daemon-only', action='store_true',
+                      help='run headless, without the systray app and the D-Bus service (Qt is not loaded)')
+    args.add_argument('--volume-dead-zone', type=int, default=1, metavar='PERCENT',
+                      help='ignore ChatMix volume changes smaller than or equal to PERCENT (default: 1)')
+    args.add_argument('--no-hotplug', action='store_true',
+                      help='do not wait for the device to be plugged in: exit if it is not connected at startup, or when it is removed')
     args = args.parse_args()
 
     logging.basicConfig(level=logging.CRITICAL, format='%(name)20s %(levelname)8s | %(message)s')
 
-    # Initialize the QApplication here due to the asyncio loop (the app needs to run in the main thread)
-    app = QApplication(sys.argv)
+    if args.daemon_only:
+        # Plain asyncio event loop: the GUI toolkit is never imported
+        event_loop = asyncio.new_event_loop()
+    else:
+        from PyQt6.QtWidgets import QApplication
+        from qasync import QEventLoop
+
+        from arctis_manager.dbus_manager import DBusManager
+        from arctis_manager.systray_app import SystrayApp
+
+        # Initialize the QApplication here due to the asyncio loop (the app needs to run in the main thread)
+        app = QApplication(sys.argv)
+        event_loop = QEventLoop(app)
+
+    asyncio.set_event_loop(event_loop)
 
     log_level = logging.DEBUG if args.verbose else NOTIFY
 
-    daemon = ArctisManagerDaemon(log_level=log_level)
+    daemon = ArctisManagerDaemon(log_level=log_level, volume_dead_zone=args.volume_dead_zone, hotplug=not args.no_hotplug)
     if not args.daemon_only:
         systray_app = SystrayApp(app=app, log_level=log_level)
         dbus_manager = DBusManager(systray_app)
@@ -55,22 +64,32 @@ if __name__ == '__main__':
     i18n = Translations.get_instance(log_level=log_level)
 
     def sigterm_handler(sig=None, frame=None):
+        # The daemon calls shutdown_handler once its cleanup is complete
         daemon.stop()
+
+    def shutdown_handler():
         if not args.daemon_only:
             systray_app.stop()
             dbus_manager.stop()
+        else:
+            event_loop.stop()
 
         i18n.debug_hit_cache()
 
-    signal.signal(signal.SIGINT, sigterm_handler)
-    signal.signal(signal.SIGTERM, sigterm_handler)
+    if args.daemon_only:
+        event_loop.add_signal_handler(signal.SIGINT, sigterm_handler)
+        event_loop.add_signal_handler(signal.SIGTERM, sigterm_handler)
+    else:
+        signal.signal(signal.SIGINT, sigterm_handler)
+        signal.signal(signal.SIGTERM, sigterm_handler)
 
     if not args.daemon_only:
-        daemon.register_device_change_callback(systray_app.on_device_status_update)
-    daemon.register_shutdown_callback(sigterm_handler)
-
-    event_loop = QEventLoop(app)
-    asyncio.set_event_loop(event_loop)
+        daemon.register_device_status_field_callback(systray_app.on_device_status_update)
+        daemon.register_device_status_field_callback(dbus_manager.on_device_status_change, DBusManager.STATUS_FIELDS)
+        daemon.register_device_attach_callback(dbus_manager.on_device_attach)
+        daemon.register_device_detach_callback(systray_app.on_device_detach)
+        daemon.register_device_detach_callback(dbus_manager.on_device_detach)
+    daemon.register_shutdown_callback(shutdown_handler)
 
     async def async_exception(coro: Coroutine, logger: logging.Logger = logging.getLogger('ArctisManager')):
         try:
@@ -84,5 +103,11 @@ if __name__ == '__main__':
         asyncio.ensure_future(async_exception(dbus_manager.start(), dbus_manager.log))
     asyncio.ensure_future(async_exception(daemon.start('1.6.2'), daemon.log))
 
-    with event_loop:
-        event_loop.run_forever()
+    if args.daemon_only:
+        try:
+            event_loop.run_forever()
+        finally:
+            event_loop.close()
+    else:
+        with event_loop:
+            event_loop.run_forever()
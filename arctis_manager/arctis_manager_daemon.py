@@ -1,178 +1,102 @@
-from arctis_manager.device_manager import DeviceManager, DeviceStatus, InterfaceEndpoint
-from typing import Callable
+from arctis_manager.command_runner import CommandRunner
+from arctis_manager.device_manager import DeviceManager, DeviceStatus
+from arctis_manager.device_registry import DeviceEntry, load_registry
+from arctis_manager.device_session import DeviceSession
+from arctis_manager.notification_client import NotificationClient
+from arctis_manager.pulse_client import PulseClient
+from arctis_manager.sink_cache import SinkCache
+from arctis_manager.status_diff import StatusChangeCallback, StatusDiffEngine
+from arctis_manager.usb_discovery import find_devices
+from arctis_manager.usb_hotplug_monitor import UsbHotplugEvent, UsbHotplugMonitor
+from arctis_manager.volume_change_filter import DEFAULT_DEAD_ZONE_PERCENT
+from typing import Callable, Iterable, Optional
 import asyncio
-import inspect
+import errno
 import logging
-import os
-import pkgutil
-import re
-import subprocess
 import sys
 import usb.core
-import arctis_manager.devices
 
-DEV_PA_NODES = {
-    'game': 'Arctis_Game',
-    'chat': 'Arctis_Chat'
-}
-DONGLE_REFRESH_SECONDS = 5
-DEFAULT_SINK = DEV_PA_NODES['game']
+# udev applies the device node's permissions shortly after the kernel's add event
+ATTACH_RETRIES = 10
+ATTACH_RETRY_DELAY_SECONDS = 0.2
 
 
 class ArctisManagerDaemon:
     log: logging.Logger
+    log_level: int
 
-    device: usb.core.Device
+    '''Supported devices, by (vendor ID, product ID)'''
+    device_managers: dict[tuple[int, int], DeviceEntry]
+    '''Sessions of the attached devices, by USB (bus, address)'''
+    sessions: dict[tuple[int, int], DeviceSession]
 
-    device_manager: DeviceManager
-    device_managers: list[DeviceManager]
-
-    previous_sink: str
+    command_runner: CommandRunner
+    pulse_client: PulseClient
+    sink_cache: SinkCache
+    hotplug_monitor: Optional[UsbHotplugMonitor]
+    status_diff: StatusDiffEngine
 
     device_status_callbacks: list[Callable[[DeviceManager, DeviceStatus], None]]
+    device_attach_callbacks: list[Callable[[DeviceManager], None]]
+    device_detach_callbacks: list[Callable[[DeviceManager], None]]
     shutdown_callbacks: list[Callable[[], None]]
 
     _shutdown: bool
     _shutting_down: bool
 
-    def __init__(self, log_level: int = logging.INFO):
+    def __init__(self, log_level: int = logging.INFO, volume_dead_zone: int = DEFAULT_DEAD_ZONE_PERCENT, hotplug: bool = True):
         self.setup_logger(log_level)
+        self.log_level = log_level
+        self.volume_dead_zone = volume_dead_zone
 
-        self.device = None
+        self.device_managers = {}
+        self.sessions = {}
 
-        self.device_manager = None
-        self.device_managers = []
+        self.command_runner = CommandRunner.get_instance(log_level=log_level)
+        self.pulse_client = PulseClient(log_level=log_level)
+        self.sink_cache = SinkCache(self.pulse_client, log_level=log_level)
+        self.pulse_client.register_connect_callback(self._on_pulse_client_connect)
+        self.hotplug_monitor = UsbHotplugMonitor(self.on_hotplug_event, log_level=log_level) if hotplug else None
+        self.status_diff = StatusDiffEngine(log_level=log_level)
 
         self.device_status_callbacks = []
+        self.device_attach_callbacks = []
+        self.device_detach_callbacks = []
         self.shutdown_callbacks = []
 
         self._shutdown = False
         self._shutting_down = False
+        self._attaching: set[tuple[int, int]] = set()
 
     def setup_logger(self, log_level: int):
         self.log = logging.getLogger('Daemon')
         self.log.setLevel(log_level)
 
     def load_device_managers(self):
-        registered_devices = []
-
-        # Dynamically instantiate the device managers
-        for _, name, _ in pkgutil.iter_modules(arctis_manager.devices.__path__):
-            module = __import__(f'arctis_manager.devices.{name}', fromlist=[name])
-            for _, cls in inspect.getmembers(module, inspect.isclass):
-                if issubclass(cls, DeviceManager) and cls is not DeviceManager:
-                    device_manager = cls()
-                    if device_manager.get_device_name() not in registered_devices:
-                        self.register_device(cls())
-                        registered_devices.append(device_manager.get_device_name())
-
-    def register_device(self, device: DeviceManager):
-        if next((
-            d for d in self.device_managers
-            if d.get_device_product_id() == device.get_device_product_id()
-            and d.get_device_vendor_id() == device.get_device_vendor_id()
-        ), None) is None:
-            self.log.info(f'Registering device "{device.get_device_name()}"')
-            self.device_managers.append(device)
-
-    def cleanup_pulseaudio_nodes(self):
-        # Blindly try to cleanup dirty nodes by removing the ones we're going to create
-        self.log.debug('Cleaning up PulseAudio nodes.')
-        try:
-            for node in DEV_PA_NODES.values():
-                os.system(f'pw-cli destroy {node} 1>/dev/null 2>&1')
-        finally:
-            pass
+        # The device managers' modules are imported when a device is attached (see DeviceEntry.load)
+        for device in load_registry(self.log).values():
+            self.register_device(device)
 
-    def register_pulseaudio_nodes(self) -> None:
-        self.cleanup_pulseaudio_nodes()
-
-        default_sink = None
-
-        self.log.debug('Getting Arctis sink.')
-        try:
-            pactl_short_sinks = os.popen("pactl list short sinks").readlines()
-            # grab any elements from list of pactl sinks that are Arctis
-            arctis = re.compile('.*[aA]rctis.*')
-            arctis_sink = list(filter(arctis.match, pactl_short_sinks))[0]
-
-            # split the arctis line on tabs (which form table given by 'pactl short sinks')
-            tabs_pattern = re.compile(r'\t')
-            tabs_re = re.split(tabs_pattern, arctis_sink)
-
-            # skip first element of tabs_re (sink's ID which is not persistent)
-            arctis_device = tabs_re[1]
-            self.log.debug(f"Arctis sink identified as {arctis_device}")
-            default_sink = arctis_device
-        except Exception as e:
-            self.log.error('Failed to get default sink.', exc_info=True)
-            sys.exit(102)
-
-        # Create the game and chat nodes
-        self.log.info('Creating PulseAudio Audio/Sink nodes.')
-        try:
-            for node_tag, node_name in DEV_PA_NODES.items():
-                os.system(f"""pw-cli create-node adapter '{{
-                    factory.name=support.null-audio-sink
-                    node.name={node_name}
-                    node.description="{self.device_manager.get_device_name()} {node_tag.title()}"
-                    media.class=Audio/Sink
-                    monitor.channel-volumes=true
-                    object.linger=true
-                    audio.position=[{' '.join([p.value for p in self.device_manager.get_audio_position()])}]
-                    }}' 1>/dev/null
-                """)
-        except Exception as e:
-            self.log.error('Failed to create PulseAudio nodes.', exc_info=True)
-            sys.exit(103)
-
-        self.log.info('Setting PulseAudio channel links.')
-        for node in DEV_PA_NODES.values():
-            try:
-                for position in self.device_manager.get_audio_position():
-                    pos_name = position.value
-                    self.log.debug(f'Setting "{node}:monitor_{pos_name}" > "{default_sink}:playback_{pos_name}"')
-                    os.system(f'pw-link "{node}:monitor_{pos_name}" "{default_sink}:playback_{pos_name}" 1>/dev/null')
-            except Exception as e:
-                self.log.error(f'Failed to set {node}\'s audio positions.', exc_info=True)
-                sys.exit(104)
-
-    def set_default_audio_sink(self) -> None:
-        self.log.info(f'Setting PulseAudio\'s default sink to {DEFAULT_SINK}.')
-        self.previous_sink = subprocess.check_output(['pactl', 'get-default-sink']).decode('utf-8').strip()
-        self.set_pa_audio_sink(DEFAULT_SINK)
+    def register_device(self, device: DeviceEntry):
+        device_id = (device.vendor_id, device.product_id)
+        if device_id not in self.device_managers:
+            self.log.info(f'Registering device "{device.name}"')
+            self.device_managers[device_id] = device
 
     def get_pa_default_sink_description(self) -> str:
-        default_sink_name = subprocess.check_output(['pactl', 'get-default-sink']).decode('utf-8').strip()
-
-        env = os.environ
-        env = dict(env, **{'LANG': 'en_US'})
-        pactl_list_sinks = iter(subprocess.check_output(['pactl', 'list', 'sinks'], env=env).decode('utf-8').strip().split('\n'))
-
-        while next(pactl_list_sinks).strip() != f'Name: {default_sink_name}':
-            continue
-
-        for line in pactl_list_sinks:
-            line = line.strip()
-            if line.startswith('Description: '):
-                return line[len('Description: '):].strip()
-
-        return 'Unknown'
-
-    def set_pa_audio_sink(self, sink: str) -> None:
-        os.system(f'pactl set-default-sink {sink}')
+        return self.sink_cache.get_default_sink_description()
 
-        self.log.notify('Audio sink manager', f'Default audio sink set to "{self.get_pa_default_sink_description()}".')
+    def get_device_entry(self, vendor_id: int, product_id: int) -> Optional[DeviceEntry]:
+        return self.device_managers.get((vendor_id, product_id), None)
 
     async def start(self, version):
         """
         Start the Arctis Manager daemon.
 
-        This method initializes and starts the daemon service by registering
-        supported devices, identifying a compatible Arctis device, initializing
-        the device, and registering PulseAudio nodes. It sets the default audio
-        sink and begins listening to USB endpoints for device input data. The
-        method runs an asynchronous loop to manage these tasks concurrently.
+        This method registers the supported devices, connects to the audio server and starts listening to the USB
+        hotplug events. A device session is started for each compatible Arctis device already connected (see
+        DeviceSession), and for the ones plugged in afterwards. Without hotplug support, the daemon exits when no
+        device is found.
 
         Args:
             version (str): The version of the service to be logged during startup.
@@ -188,124 +112,179 @@ class ArctisManagerDaemon:
         self.log.info('Registering supported devices.')
         self.load_device_managers()
 
-        # Identify the (first) compatible device
-        self.log.debug('Identifying Arctis device.')
-        for manager in self.device_managers:
+        if self.hotplug_monitor is not None:
             try:
-                self.device = usb.core.find(idVendor=manager.get_device_vendor_id(), idProduct=manager.get_device_product_id())
-                if self.device is not None:
-                    self.device_manager = manager
-                    # very important, otherwise the manager won't be able to communicate to the device at init stage
-                    self.device_manager.set_device(self.device)
-                    # Detach the kernel drivers for the interfaces we need to access in I/O (otherwise the interface will be busy and we'll not be able to read/write into them)
-                    self.device_manager.kernel_detach()
-                    self.log.info(f'Identified device: {self.device_manager.get_device_name()}.')
-                    break
-            except Exception as e:
-                self.log.error(f'Failed to identify device: {manager.get_device_name()} ({e}).')
-                self.device = None
+                self.hotplug_monitor.start()
+            except OSError as e:
+                self.log.warning(f'USB hotplug events are not available ({e}): the device must be connected at startup.')
+                self.hotplug_monitor = None
 
-        if self.device is None:
-            self.log.error(f'''Failed to identify the Arctis device. Please ensure it is connected.
-                           Compatible devices are: {', '.join([d.get_device_name() for d in self.device_managers])}''')
+        # Identify the compatible devices
+        self.log.debug('Identifying Arctis devices.')
+        try:
+            devices = find_devices(self.device_managers, self.log)
+        except Exception as e:
+            self.log.error(f'Failed to identify devices ({e}).')
+            devices = []
 
-            sys.exit(101)
+        if not devices:
+            message = f'''Failed to identify the Arctis device. Please ensure it is connected.
+                           Compatible devices are: {', '.join([d.name for d in self.device_managers.values()])}'''
+            if self.hotplug_monitor is None:
+                self.log.error(message)
+                sys.exit(101)
 
-        self.log.debug('Initializing device.')
-        for interface_endpoint in self.device_manager.get_endpoint_addresses_to_listen():
-            self.device_manager.kernel_detach(interface_endpoint)
-        self.device_manager.init_device()
+            self.log.warning(message)
+            self.log.info('Waiting for a device to be connected.')
 
-        self.log.info('Registering PulseAudio nodes.')
-        self.register_pulseaudio_nodes()
+        await self.pulse_client.start()
 
-        self.set_default_audio_sink()
+        for entry, device in devices:
+            if not self._shutdown and (device.bus, device.address) not in self.sessions:
+                self.attach(entry, device)
 
-        async with asyncio.TaskGroup() as tg:
-            for interface_endpoint in self.device_manager.get_endpoint_addresses_to_listen():
-                interface = interface_endpoint.interface
-                endpoint = interface_endpoint.endpoint
+    def attach(self, entry: DeviceEntry, device: usb.core.Device) -> None:
+        '''
+        Start a device session, with a new instance of the device's manager and the first free audio nodes slot.
+        '''
 
-                self.log.info(f"Starting to listen on device's {interface:02d}.{endpoint:02d}.")
-                tg.create_task(self.listen_usb_endpoint(interface_endpoint))
+        self.log.info(f'Identified device: {entry.name} (bus {device.bus:03d}, address {device.address:03d}).')
 
-            tg.create_task(self.request_headset_state_loop())
+        slots = set(session.slot for session in self.sessions.values())
+        slot = next(slot for slot in range(len(slots) + 1) if slot not in slots)
 
-            self.log.debug('Starting main loop.')
+        session = DeviceSession(
+            device, entry.load()(log_level=self.log_level), slot, self.pulse_client, self.sink_cache,
+            status_callback=self._on_device_status,
+            disconnect_callback=self._on_device_disconnect,
+            error_callback=self._on_device_error,
+            log_level=self.log_level, volume_dead_zone=self.volume_dead_zone,
+        )
+        self.sessions[(device.bus, device.address)] = session
+        session.start()
 
-    @staticmethod
-    def _normalize_audio(volume, mix):
-        return int(round((volume * mix) * 100, 0))
+        for callback in self.device_attach_callbacks:
+            callback(session.device_manager)
 
-    async def listen_usb_endpoint(self, interface_endpoint: InterfaceEndpoint) -> None:
-        try:
-            # interface index of the USB HID for the ChatMix dial might differ from the interface number on the device itself
-            self.interface: usb.core.Interface = self.device[0].interfaces()[interface_endpoint.interface]
-            self.interface_num = self.interface.bInterfaceNumber
-            self.endpoint = self.interface.endpoints()[interface_endpoint.endpoint]
-            self.addr = self.endpoint.bEndpointAddress
-        except Exception:
-            self.log.error(f'Unable to find interface {interface_endpoint.interface} / endpoint {interface_endpoint.endpoint}.', exc_info=True)
-            self.die_gracefully(error_phase="identification of USB endpoint")
+    async def detach(self, session: DeviceSession, notify: bool = True) -> None:
+        key = (session.device.bus, session.device.address)
+        if self.sessions.get(key, None) is not session:
+            return
 
-        while not self._shutdown:
-            try:
-                read_input = await asyncio.to_thread(self.device.read, self.addr, 64)
-                device_state = self.device_manager.manage_input_data(read_input, interface_endpoint)
-
-                # These lines probably should be collapsed on a single 'for' loop
-                default_device_volume = "{}%".format(self._normalize_audio(device_state.game_volume, device_state.game_mix))
-                virtual_device_volume = "{}%".format(self._normalize_audio(device_state.chat_volume, device_state.chat_mix))
-
-                os.system(f'pactl set-sink-volume {DEV_PA_NODES['game']} {default_device_volume}')
-                os.system(f'pactl set-sink-volume {DEV_PA_NODES['chat']} {virtual_device_volume}')
-
-                # Propagate the device status to any registered listener
-                if device_state.device_status is not None:
-                    for callback in self.device_status_callbacks:
-                        callback(self.device_manager, device_state.device_status)
-
-            except Exception as e:
-                if not isinstance(e, usb.core.USBTimeoutError):
-                    if isinstance(e, usb.core.USBError) and e.errno == 19:  # device not found
-                        self.die_gracefully()
-                    else:
-                        self.log.error(f'Failed to manage input data.', exc_info=True)
-                        self.die_gracefully(error_phase="USB input management")
-
-    async def request_headset_state_loop(self) -> None:
+        del self.sessions[key]
+        if notify:
+            self.log.notify('Device disconnected', f'{session.device_manager.get_device_name()} has been disconnected.', urgency='low')
+        await session.close()
+        self.status_diff.forget(session.device_manager)
+
+        for callback in self.device_detach_callbacks:
+            callback(session.device_manager)
+
+    def on_hotplug_event(self, event: UsbHotplugEvent) -> None:
+        if self._shutdown:
+            return
+
+        key = (event.bus, event.address)
+        if event.action == 'remove':
+            if key in self.sessions:
+                asyncio.get_running_loop().create_task(self.detach(self.sessions[key]))
+            return
+
+        entry = self.get_device_entry(event.vendor_id, event.product_id)
+        if entry is None or key in self.sessions or key in self._attaching:
+            return
+
+        asyncio.get_running_loop().create_task(self._attach_when_accessible(entry, event))
+
+    async def _attach_when_accessible(self, entry: DeviceEntry, event: UsbHotplugEvent) -> None:
         '''
-        Send the headset status request, if configured by the device manager.
-        Otherwise exit immediately and do nothing.
-        It is expected to read the response from the device in the device manager's manage_input_data function.
+        Attach the plugged device, once it can be opened: the add event is received before udev applies the device's rules.
         '''
 
-        interface_endpoint, message = self.device_manager.get_request_device_status()
-        if interface_endpoint is None or message is None:
+        key = (event.bus, event.address)
+        self._attaching.add(key)
+        try:
+            for _ in range(ATTACH_RETRIES):
+                await asyncio.sleep(ATTACH_RETRY_DELAY_SECONDS)
+                if self._shutdown or key in self.sessions:
+                    return
+
+                try:
+                    device = usb.core.find(idVendor=event.vendor_id, idProduct=event.product_id, bus=event.bus, address=event.address)
+                    if device is None:
+                        # Unplugged in the meantime
+                        return
+                    # Fails with EACCES until the permissions are set
+                    device._ctx.managed_open()
+                except usb.core.USBError as e:
+                    if e.errno != errno.EACCES:
+                        self.log.error(f'Failed to open device: {entry.name} ({e}).')
+                        return
+                    continue
+
+                self.attach(entry, device)
+                return
+
+            self.log.error(f'Failed to open device: {entry.name} (permission denied, are the udev rules installed?).')
+        finally:
+            self._attaching.discard(key)
+
+    def _on_device_status(self, device_manager: DeviceManager, status: DeviceStatus) -> None:
+        # The field subscribers are notified by the diff engine
+        if not self.status_diff.update(device_manager, status):
             return
 
-        commands_endpoint_address = self.device[0] \
-            .interfaces()[interface_endpoint.interface] \
-            .endpoints()[interface_endpoint.endpoint] \
-            .bEndpointAddress
+        for callback in self.device_status_callbacks:
+            callback(device_manager, status)
 
-        self.device_manager.kernel_detach(interface_endpoint)
+    def _on_device_disconnect(self, session: DeviceSession) -> None:
+        if self.hotplug_monitor is None and len(self.sessions) <= 1:
+            self.die_gracefully()
+        else:
+            asyncio.get_running_loop().create_task(self.detach(session))
 
-        while not self._shutdown:
-            try:
-                self.device.write(commands_endpoint_address, message)
-                await asyncio.sleep(DONGLE_REFRESH_SECONDS)
-            except Exception as e:
-                if not isinstance(e, usb.core.USBTimeoutError):
-                    if isinstance(e, usb.core.USBError) and e.errno == 19:  # device not found
-                        self.die_gracefully()
-                    else:
-                        self.log.error(f'Failed to request device status.', exc_info=True)
-                        self.die_gracefully(error_phase="USB status request")
+    def _on_device_error(self, session: DeviceSession, error_phase: str) -> None:
+        '''
+        A failing session is closed without affecting the other devices' ones.
+        '''
+
+        if self.hotplug_monitor is None and len(self.sessions) <= 1:
+            self.die_gracefully(error_phase=error_phase)
+            return
+
+        self.log.error(f'Closing the {session.device_manager.get_device_name()} session due to error in: {error_phase}')
+        self.log.notify('Device error', f'{session.device_manager.get_device_name()}: error in {error_phase}', urgency='critical')
+        asyncio.get_running_loop().create_task(self.detach(session, notify=False))
+
+    async def _on_pulse_client_connect(self, _: PulseClient) -> None:
+        for session in self.sessions.values():
+            session.on_pulse_client_connect()
 
     def register_device_change_callback(self, callback: Callable[[DeviceManager, DeviceStatus], None]) -> None:
+        '''
+        Register a function receiving the whole status of a device, each time any of its fields changes.
+        '''
         self.device_status_callbacks.append(callback)
 
+    def register_device_status_field_callback(self, callback: StatusChangeCallback, fields: Optional[Iterable[str]] = None) -> None:
+        '''
+        Register a function receiving the changes of the given DeviceStatus fields (by default, of all of them), with the device's
+        new status. It's only called when any of these fields changes; a device's first status changes all the fields.
+        '''
+        self.status_diff.subscribe(callback, fields)
+
+    def register_device_attach_callback(self, callback: Callable[[DeviceManager], None]) -> None:
+        '''
+        Register a function receiving the device manager of each attached device, before its first status.
+        '''
+        self.device_attach_callbacks.append(callback)
+
+    def register_device_detach_callback(self, callback: Callable[[DeviceManager], None]) -> None:
+        '''
+        Register a function receiving the device manager of each detached device (its status callbacks won't be called anymore).
+        '''
+        self.device_detach_callbacks.append(callback)
+
     def register_shutdown_callback(self, callback: Callable[[], None]) -> None:
         self.shutdown_callbacks.append(callback)
 
@@ -323,21 +302,41 @@ class ArctisManagerDaemon:
             return
 
         self._shutting_down = True
-        self._die_gracefully_actuator(error_phase)
 
-    def _die_gracefully_actuator(self, error_phase: str) -> None:
+        self.log.debug('Setting shutdown flag.')
+        self._shutdown = True
+        if self.hotplug_monitor is not None:
+            self.hotplug_monitor.stop()
+
+        # The cleanup runs its commands asynchronously: the shutdown callbacks are called once it's done
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self._die_gracefully_actuator(error_phase))
+            return
+
+        self._shutdown_task = loop.create_task(self._die_gracefully_actuator(error_phase))
+
+    async def _die_gracefully_actuator(self, error_phase: str) -> None:
         if error_phase:
             self.log.error(f'Shutting down due to error in: {error_phase}')
             self.log.notify('Critical error', f'Shutting down due to error in: {error_phase}', urgency='critical')
         else:
             self.log.notify('Shutdown event', 'Service is shutting down.', urgency='low')
 
-        self.log.debug('Setting shutdown flag.')
-        self._shutdown = True
-        self.log.info('Removing PulseAudio nodes.')
-        self.cleanup_pulseaudio_nodes()
+        sessions = list(self.sessions.values())
+        self.sessions.clear()
+        await asyncio.gather(*[session.close() for session in sessions])
+
+        try:
+            # The sessions are closed: the audio server connection isn't used anymore
+            await self.pulse_client.close()
+            await NotificationClient.get_instance().drain()
+        except Exception:
+            self.log.error('Failed to clean up.', exc_info=True)
 
-        self.log.notify('Audio sink manager', f'Default audio sink set to "{self.get_pa_default_sink_description()}".')
+        for command, stats in self.command_runner.get_stats().items():
+            self.log.debug(f'Command "{command}": {stats}')
 
         self.log.info('------------------------------')
         self.log.info('- Arctis Manager is stopped. -')
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+DEFAULT_TIMEOUT_SECONDS = 5
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Commands are grouped in stats by executable and subcommand (e.g. "pw-cli create-node"), if any
+SUBCOMMAND_PATTERN = re.compile(r'^[a-z][a-z-]*$')
+
+
+@dataclass(frozen=True)
+class CommandResult:
+    args: tuple[str, ...]
+    '''Exit code of the command, None if it was killed after the timeout'''
+    returncode: Optional[int]
+    stdout: str
+    duration: float
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+@dataclass
+class CommandStats:
+    count: int = field(default=0)
+    failures: int = field(default=0)
+    timeouts: int = field(default=0)
+    total_seconds: float = field(default=0.0)
+    max_seconds: float = field(default=0.0)
+
+    def __str__(self) -> str:
+        average = self.total_seconds / self.count if self.count else 0
+
+        return f'{self.count} runs, {self.failures} failed, {self.timeouts} timed out, avg {average * 1000:.1f}ms, max {self.max_seconds * 1000:.1f}ms'
+
+
+class CommandRunner:
+    '''
+    Runs external commands (argument lists, never through a shell) without blocking the event loop.
+    The number of concurrent processes is bounded, every command has a timeout and the latency of each command is tracked.
+    '''
+
+    log: logging.Logger
+
+    max_concurrency: int
+    default_timeout: float
+
+    stats: dict[str, CommandStats]
+
+    @staticmethod
+    def get_instance(log_level: int = logging.INFO) -> 'CommandRunner':
+        if not hasattr(CommandRunner, '_instance'):
+            CommandRunner._instance = CommandRunner(log_level=log_level)
+
+        return CommandRunner._instance
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, default_timeout: float = DEFAULT_TIMEOUT_SECONDS, log_level: int = logging.INFO):
+        self.log = logging.getLogger('CommandRunner')
+        self.log.setLevel(log_level)
+
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+
+        self.stats = {}
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, *args: str, timeout: Optional[float] = None) -> CommandResult:
+        '''
+        Run the command, waiting for a free slot first, and return its result.
+        A command still running after the timeout is killed (its result has no exit code).
+        '''
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        timeout = timeout if timeout is not None else self.default_timeout
+
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                process = await asyncio.create_subprocess_exec(*args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                self.log.debug(f'Unable to run {args[0]} ({e}).')
+                return self._record(CommandResult(tuple(args), 127, '', time.monotonic() - start))
+
+            try:
+                stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+                returncode = process.returncode
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                stdout, returncode = b'', None
+
+            return self._record(CommandResult(tuple(args), returncode, stdout.decode('utf-8', errors='replace'), time.monotonic() - start))
+
+    def get_stats(self) -> dict[str, CommandStats]:
+        return dict(self.stats)
+
+    def _record(self, result: CommandResult) -> CommandResult:
+        key = ' '.join(result.args[:2]) if len(result.args) > 1 and SUBCOMMAND_PATTERN.match(result.args[1]) else result.args[0]
+        stats = self.stats.setdefault(key, CommandStats())
+
+        stats.count += 1
+        stats.total_seconds += result.duration
+        stats.max_seconds = max(stats.max_seconds, result.duration)
+        if result.returncode is None:
+            stats.timeouts += 1
+        elif result.returncode != 0:
+            stats.failures += 1
+
+        self.log.debug(f'{key} completed in {result.duration * 1000:.1f}ms (exit code {result.returncode}).')
+
+        return result
@@ -6,6 +6,8 @@ from typing import Optional
 
 class ConfigManager:
     config_path: Path
+    '''Per-session state (cleared at logout / reboot, it only survives daemon restarts), None if XDG_RUNTIME_DIR is not set'''
+    runtime_path: Optional[Path]
 
     @staticmethod
     def get_instance():
@@ -20,6 +22,9 @@ class ConfigManager:
         self.config_path = Path(config_home).joinpath('arctis_manager')
         self.config_path.mkdir(parents=True, exist_ok=True)
 
+        runtime_dir = os.getenv('XDG_RUNTIME_DIR', None)
+        self.runtime_path = Path(runtime_dir).joinpath('arctis_manager') if runtime_dir else None
+
     def get_config(self, vendor_id: int, product_id: int) -> Optional[dict]:
         config_file_path = self.config_path.joinpath(f'device_{hex(vendor_id)[2:]}_{hex(product_id)[2:]}.json')
         if config_file_path.is_file():
@@ -31,3 +36,29 @@ class ConfigManager:
         config_file_path = self.config_path.joinpath(f'device_{hex(vendor_id)[2:]}_{hex(product_id)[2:]}.json')
         with config_file_path.open('w') as f:
             json.dump(config, f)
+
+    def _get_runtime_state_path(self, vendor_id: int, product_id: int, bus: int, address: int) -> Optional[Path]:
+        if self.runtime_path is None:
+            return None
+
+        # USB addresses are assigned on each attach: a re-plugged device doesn't match its previous state
+        return self.runtime_path.joinpath(f'device_{hex(vendor_id)[2:]}_{hex(product_id)[2:]}_{bus}-{address}.json')
+
+    def get_runtime_state(self, vendor_id: int, product_id: int, bus: int, address: int) -> Optional[dict]:
+        state_file_path = self._get_runtime_state_path(vendor_id, product_id, bus, address)
+        if state_file_path is not None and state_file_path.is_file():
+            try:
+                return json.loads(state_file_path.read_text())
+            except (OSError, ValueError):
+                return None
+
+        return None
+
+    def save_runtime_state(self, vendor_id: int, product_id: int, bus: int, address: int, state: dict):
+        state_file_path = self._get_runtime_state_path(vendor_id, product_id, bus, address)
+        if state_file_path is None:
+            return
+
+        state_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with state_file_path.open('w') as f:
+            json.dump(state, f)
@@ -1,16 +1,25 @@
 import asyncio
 import logging
+from typing import TYPE_CHECKING, Optional
 
 from dbus_next.aio import MessageBus
-from dbus_next.service import ServiceInterface, method
+from dbus_next.service import ServiceInterface, method, signal
 
-from arctis_manager.systray_app import SystrayApp
+from arctis_manager.dbus_session import get_session_bus
+from arctis_manager.device_manager import DeviceManager, DeviceStatus
+from arctis_manager.status_diff import StatusFieldChange
+
+if TYPE_CHECKING:
+    from arctis_manager.systray_app import SystrayApp
+
+OBJECT_PATH = '/name/giacomofurlan/ArctisManager'
+DEVICES_OBJECT_PATH = f'{OBJECT_PATH}/Devices'
 
 
 class ArctisManagerInterface(ServiceInterface):
-    systray_app: SystrayApp
+    systray_app: 'SystrayApp'
 
-    def __init__(self, systray_app: SystrayApp):
+    def __init__(self, systray_app: 'SystrayApp'):
         super().__init__('name.giacomofurlan.ArctisManager')
 
         self.systray_app = systray_app
@@ -25,24 +34,104 @@ class ArctisManagerInterface(ServiceInterface):
             return 0
         return int(self.systray_app.last_device_status.headset_battery_charge * 100)
 
+    @signal('HeadsetBatteryChargePercentageChanged')
+    def headset_battery_charge_changed(self, percentage: int) -> "x":
+        return percentage
+
+
+class ArctisManagerDeviceInterface(ServiceInterface):
+    '''
+    One object per attached device, at /name/giacomofurlan/ArctisManager/Devices/<bus>_<address>.
+    '''
+
+    systray_app: 'SystrayApp'
+    device_manager: DeviceManager
+
+    def __init__(self, systray_app: 'SystrayApp', device_manager: DeviceManager):
+        super().__init__('name.giacomofurlan.ArctisManager.Device')
+
+        self.systray_app = systray_app
+        self.device_manager = device_manager
+
+    @method('GetName')
+    def get_name(self) -> "s":
+        return self.device_manager.get_device_name()
+
+    @method('ShowSettings')
+    def show_settings(self):
+        self.systray_app.open_settings_window(self.device_manager)
+
+    @method('GetHeadsetBatteryChargePercentage')
+    def get_headset_battery_charge(self) -> "x":
+        status = self.systray_app.device_statuses.get(self.device_manager, None)
+        if status is None or status.headset_battery_charge is None:
+            return 0
+        return int(status.headset_battery_charge * 100)
+
+    @signal('HeadsetBatteryChargePercentageChanged')
+    def headset_battery_charge_changed(self, percentage: int) -> "x":
+        return percentage
+
 
 class DBusManager:
     log: logging.Logger
-    systray_app: SystrayApp
+    systray_app: 'SystrayApp'
 
-    def __init__(self, systray_app: SystrayApp):
+    bus: Optional[MessageBus]
+    interface: Optional[ArctisManagerInterface]
+
+    '''Device status fields exposed by the D-Bus interfaces'''
+    STATUS_FIELDS = ('headset_battery_charge',)
+
+    def __init__(self, systray_app: 'SystrayApp'):
         self.log = logging.getLogger('DBusManager')
         self.systray_app = systray_app
 
+        self.bus = None
+        self.interface = None
+        self._device_interfaces: dict[DeviceManager, tuple[str, ArctisManagerDeviceInterface]] = {}
+
     async def start(self):
-        bus = await MessageBus().connect()
+        bus = await get_session_bus()
         interface = ArctisManagerInterface(self.systray_app)
-        bus.export('/name/giacomofurlan/ArctisManager', interface)
+        bus.export(OBJECT_PATH, interface)
+        self.interface = interface
+        # Devices attached before the bus connection
+        for path, device_interface in self._device_interfaces.values():
+            bus.export(path, device_interface)
+        self.bus = bus
         await bus.request_name('name.giacomofurlan.ArctisManager')
 
         while not getattr(self, '_stopping', False):
             await asyncio.sleep(1)
 
+    def on_device_attach(self, device_manager: DeviceManager) -> None:
+        path = f'{DEVICES_OBJECT_PATH}/{device_manager.device.bus:03d}_{device_manager.device.address:03d}'
+        device_interface = ArctisManagerDeviceInterface(self.systray_app, device_manager)
+        self._device_interfaces[device_manager] = (path, device_interface)
+        if self.bus is not None:
+            self.bus.export(path, device_interface)
+
+    def on_device_detach(self, device_manager: DeviceManager) -> None:
+        path, _ = self._device_interfaces.pop(device_manager, (None, None))
+        if path is not None and self.bus is not None:
+            self.bus.unexport(path)
+
+    def on_device_status_change(self, device_manager: DeviceManager, status: DeviceStatus, changes: list[StatusFieldChange]) -> None:
+        '''
+        Emit the changed values' signals (see STATUS_FIELDS), on the device's object and, for the first attached device,
+        on the (device agnostic) main object.
+        '''
+
+        percentage = int(status.headset_battery_charge * 100)
+
+        _, device_interface = self._device_interfaces.get(device_manager, (None, None))
+        if device_interface is not None:
+            device_interface.headset_battery_charge_changed(percentage)
+
+        if self.interface is not None and next(iter(self._device_interfaces), None) is device_manager:
+            self.interface.headset_battery_charge_changed(percentage)
+
     def stop(self):
         if hasattr(self, '_stopping') and self._stopping:
             return
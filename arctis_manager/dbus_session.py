@@ -0,0 +1,24 @@
+import asyncio
+from typing import Optional
+
+from dbus_next.aio import MessageBus
+
+_session_bus: Optional[MessageBus] = None
+_session_bus_lock: Optional[asyncio.Lock] = None
+
+
+async def get_session_bus() -> MessageBus:
+    '''
+    Get the application's session bus connection, connecting on first use.
+    '''
+
+    global _session_bus, _session_bus_lock
+
+    if _session_bus_lock is None:
+        _session_bus_lock = asyncio.Lock()
+
+    async with _session_bus_lock:
+        if _session_bus is None or not _session_bus.connected:
+            _session_bus = await MessageBus().connect()
+
+    return _session_bus
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from arctis_manager.device_manager.device_status import DeviceStatus
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DeviceState:
     '''Status of the chat mix'''
 
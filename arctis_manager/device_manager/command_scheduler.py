@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Optional, Sequence
+
+from arctis_manager.device_manager.device_transport import DeviceTransport
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+# Commands are coalesced by endpoint and opcode (report ID + command byte)
+OPCODE_SIZE = 2
+
+
+class CommandPriority(IntEnum):
+    '''Lower values are sent first'''
+
+    INIT = 0
+    USER = 1
+    POLL = 2
+
+
+@dataclass
+class _QueuedCommand:
+    endpoint: InterfaceEndpoint
+    data: Sequence[int]
+    priority: CommandPriority
+    sequence: int
+    '''Time of the first submission (for coalesced commands, the oldest one)'''
+    submitted_at: float
+    coalesce_key: Optional[tuple[InterfaceEndpoint, tuple[int, ...]]]
+    '''Futures of the submissions tracked via send, resolved with the write time'''
+    written: list[asyncio.Future] = field(default_factory=list)
+
+
+@dataclass
+class CommandQueueStats:
+    submitted: int = field(default=0)
+    sent: int = field(default=0)
+    coalesced: int = field(default=0)
+    failed: int = field(default=0)
+    max_depth: int = field(default=0)
+    total_latency: float = field(default=0.0)
+    max_latency: float = field(default=0.0)
+
+    def __str__(self) -> str:
+        average = self.total_latency / self.sent if self.sent else 0
+
+        return f'{self.submitted} submitted, {self.sent} sent, {self.coalesced} coalesced, {self.failed} failed, max depth {self.max_depth}, ' \
+            f'latency avg {average * 1000:.2f}ms, max {self.max_latency * 1000:.2f}ms'
+
+
+class CommandScheduler:
+    '''
+    Single writer of the commands sent to a device: commands are queued and written one at a time by a task on the
+    event loop, initialization commands first, then the user's setting changes, then background polls.
+    A queued command is replaced by a newer one with the same opcode on the same endpoint (e.g. successive mic volume
+    values while a slider moves), so that only the latest value is sent. The replaced command moves to the back of its
+    priority's queue, as if it was just submitted: a command following another one (e.g. the Nova Pro's save after
+    each setting) is still sent after it. Initialization commands are never coalesced, as their sequence matters.
+    '''
+
+    log: logging.Logger
+    transport: DeviceTransport
+
+    stats: CommandQueueStats
+
+    def __init__(self, transport: DeviceTransport, log_level: int = logging.INFO):
+        self.log = logging.getLogger('CommandScheduler')
+        self.log.setLevel(log_level)
+
+        self.transport = transport
+        self.stats = CommandQueueStats()
+
+        self._queue: list[_QueuedCommand] = []
+        self._coalescable: dict[tuple[InterfaceEndpoint, tuple[int, ...]], _QueuedCommand] = {}
+        self._sequence = 0
+        self._closed = False
+
+        self._task: Optional[asyncio.Task] = None
+
+    def get_depth(self) -> int:
+        return len(self._queue)
+
+    def submit(self, endpoint: InterfaceEndpoint, data: Sequence[int], priority: CommandPriority = CommandPriority.USER) -> None:
+        '''
+        Queue the command. The writer task is started on the running event loop if needed.
+        '''
+        self._enqueue(endpoint, data, priority, None)
+
+    def send(self, endpoint: InterfaceEndpoint, data: Sequence[int], priority: CommandPriority = CommandPriority.USER) -> asyncio.Future:
+        '''
+        Queue the command, returning a future resolved with the (monotonic) time it is written at, which must be awaited:
+        it fails if the write fails, or if the scheduler is closed before.
+        '''
+
+        written = asyncio.get_running_loop().create_future()
+        self._enqueue(endpoint, data, priority, written)
+
+        return written
+
+    def _enqueue(self, endpoint: InterfaceEndpoint, data: Sequence[int], priority: CommandPriority, written: Optional[asyncio.Future]) -> None:
+        if self._closed:
+            self.log.debug(f'Dropping command {list(data[:OPCODE_SIZE])}: the scheduler is closed.')
+            if written is not None:
+                written.cancel()
+            return
+
+        self.stats.submitted += 1
+
+        coalesce_key = (endpoint, tuple(data[:OPCODE_SIZE])) if priority != CommandPriority.INIT else None
+        queued = self._coalescable.get(coalesce_key, None) if coalesce_key is not None else None
+        if queued is not None:
+            # Last value wins, at the position of the latest submission
+            queued.data = data
+            if written is not None:
+                queued.written.append(written)
+            queued.priority = min(priority, queued.priority)
+            queued.sequence = self._sequence
+            self._sequence += 1
+            self.stats.coalesced += 1
+            return
+
+        command = _QueuedCommand(endpoint, data, priority, self._sequence, time.monotonic(), coalesce_key)
+        if written is not None:
+            command.written.append(written)
+        self._sequence += 1
+        self._queue.append(command)
+        if coalesce_key is not None:
+            self._coalescable[coalesce_key] = command
+
+        self.stats.max_depth = max(self.stats.max_depth, len(self._queue))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def drain(self) -> None:
+        '''
+        Wait for the queued commands to be written.
+        '''
+
+        if self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    def close(self) -> None:
+        self._closed = True
+
+        if self._queue:
+            self.log.debug(f'Dropping {len(self._queue)} queued commands.')
+        for command in self._queue:
+            for written in command.written:
+                written.cancel()
+        self._queue.clear()
+        self._coalescable.clear()
+
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _write_loop(self) -> None:
+        while self._queue:
+            command = min(self._queue, key=lambda queued: (queued.priority, queued.sequence))
+            self._queue.remove(command)
+            if command.coalesce_key is not None:
+                del self._coalescable[command.coalesce_key]
+
+            try:
+                self.transport.write(command.endpoint, command.data)
+            except Exception as e:
+                self.stats.failed += 1
+                self.log.error(f'Failed to write command {list(command.data[:OPCODE_SIZE])} ({e}).')
+                for written in command.written:
+                    if not written.done():
+                        written.set_exception(e)
+            else:
+                written_at = time.monotonic()
+                latency = written_at - command.submitted_at
+                self.stats.sent += 1
+                self.stats.total_latency += latency
+                self.stats.max_latency = max(self.stats.max_latency, latency)
+                for written in command.written:
+                    if not written.done():
+                        written.set_result(written_at)
+
+            # Let the other tasks run (and queue newer values) between two writes
+            await asyncio.sleep(0)
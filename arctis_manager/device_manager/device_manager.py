@@ -2,16 +2,22 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
 import logging
-from typing import Literal, Optional
+from typing import Any, Callable, Literal, Optional
 
 import usb.core
-import usb.util
 
 from arctis_manager.device_manager.channel_position import ChannelPosition
 from arctis_manager.device_manager.chat_mix_state import DeviceState
+from arctis_manager.device_manager.command_scheduler import CommandPriority, CommandScheduler
 from arctis_manager.device_manager.device_settings import DeviceSetting
 from arctis_manager.device_manager.device_status import DeviceStatus
+from arctis_manager.device_manager.device_transport import REPORT_SIZE, DeviceTransport, UsbTransport
+from arctis_manager.device_manager.endpoint_index import EndpointIndex
+from arctis_manager.device_manager.hidraw_transport import HidrawTransport
+from arctis_manager.device_manager.init_pipeline import ResponseWaiters
 from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+from arctis_manager.device_manager.libusb_transport import LibusbTransport
+from arctis_manager.device_manager.report_dispatcher import ReportDispatcher
 
 
 def device_manager_factory(product_id: int, device_name: str) -> 'DeviceManager':
@@ -32,38 +38,121 @@ def device_manager_factory(product_id: int, device_name: str) -> 'DeviceManager'
 
 class DeviceManager(ABC):
     device: usb.core.Device
+    endpoints: EndpointIndex
+    transport: DeviceTransport
+    commands: CommandScheduler
+    responses: ResponseWaiters
+    reports: ReportDispatcher
+    settings_change_callbacks: list[Callable[[], None]]
     log: logging.Logger
 
     def __init__(self, log_level: int = logging.INFO):
         self.log = logging.getLogger('Device')
         self.log.level = log_level
 
+        self.device = None
+        self.endpoints = None
+        self.transport = None
+        self.commands = None
+        self.responses = ResponseWaiters()
+        self.reports = ReportDispatcher(log_level)
+        self.settings_change_callbacks = []
+
     def set_device(self, device: usb.core.Device):
         '''
         Called by the daemon before init_device
         '''
         self.device = device
+        self.endpoints = EndpointIndex(device)
+        self.register_report_handlers()
+
+    def register_report_handlers(self) -> None:
+        '''
+        Register the decoders of the device's reports with self.reports.register, to be used via dispatch_report.
+        Called once the device's endpoints are known. Overwrite when needed.
+        '''
+        pass
+
+    def dispatch_report(self, data: memoryview, endpoint: InterfaceEndpoint) -> Any:
+        '''
+        Decode the report with the handler registered for it, returning the handler's result (None if the report is not handled).
+        '''
 
-    def kernel_detach(self, ie: Optional[InterfaceEndpoint] = None) -> None:
+        handled, result = self.reports.dispatch(endpoint, data)
+        if not handled:
+            self.log.debug(f'Incoming data from {endpoint.interface}, {endpoint.endpoint}: [{':'.join(hex(x)[2:] for x in data)}]')
+
+        return result
+
+    def get_transport_type(self) -> Literal['usb', 'libusb', 'hidraw']:
+        '''
+        Get the preferred transport to communicate with the device:
+        - usb: pyusb interrupt transfers, one blocking read at a time (the kernel drivers are detached from the interfaces)
+        - libusb: several libusb asynchronous transfers queued per endpoint, handled by a dedicated thread (the kernel drivers are detached from the interfaces)
+        - hidraw: the kernel's hidraw nodes, read from the event loop (the interfaces must be HID ones)
+        Override when different.
         '''
-        Ensure that the kernel driver is detached for all the interfaces we need to access in I/O
+        return 'libusb'
+
+    def open_transport(self) -> DeviceTransport:
+        '''
+        Called by the daemon after set_device, from the event loop.
+        Open the preferred transport for the interfaces in use, falling back to pyusb when not available.
         '''
 
-        if ie is not None:
-            interfaces = [ie.interface]
-        else:
-            interfaces = list(set([ie.interface for ie in self.get_endpoint_addresses_to_listen()]))
+        status_endpoint, _ = self.get_request_device_status()
+        listened_endpoints = self.get_endpoint_addresses_to_listen()
+        interfaces = sorted(set(
+            ie.interface for ie in [*listened_endpoints, status_endpoint] if ie is not None
+        ))
+
+        transport = None
+        transport_class = {'hidraw': HidrawTransport, 'libusb': LibusbTransport}.get(self.get_transport_type(), None)
+        if transport_class is not None:
+            try:
+                transport = transport_class(self.device, self.endpoints, self.log.level, self.get_report_size())
+                transport.open(interfaces, listened_endpoints)
+            except OSError as e:
+                self.log.warning(f'Unable to use {self.get_transport_type()} ({e}), falling back to USB transfers.')
+                transport = None
+
+        if transport is None:
+            transport = UsbTransport(self.device, self.endpoints, self.log.level, self.get_report_size())
+            transport.open(interfaces, listened_endpoints)
 
-        for interface in interfaces:
-            interface = self.device[0].interfaces()[interface]
-            interface_num = interface.bInterfaceNumber
+        self.transport = transport
+        self.commands = CommandScheduler(transport, self.log.level)
 
-            if self.device.is_kernel_driver_active(interface_num):
-                self.device.detach_kernel_driver(interface_num)
+        return self.transport
 
-    def init_device(self) -> None:
+    def send_command(self, endpoint: InterfaceEndpoint, data: list[int], priority: CommandPriority = CommandPriority.USER) -> None:
+        '''
+        Queue a command for the device (see CommandScheduler): setting changes use the default priority,
+        initialization sequences must use CommandPriority.INIT (never coalesced).
+        '''
+        self.commands.submit(endpoint, data, priority)
+
+        if priority == CommandPriority.USER:
+            for callback in self.settings_change_callbacks:
+                callback()
+
+    def register_settings_change_callback(self, callback: Callable[[], None]) -> None:
+        '''
+        Register a callback invoked whenever a command is sent on the user's behalf (a setting change).
+        '''
+        self.settings_change_callbacks.append(callback)
+
+    def get_report_size(self) -> int:
+        '''
+        Get the size of the reports read from the device, defaulting to 64 bytes.
+        Override when different.
+        '''
+        return REPORT_SIZE
+
+    async def init_device(self) -> None:
         '''
         Initialize the device. Overwrite when needed.
+        Called once the endpoint listeners are running: use an InitPipeline to wait for the device's responses.
         '''
         pass
 
@@ -126,31 +215,17 @@ class DeviceManager(ABC):
         in: device-to-host
         '''
 
-        if getattr(self, '_endpoint_cache', None) is None:
-            self._endpoint_cache = {}
-
-        index = f'{self.get_device_product_id()}::{interface_index}::{direction_out}'
-        if index in self._endpoint_cache:
-            return self._endpoint_cache[index]
-
-        if self.device is None:
+        if self.endpoints is None:
             self.log.debug('Device is not initialized yet.')
 
             return None
 
-        interface = self.device[0].interfaces()[interface_index]
-        for endpoint_index, endpoint in enumerate(interface.endpoints()):
-            if usb.util.endpoint_direction(endpoint.bEndpointAddress) == usb.util.ENDPOINT_OUT if direction_out == 'out' else usb.util.ENDPOINT_IN:
-                result = InterfaceEndpoint(interface_index, endpoint_index)
-                self._endpoint_cache[index] = result
-
-                return result
-
-        return None
+        return self.endpoints.find(interface_index, direction_out)
 
     @abstractmethod
-    def manage_input_data(self, data: list[int], endpoint: InterfaceEndpoint) -> DeviceState:
+    def manage_input_data(self, data: memoryview, endpoint: InterfaceEndpoint) -> DeviceState:
         '''
         Manage the data received from the device at the given endpoint, returning the new state.
+        The data is a read-only view over a reused buffer: copy it (e.g. bytes(data)) to keep it after a few more reports.
         '''
         pass
@@ -6,11 +6,13 @@ from arctis_manager.translations import Translations
 T = TypeVar('T')
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DeviceStatusValue(Generic[T]):
     value: T
     value_translation_key: Optional[str] = field(default=None)  # Relative to device_status_values
-    mapped_val: Optional[Callable[[T], str]] = field(default=None)  # Optional string value conversion, if decoding is requried
+    # Optional string value conversion, if decoding is requried. Use a module-level function rather than a lambda:
+    # it is shared by all the decoded reports, and two values decoded from the same data compare equal.
+    mapped_val: Optional[Callable[[T], str]] = field(default=None)
 
     def __str__(self) -> str:
         return str(self.mapped_val(self.value)) if self.mapped_val is not None \
@@ -27,37 +29,41 @@ class DeviceStatusValue(Generic[T]):
         return 0
 
 
-@dataclass(frozen=True)
+# Value of the statuses not reported by the device, shared by all the device statuses
+EMPTY_STATUS_VALUE = DeviceStatusValue(None)
+
+
+@dataclass(frozen=True, slots=True)
 class DeviceStatus:
     # Bluetooth
-    bluetooth_powerup_state: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
-    bluetooth_auto_mute: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
-    bluetooth_power_status: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
-    bluetooth_connection: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
+    bluetooth_powerup_state: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
+    bluetooth_auto_mute: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
+    bluetooth_power_status: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
+    bluetooth_connection: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
 
     # Wireless
-    wireless_mode: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
-    wireless_pairing: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
+    wireless_mode: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
+    wireless_pairing: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
 
     # Battery / power status
     '''Value between 0 and 1, percentage'''
-    headset_battery_charge: Optional[DeviceStatusValue[float]] = field(default_factory=lambda: DeviceStatusValue(None))
+    headset_battery_charge: Optional[DeviceStatusValue[float]] = field(default=EMPTY_STATUS_VALUE)
     '''Value between 0 and 1, percentage'''
-    charge_slot_battery_charge: Optional[DeviceStatusValue[float]] = field(default_factory=lambda: DeviceStatusValue(None))
-    headset_power_status: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
+    charge_slot_battery_charge: Optional[DeviceStatusValue[float]] = field(default=EMPTY_STATUS_VALUE)
+    headset_power_status: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
 
     # ANC
     '''Value between 0 and 1, percentage'''
-    transparent_noise_cancelling_level: Optional[DeviceStatusValue[float]] = field(default_factory=lambda: DeviceStatusValue(None))
-    noise_cancelling: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
+    transparent_noise_cancelling_level: Optional[DeviceStatusValue[float]] = field(default=EMPTY_STATUS_VALUE)
+    noise_cancelling: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
 
     # Microphone
-    mic_status: Optional[DeviceStatusValue] = field(default_factory=lambda: DeviceStatusValue(None))
+    mic_status: Optional[DeviceStatusValue] = field(default=EMPTY_STATUS_VALUE)
     '''Value between 0 and 1, percentage'''
-    mic_led_brightness: Optional[DeviceStatusValue[float]] = field(default_factory=lambda: DeviceStatusValue(None))
+    mic_led_brightness: Optional[DeviceStatusValue[float]] = field(default=EMPTY_STATUS_VALUE)
 
     # Advanced features
-    auto_off_time_minutes: Optional[DeviceStatusValue[int]] = field(default_factory=lambda: DeviceStatusValue(None))
+    auto_off_time_minutes: Optional[DeviceStatusValue[int]] = field(default=EMPTY_STATUS_VALUE)
 
     def bluetooth_section(self) -> dict[str, Any]:
         return {key: getattr(self, key) for key in ['bluetooth_powerup_state', 'bluetooth_auto_mute', 'bluetooth_power_status', 'bluetooth_connection']}
@@ -76,3 +82,7 @@ class DeviceStatus:
 
     def advanced_section(self) -> dict[str, Any]:
         return {key: getattr(self, key) for key in ['auto_off_time_minutes']}
+
+
+# Status of the devices not reporting any advanced feature
+EMPTY_DEVICE_STATUS = DeviceStatus()
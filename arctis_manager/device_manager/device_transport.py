@@ -0,0 +1,95 @@
+import array
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+
+import usb.core
+
+from arctis_manager.device_manager.endpoint_index import EndpointIndex
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+from arctis_manager.device_manager.report_buffer_ring import ReportBufferRing
+
+REPORT_SIZE = 64
+
+
+class DeviceTransport(ABC):
+    '''
+    I/O channel towards the device's interfaces.
+    Reads are awaited on the event loop, writes are synchronous (command packets are short and sent one at a time).
+    Reports are read into the buffers of a preallocated ring, and returned as read-only views.
+    '''
+
+    device: usb.core.Device
+    endpoints: EndpointIndex
+    report_size: int
+    buffers: ReportBufferRing
+    log: logging.Logger
+
+    def __init__(self, device: usb.core.Device, endpoints: EndpointIndex, log_level: int = logging.INFO, report_size: int = REPORT_SIZE):
+        self.device = device
+        self.endpoints = endpoints
+        self.report_size = report_size
+        self.buffers = ReportBufferRing(report_size)
+
+        self.log = logging.getLogger('Transport')
+        self.log.setLevel(log_level)
+
+    @abstractmethod
+    def open(self, interfaces: list[int], listened_endpoints: Optional[list[InterfaceEndpoint]] = None) -> None:
+        '''
+        Acquire the given interfaces (0-based indexes). Raises an exception if the transport is not usable for them.
+        Only the listened endpoints (by default, all the interrupt IN endpoints of the interfaces) are read by the caller.
+        '''
+        pass
+
+    @abstractmethod
+    async def read(self, interface_endpoint: InterfaceEndpoint) -> memoryview:
+        '''
+        Wait for the next report from the given endpoint (see ReportBufferRing for the lifetime of the returned view).
+        May raise usb.core.USBTimeoutError, which the caller is expected to ignore.
+        '''
+        pass
+
+    @abstractmethod
+    def write(self, interface_endpoint: InterfaceEndpoint, data: Sequence[int]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        '''
+        Close the transport from the event loop, without blocking it.
+        '''
+        self.close()
+
+
+class UsbTransport(DeviceTransport):
+    '''
+    Transport through pyusb: the kernel drivers are detached from the interfaces and each read is a blocking
+    interrupt transfer, run in a worker thread.
+    '''
+
+    def open(self, interfaces: list[int], listened_endpoints: Optional[list[InterfaceEndpoint]] = None) -> None:
+        # Detach the kernel drivers for the interfaces we need to access in I/O (otherwise the interface will be busy and we'll not be able to read/write into them)
+        for interface_index in interfaces:
+            interface_num = self.endpoints.get_interface_number(interface_index)
+
+            if self.device.is_kernel_driver_active(interface_num):
+                self.device.detach_kernel_driver(interface_num)
+
+    async def read(self, interface_endpoint: InterfaceEndpoint) -> memoryview:
+        # With all the buffers in use (e.g. reads in flight on other endpoints), the report is read into a new buffer
+        # (counted by the ring's overflows) instead of overwriting one
+        index = self.buffers.acquire()
+        buffer = self.buffers.buffer(index) if index is not None else array.array('B', bytes(self.report_size))
+        try:
+            length = await asyncio.to_thread(self.device.read, self.endpoints.get_address(interface_endpoint), buffer)
+        finally:
+            self.buffers.release()
+
+        return self.buffers.view(index, length) if index is not None else memoryview(buffer)[:length].toreadonly()
+
+    def write(self, interface_endpoint: InterfaceEndpoint, data: Sequence[int]) -> None:
+        self.device.write(self.endpoints.get_address(interface_endpoint), data)
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Literal, Optional
+
+import usb.core
+import usb.util
+
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+
+@dataclass(frozen=True)
+class EndpointDescriptor:
+    '''Resolved descriptor of an InterfaceEndpoint'''
+
+    interface_endpoint: InterfaceEndpoint
+    '''bInterfaceNumber of the endpoint's interface (the interface index is the position in the configuration)'''
+    interface_number: int
+    address: int
+    direction: Literal['out', 'in']
+    '''usb.util.ENDPOINT_TYPE_* value'''
+    transfer_type: int
+    max_packet_size: int
+
+
+class EndpointIndex:
+    '''
+    Immutable index of the device's endpoint descriptors (first configuration), built once when the device is attached,
+    so that I/O calls don't walk the pyusb descriptors each time.
+    '''
+
+    def __init__(self, device: usb.core.Device):
+        endpoints: dict[InterfaceEndpoint, EndpointDescriptor] = {}
+        interface_numbers: list[int] = []
+
+        for interface_index, interface in enumerate(device[0].interfaces()):
+            interface_numbers.append(interface.bInterfaceNumber)
+
+            for endpoint_index, endpoint in enumerate(interface.endpoints()):
+                interface_endpoint = InterfaceEndpoint(interface_index, endpoint_index)
+                endpoints[interface_endpoint] = EndpointDescriptor(
+                    interface_endpoint=interface_endpoint,
+                    interface_number=interface.bInterfaceNumber,
+                    address=endpoint.bEndpointAddress,
+                    direction='out' if usb.util.endpoint_direction(endpoint.bEndpointAddress) == usb.util.ENDPOINT_OUT else 'in',
+                    transfer_type=usb.util.endpoint_type(endpoint.bmAttributes),
+                    max_packet_size=endpoint.wMaxPacketSize,
+                )
+
+        self._endpoints = MappingProxyType(endpoints)
+        self._interface_numbers = tuple(interface_numbers)
+
+    def __getitem__(self, interface_endpoint: InterfaceEndpoint) -> EndpointDescriptor:
+        return self._endpoints[interface_endpoint]
+
+    def __contains__(self, interface_endpoint: InterfaceEndpoint) -> bool:
+        return interface_endpoint in self._endpoints
+
+    def get_address(self, interface_endpoint: InterfaceEndpoint) -> int:
+        return self._endpoints[interface_endpoint].address
+
+    def get_interface_number(self, interface_index: int) -> int:
+        return self._interface_numbers[interface_index]
+
+    def get_interface_endpoints(self, interface_index: int) -> list[EndpointDescriptor]:
+        return [descriptor for descriptor in self._endpoints.values() if descriptor.interface_endpoint.interface == interface_index]
+
+    def find(self, interface_index: int, direction: Literal['out', 'in']) -> Optional[InterfaceEndpoint]:
+        '''
+        Get the first endpoint of the interface in the given direction.
+        '''
+
+        for descriptor in self._endpoints.values():
+            if descriptor.interface_endpoint.interface == interface_index and descriptor.direction == direction:
+                return descriptor.interface_endpoint
+
+        return None
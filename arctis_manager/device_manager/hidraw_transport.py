@@ -0,0 +1,116 @@
+import asyncio
+import errno
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+from arctis_manager.device_manager.device_transport import DeviceTransport
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+HIDRAW_SYSFS_PATH = Path('/sys/class/hidraw')
+
+
+def find_hidraw_node(bus: int, address: int, interface_num: int) -> Optional[str]:
+    '''
+    Find the /dev/hidrawN node of the given USB interface, matching it via sysfs
+    (/sys/class/hidraw/hidrawN/device -> .../<bus>-<port>:<config>.<interface>/<hid device>).
+    '''
+
+    if not HIDRAW_SYSFS_PATH.is_dir():
+        return None
+
+    for node in HIDRAW_SYSFS_PATH.iterdir():
+        try:
+            interface_path = node.joinpath('device').resolve().parent
+            device_path = interface_path.parent
+
+            if int(interface_path.joinpath('bInterfaceNumber').read_text().strip(), 16) != interface_num:
+                continue
+            if int(device_path.joinpath('busnum').read_text().strip()) != bus:
+                continue
+            if int(device_path.joinpath('devnum').read_text().strip()) != address:
+                continue
+        except (OSError, ValueError):
+            continue
+
+        return f'/dev/{node.name}'
+
+    return None
+
+
+class HidrawTransport(DeviceTransport):
+    '''
+    Transport through the kernel's hidraw nodes: the interfaces stay bound to the HID driver, and the non-blocking
+    file descriptors are watched by the event loop, so reports are read right when they arrive, without threads.
+    Reports and commands have the same layout as the interrupt transfers (report ID first).
+    Only the listened interfaces are watched: the other nodes are opened write-only, so that their reports (which nobody
+    reads) don't pile up in a queue, each holding a buffer of the ring.
+    '''
+
+    def open(self, interfaces: list[int], listened_endpoints: Optional[list[InterfaceEndpoint]] = None) -> None:
+        self._fds: dict[int, int] = {}
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._loop = asyncio.get_running_loop()
+
+        listened_interfaces = set(interfaces) if listened_endpoints is None else set(ie.interface for ie in listened_endpoints)
+
+        try:
+            for interface_index in interfaces:
+                interface_num = self.endpoints.get_interface_number(interface_index)
+                node = find_hidraw_node(self.device.bus, self.device.address, interface_num)
+                if node is None:
+                    raise FileNotFoundError(errno.ENOENT, f'No hidraw node for interface {interface_num}')
+
+                is_listened = interface_index in listened_interfaces
+                self._fds[interface_index] = os.open(node, (os.O_RDWR if is_listened else os.O_WRONLY) | os.O_NONBLOCK | os.O_CLOEXEC)
+                if is_listened:
+                    self._queues[interface_index] = asyncio.Queue()
+                    self._loop.add_reader(self._fds[interface_index], self._on_readable, interface_index)
+
+                self.log.debug(f'Interface {interface_num} bound to {node}{"" if is_listened else " (write only)"}.')
+        except Exception:
+            self.close()
+            raise
+
+    def _on_readable(self, interface_index: int) -> None:
+        fd = self._fds[interface_index]
+        queue = self._queues[interface_index]
+
+        # Drain all the available reports
+        while True:
+            index = self.buffers.acquire()
+            buffer = self.buffers.buffer(index) if index is not None else bytearray(self.report_size)
+
+            try:
+                length = os.readv(fd, [buffer])
+            except BlockingIOError:
+                self.buffers.release()
+                return
+            except OSError as e:
+                # Device gone (ENODEV): stop watching and report the error to the reader
+                self.buffers.release()
+                self._loop.remove_reader(fd)
+                queue.put_nowait(e)
+                return
+
+            queue.put_nowait(self.buffers.view(index, length) if index is not None else memoryview(buffer)[:length].toreadonly())
+
+    async def read(self, interface_endpoint: InterfaceEndpoint) -> memoryview:
+        report = await self._queues[interface_endpoint.interface].get()
+        if isinstance(report, Exception):
+            raise report
+
+        self.buffers.release()
+
+        return report
+
+    def write(self, interface_endpoint: InterfaceEndpoint, data: Sequence[int]) -> None:
+        os.write(self._fds[interface_endpoint.interface], bytes(data))
+
+    def close(self) -> None:
+        for interface_index, fd in getattr(self, '_fds', {}).items():
+            if interface_index in self._queues:
+                self._loop.remove_reader(fd)
+            os.close(fd)
+
+        self._fds = {}
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from arctis_manager.device_manager.command_scheduler import CommandPriority
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+if TYPE_CHECKING:
+    from arctis_manager.device_manager.device_manager import DeviceManager
+
+DEFAULT_RESPONSE_TIMEOUT_SECONDS = 0.5
+# Responses are matched on the report ID and the command byte
+RESPONSE_PREFIX_SIZE = 2
+
+
+@dataclass(frozen=True)
+class InitCommand:
+    data: Sequence[int]
+    '''Wait for the device's response (a report starting like the command) before sending the next commands'''
+    expects_response: bool = field(default=False)
+    '''Beginning of the expected response, defaulting to the command's first 2 bytes'''
+    response_prefix: Optional[Sequence[int]] = field(default=None)
+
+    def get_response_prefix(self) -> tuple[int, ...]:
+        return tuple(self.response_prefix if self.response_prefix is not None else self.data[:RESPONSE_PREFIX_SIZE])
+
+
+class ResponseWaiters:
+    '''
+    Futures waiting for a report from the device, resolved in order with a copy of the first matching report.
+    '''
+
+    def __init__(self):
+        self._waiters: list[tuple[tuple[int, ...], asyncio.Future]] = []
+
+    def expect(self, prefix: Sequence[int]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((tuple(prefix), future))
+
+        return future
+
+    def discard(self, future: asyncio.Future) -> None:
+        self._waiters = [(prefix, waiter) for prefix, waiter in self._waiters if waiter is not future]
+
+    def resolve(self, data: Sequence[int]) -> bool:
+        '''
+        Called for each report read from the device. Returns True if a waiter got resolved.
+        '''
+
+        if not self._waiters:
+            return False
+
+        for index, (prefix, future) in enumerate(self._waiters):
+            if future.done():
+                continue
+            if len(data) >= len(prefix) and all(data[i] == value for i, value in enumerate(prefix)):
+                del self._waiters[index]
+                future.set_result(bytes(data))
+
+                return True
+
+        return False
+
+
+class InitPipeline:
+    '''
+    Sends an initialization sequence through the device's command scheduler: commands which don't expect a response are
+    queued back to back, while each query waits for its response (with a timeout) before the sequence goes on.
+    Once a response times out, the device is assumed not to answer: the remaining queries are sent without waiting,
+    instead of stalling the sequence for a timeout each.
+    The endpoint listeners must be running, as responses are matched against the reports they read.
+    '''
+
+    log: logging.Logger
+
+    def __init__(self, device_manager: 'DeviceManager', endpoint: InterfaceEndpoint,
+                 response_timeout: float = DEFAULT_RESPONSE_TIMEOUT_SECONDS, log_level: int = logging.INFO):
+        self.log = logging.getLogger('InitPipeline')
+        self.log.setLevel(log_level)
+
+        self.device_manager = device_manager
+        self.endpoint = endpoint
+        self.response_timeout = response_timeout
+
+    async def run(self, commands: list[InitCommand]) -> list[Optional[bytes]]:
+        '''
+        Send the commands, returning the response to each of them (None if no response was expected or received).
+        '''
+
+        start = time.monotonic()
+        timeouts = 0
+        unanswered = 0
+        responses: list[Optional[bytes]] = [None] * len(commands)
+        pending_writes: list[tuple[int, InitCommand, float, asyncio.Future]] = []
+
+        for step, command in enumerate(commands):
+            submitted_at = time.monotonic()
+            if command.expects_response and timeouts:
+                unanswered += 1
+            response = self.device_manager.responses.expect(command.get_response_prefix()) if command.expects_response and not timeouts else None
+            written = self.device_manager.commands.send(self.endpoint, command.data, CommandPriority.INIT)
+
+            if response is None:
+                pending_writes.append((step, command, submitted_at, written))
+                continue
+
+            await self._wait_writes(pending_writes)
+            pending_writes = []
+
+            try:
+                await written
+                responses[step] = await asyncio.wait_for(response, self.response_timeout)
+                self.log.debug(f'Step {step}: {self._format(command)} answered in {(time.monotonic() - submitted_at) * 1000:.1f}ms.')
+            except asyncio.TimeoutError:
+                timeouts += 1
+                self.log.warning(f'Step {step}: no response to {self._format(command)} within {self.response_timeout}s, '
+                                 'not waiting for the next responses.')
+            except Exception as e:
+                self.log.error(f'Step {step}: failed to send {self._format(command)} ({e}).')
+            finally:
+                self.device_manager.responses.discard(response)
+
+        await self._wait_writes(pending_writes)
+
+        self.log.info(f'Init sequence completed in {(time.monotonic() - start) * 1000:.1f}ms '
+                      f'({len(commands)} commands, {timeouts} responses timed out, {unanswered} not waited for).')
+
+        return responses
+
+    async def _wait_writes(self, pending_writes: list[tuple[int, InitCommand, float, asyncio.Future]]) -> None:
+        for step, command, submitted_at, written in pending_writes:
+            try:
+                written_at = await written
+                self.log.debug(f'Step {step}: {self._format(command)} sent in {(written_at - submitted_at) * 1000:.1f}ms.')
+            except Exception as e:
+                self.log.error(f'Step {step}: failed to send {self._format(command)} ({e}).')
+
+    @staticmethod
+    def _format(command: InitCommand) -> str:
+        return ':'.join(f'{b:02x}' for b in command.data[:RESPONSE_PREFIX_SIZE])
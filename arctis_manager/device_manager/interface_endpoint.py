@@ -9,6 +9,3 @@ class InterfaceEndpoint:
     interface: int
     '''0-based index of the endpoint to listen to'''
     endpoint: int
-
-    def __eq__(self, other: 'InterfaceEndpoint') -> bool:
-        return self.interface == other.interface and self.endpoint == other.endpoint
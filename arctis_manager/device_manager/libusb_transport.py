@@ -0,0 +1,295 @@
+import asyncio
+import ctypes
+import errno
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import usb.core
+import usb.util
+
+from arctis_manager.device_manager.device_transport import DeviceTransport
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+# Number of interrupt-IN transfers kept submitted per endpoint
+TRANSFERS_PER_ENDPOINT = 4
+EVENT_THREAD_TIMEOUT_SECONDS = 0.2
+
+LIBUSB_TRANSFER_TYPE_INTERRUPT = 3
+
+LIBUSB_TRANSFER_COMPLETED = 0
+LIBUSB_TRANSFER_TIMED_OUT = 2
+LIBUSB_TRANSFER_CANCELLED = 3
+LIBUSB_TRANSFER_NO_DEVICE = 5
+LIBUSB_TRANSFER_OVERFLOW = 6
+
+
+class _Transfer(ctypes.Structure):
+    pass
+
+
+_TransferCallback = ctypes.CFUNCTYPE(None, ctypes.POINTER(_Transfer))
+
+_Transfer._fields_ = [
+    ('dev_handle', ctypes.c_void_p),
+    ('flags', ctypes.c_uint8),
+    ('endpoint', ctypes.c_ubyte),
+    ('type', ctypes.c_ubyte),
+    ('timeout', ctypes.c_uint),
+    ('status', ctypes.c_int),
+    ('length', ctypes.c_int),
+    ('actual_length', ctypes.c_int),
+    ('callback', _TransferCallback),
+    ('user_data', ctypes.c_void_p),
+    ('buffer', ctypes.POINTER(ctypes.c_ubyte)),
+    ('num_iso_packets', ctypes.c_int),
+]
+
+
+class _Timeval(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_usec', ctypes.c_long)]
+
+
+@dataclass
+class TransferStats:
+    reports: int = field(default=0)
+    '''Transfers completed with an error (the report, if any, is lost)'''
+    drops: int = field(default=0)
+    '''Times all the transfers of an endpoint were completed at once: the device had no buffer to write into'''
+    overruns: int = field(default=0)
+    batches: int = field(default=0)
+    total_latency: float = field(default=0.0)
+    max_latency: float = field(default=0.0)
+
+    def __str__(self) -> str:
+        average = self.total_latency / self.reports if self.reports else 0
+
+        return f'{self.reports} reports in {self.batches} batches, {self.drops} dropped, {self.overruns} overruns, ' \
+            f'latency avg {average * 1000:.2f}ms, max {self.max_latency * 1000:.2f}ms'
+
+
+class LibusbTransport(DeviceTransport):
+    '''
+    Transport through libusb's asynchronous API, on top of pyusb's libusb1 backend.
+    Several interrupt-IN transfers are kept submitted on each endpoint, so that reports are received even while the
+    previous ones are being processed. A dedicated thread handles the libusb events: completed transfers are resubmitted
+    right away and their reports are handed to the event loop in batches (one wake-up per round of events).
+    Only the listened endpoints get transfers: the reports of the other ones would never be read.
+    '''
+
+    stats: TransferStats
+
+    def open(self, interfaces: list[int], listened_endpoints: Optional[list[InterfaceEndpoint]] = None) -> None:
+        import usb.backend.libusb1
+
+        backend = self.device._ctx.backend
+        if not isinstance(backend, usb.backend.libusb1._LibUSB):
+            raise OSError(errno.ENOTSUP, f'Unsupported pyusb backend {type(backend).__name__}')
+
+        # Separate prototypes from the ones set by pyusb, on the same (already loaded) library
+        self._lib = ctypes.CDLL(backend.lib._name)
+        self._lib.libusb_alloc_transfer.argtypes = [ctypes.c_int]
+        self._lib.libusb_alloc_transfer.restype = ctypes.POINTER(_Transfer)
+        self._lib.libusb_submit_transfer.argtypes = [ctypes.POINTER(_Transfer)]
+        self._lib.libusb_cancel_transfer.argtypes = [ctypes.POINTER(_Transfer)]
+        self._lib.libusb_free_transfer.argtypes = [ctypes.POINTER(_Transfer)]
+        self._lib.libusb_handle_events_timeout_completed.argtypes = [ctypes.c_void_p, ctypes.POINTER(_Timeval), ctypes.c_void_p]
+        self._lib_ctx = backend.ctx
+
+        self.stats = TransferStats()
+        self._loop = asyncio.get_running_loop()
+        self._interfaces = []
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._transfers: list[tuple[object, int, ctypes.Array]] = []
+        self._in_flight: dict[int, int] = {}
+        self._batch: list[tuple[int, memoryview | Exception, bool, float]] = []
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        # Called by libusb from the event thread: the instance must outlive every submitted transfer
+        self._callback = _TransferCallback(self._on_transfer_completed)
+
+        try:
+            for interface_index in interfaces:
+                interface_num = self.endpoints.get_interface_number(interface_index)
+                if self.device.is_kernel_driver_active(interface_num):
+                    self.device.detach_kernel_driver(interface_num)
+                usb.util.claim_interface(self.device, interface_num)
+                self._interfaces.append(interface_num)
+
+            handle = self.device._ctx.managed_open().handle
+            listened_addresses = None if listened_endpoints is None else {self.endpoints.get_address(ie) for ie in listened_endpoints}
+
+            for interface_index in interfaces:
+                for endpoint in self.endpoints.get_interface_endpoints(interface_index):
+                    if endpoint.direction != 'in' or endpoint.transfer_type != usb.util.ENDPOINT_TYPE_INTR:
+                        continue
+                    if listened_addresses is not None and endpoint.address not in listened_addresses:
+                        continue
+
+                    self._queues[endpoint.address] = asyncio.Queue()
+                    self._in_flight[endpoint.address] = 0
+                    for _ in range(TRANSFERS_PER_ENDPOINT):
+                        self._submit(self._alloc_transfer(handle, endpoint.address, max(endpoint.max_packet_size, self.report_size)))
+        except Exception:
+            self.close()
+            raise
+
+        self._thread = threading.Thread(target=self._handle_events, name='libusb-events', daemon=True)
+        self._thread.start()
+
+        self.log.debug(f'{len(self._transfers)} transfers submitted on {len(self._queues)} endpoints.')
+
+    def _alloc_transfer(self, handle: ctypes.c_void_p, address: int, size: int) -> int:
+        transfer = self._lib.libusb_alloc_transfer(0)
+        if not transfer:
+            raise OSError(errno.ENOMEM, 'Unable to allocate a libusb transfer')
+
+        buffer = ctypes.create_string_buffer(size)
+        transfer_id = len(self._transfers)
+        self._transfers.append((transfer, address, buffer))
+
+        transfer.contents.dev_handle = handle
+        transfer.contents.endpoint = address
+        transfer.contents.type = LIBUSB_TRANSFER_TYPE_INTERRUPT
+        transfer.contents.timeout = 0
+        transfer.contents.length = size
+        transfer.contents.callback = self._callback
+        transfer.contents.user_data = transfer_id
+        transfer.contents.buffer = ctypes.cast(buffer, ctypes.POINTER(ctypes.c_ubyte))
+
+        return transfer_id
+
+    def _submit(self, transfer_id: int) -> bool:
+        transfer, address, _ = self._transfers[transfer_id]
+
+        result = self._lib.libusb_submit_transfer(transfer)
+        if result != 0:
+            self.log.debug(f'Unable to submit a transfer on endpoint 0x{address:02x} (libusb error {result}).')
+            return False
+
+        self._in_flight[address] += 1
+
+        return True
+
+    def _on_transfer_completed(self, transfer_pointer) -> None:
+        # Runs in the event thread, from libusb_handle_events
+        completed_at = time.monotonic()
+        transfer = transfer_pointer.contents
+        _, address, buffer = self._transfers[transfer.user_data or 0]
+
+        self._in_flight[address] -= 1
+        if self._in_flight[address] == 0 and not self._stopping:
+            self.stats.overruns += 1
+
+        if transfer.status == LIBUSB_TRANSFER_COMPLETED:
+            self._batch.append((address, *self._copy_report(buffer, transfer.actual_length), completed_at))
+        elif transfer.status == LIBUSB_TRANSFER_NO_DEVICE:
+            self._batch.append((address, OSError(errno.ENODEV, 'No such device'), False, completed_at))
+            return
+        elif transfer.status == LIBUSB_TRANSFER_CANCELLED:
+            return
+        elif transfer.status != LIBUSB_TRANSFER_TIMED_OUT:
+            self.stats.drops += 1
+
+        if not self._stopping and not self._submit(transfer.user_data or 0) and self._in_flight[address] == 0:
+            self._batch.append((address, OSError(errno.EIO, f'No transfer left on endpoint 0x{address:02x}'), False, completed_at))
+
+    def _copy_report(self, buffer: ctypes.Array, length: int) -> tuple[memoryview, bool]:
+        '''
+        The transfer's buffer is resubmitted right away: the report is moved to the ring.
+        Returns the report, and whether it is in the ring (and must be released once read).
+        '''
+
+        if length > self.report_size:
+            return memoryview(ctypes.string_at(buffer, length)), False
+
+        # An overflowing ring still counts the report as acquired
+        index = self.buffers.acquire()
+        if index is None:
+            return memoryview(ctypes.string_at(buffer, length)), True
+
+        ctypes.memmove(self.buffers.address(index), buffer, length)
+
+        return self.buffers.view(index, length), True
+
+    def _handle_events(self) -> None:
+        timeout = _Timeval(0, int(EVENT_THREAD_TIMEOUT_SECONDS * 1_000_000))
+
+        while not self._stopping or any(self._in_flight.values()):
+            self._lib.libusb_handle_events_timeout_completed(self._lib_ctx, ctypes.byref(timeout), None)
+
+            if self._batch:
+                batch, self._batch = self._batch, []
+                try:
+                    self._loop.call_soon_threadsafe(self._deliver, batch)
+                except RuntimeError:
+                    # Event loop closed
+                    pass
+
+    def _deliver(self, batch: list[tuple[int, memoryview | Exception, bool, float]]) -> None:
+        self.stats.batches += 1
+
+        for address, report, from_ring, completed_at in batch:
+            self._queues[address].put_nowait((report, from_ring, completed_at))
+
+    async def read(self, interface_endpoint: InterfaceEndpoint) -> memoryview:
+        address = self.endpoints.get_address(interface_endpoint)
+        report, from_ring, completed_at = await self._queues[address].get()
+        if isinstance(report, Exception):
+            raise report
+
+        if from_ring:
+            self.buffers.release()
+
+        latency = time.monotonic() - completed_at
+        self.stats.reports += 1
+        self.stats.total_latency += latency
+        self.stats.max_latency = max(self.stats.max_latency, latency)
+
+        return report
+
+    def write(self, interface_endpoint: InterfaceEndpoint, data: Sequence[int]) -> None:
+        self.device.write(self.endpoints.get_address(interface_endpoint), data)
+
+    def close(self) -> None:
+        if self._stop():
+            self._finish_close()
+
+    async def aclose(self) -> None:
+        # The event thread may take up to a round of events to exit: it is waited for outside of the event loop
+        if self._stop():
+            await asyncio.to_thread(self._finish_close)
+
+    def _stop(self) -> bool:
+        '''
+        Cancel the transfers. Returns False if the transport is not open (or already closed).
+        '''
+
+        if getattr(self, '_stopping', True):
+            return False
+        self._stopping = True
+
+        for transfer, _, _ in self._transfers:
+            self._lib.libusb_cancel_transfer(transfer)
+
+        return True
+
+    def _finish_close(self) -> None:
+        # The event thread exits once all the cancelled transfers have been called back
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            self._handle_events()
+        if not any(self._in_flight.values()):
+            for transfer, _, _ in self._transfers:
+                self._lib.libusb_free_transfer(transfer)
+        self._transfers = []
+
+        for interface_num in self._interfaces:
+            try:
+                usb.util.release_interface(self.device, interface_num)
+            except usb.core.USBError:
+                pass
+
+        self.log.debug(f'Transfer stats: {self.stats}')
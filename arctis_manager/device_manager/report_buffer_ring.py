@@ -0,0 +1,79 @@
+import array
+from typing import Optional
+
+DEFAULT_BUFFER_COUNT = 32
+
+
+class ReportBufferRing:
+    '''
+    Preallocated report buffers, reused in turn so that reading a report doesn't allocate any memory.
+    Reports are handed to the decoders as read-only views over the buffers: a view stays valid for the next
+    `retained` reports (half of the ring), decoders keeping data for longer must copy it (e.g. bytes(data)).
+
+    Each report is acquired by the producer (a single thread) and released once the reader takes it:
+    when too many reports are waiting to be read, no buffer is available and the producer must allocate one,
+    instead of overwriting a report which is still in use.
+    '''
+
+    report_size: int
+    retained: int
+
+    acquired: int
+    released: int
+    overflows: int
+
+    def __init__(self, report_size: int, count: int = DEFAULT_BUFFER_COUNT):
+        self.report_size = report_size
+        self.retained = count // 2
+
+        self._buffers = [array.array('B', bytes(report_size)) for _ in range(count)]
+        self._views = [memoryview(buffer).toreadonly() for buffer in self._buffers]
+        self._addresses = [buffer.buffer_info()[0] for buffer in self._buffers]
+
+        self._next = 0
+
+        self.acquired = 0
+        self.released = 0
+        self.overflows = 0
+
+    def __len__(self) -> int:
+        return len(self._buffers)
+
+    def acquire(self) -> Optional[int]:
+        '''
+        Get the index of the next buffer to fill, None if it still holds a report which may be in use.
+        The report must be released in both cases.
+        '''
+
+        pending = self.acquired - self.released
+        self.acquired += 1
+
+        if pending >= len(self._buffers) - self.retained:
+            self.overflows += 1
+            return None
+
+        index = self._next
+        self._next = (index + 1) % len(self._buffers)
+
+        return index
+
+    def release(self) -> None:
+        '''
+        Called when the reader takes a report, or when an acquired buffer ends up unused.
+        '''
+        self.released += 1
+
+    def buffer(self, index: int) -> array.array:
+        return self._buffers[index]
+
+    def address(self, index: int) -> int:
+        return self._addresses[index]
+
+    def view(self, index: int, length: int) -> memoryview:
+        '''
+        Read-only view over the first length bytes of the buffer.
+        '''
+
+        view = self._views[index]
+
+        return view if length == self.report_size else view[:length]
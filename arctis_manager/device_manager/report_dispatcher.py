@@ -0,0 +1,76 @@
+import logging
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+# Before the first dispatched report, and after a registration
+_NO_ENDPOINT = object()
+
+
+@dataclass(frozen=True)
+class ReportHandler:
+    '''Precompiled layout of the report, unpacked as the handler's positional arguments'''
+    layout: struct.Struct
+    handler: Callable[..., Any]
+
+
+class ReportDispatcher:
+    '''
+    Decoders of the reports read from a device, keyed by (endpoint, report ID, opcode), the first two bytes of the report.
+    Dispatching a report is a single dict lookup, and its fields are unpacked at once by the handler's struct layout
+    (e.g. '2x14B': skip the report ID and the opcode, then 14 unsigned bytes).
+    Devices whose reports don't carry an opcode register a fallback handler for the endpoint instead.
+    The handlers are grouped by endpoint, keyed by (report ID << 8 | opcode): the listeners pass the same endpoint over and over,
+    so the last endpoint's handlers are found by identity, without hashing the endpoint for every report.
+    '''
+
+    log: logging.Logger
+
+    def __init__(self, log_level: int = logging.INFO):
+        self.log = logging.getLogger('ReportDispatcher')
+        self.log.setLevel(log_level)
+
+        self._handlers: dict[InterfaceEndpoint, dict[int, ReportHandler]] = {}
+        self._fallbacks: dict[InterfaceEndpoint, ReportHandler] = {}
+
+        self._last_endpoint: object = _NO_ENDPOINT
+        self._last_handlers: dict[int, ReportHandler] = {}
+        self._last_fallback: Optional[ReportHandler] = None
+
+    def register(self, endpoint: InterfaceEndpoint, report_id: Optional[int], opcode: Optional[int], layout: str,
+                 handler: Callable[..., Any]) -> None:
+        '''
+        Register the handler of the reports starting with report_id and opcode on the endpoint.
+        With report_id and opcode set to None, the handler gets all the other reports of the endpoint.
+        '''
+
+        report_handler = ReportHandler(struct.Struct(layout), handler)
+        if report_id is None and opcode is None:
+            self._fallbacks[endpoint] = report_handler
+        else:
+            self._handlers.setdefault(endpoint, {})[report_id << 8 | opcode] = report_handler
+        self._last_endpoint = _NO_ENDPOINT
+
+    def dispatch(self, endpoint: InterfaceEndpoint, data: memoryview) -> tuple[bool, Any]:
+        '''
+        Decode the report with its handler, returning (True, the handler's result).
+        Returns (False, None) if no handler matches the report, or if the report is shorter than its layout.
+        '''
+
+        if endpoint is not self._last_endpoint:
+            self._last_endpoint = endpoint
+            self._last_handlers = self._handlers.get(endpoint, {})
+            self._last_fallback = self._fallbacks.get(endpoint, None)
+
+        report_handler = self._last_handlers.get(data[0] << 8 | data[1]) if len(data) >= 2 else None
+        if report_handler is None:
+            report_handler = self._last_fallback
+            if report_handler is None:
+                return False, None
+
+        if len(data) < report_handler.layout.size:
+            return False, None
+
+        return True, report_handler.handler(*report_handler.layout.unpack_from(data))
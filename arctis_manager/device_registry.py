@@ -0,0 +1,208 @@
+import ast
+import importlib
+import logging
+import os
+import pkgutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import arctis_manager.devices
+from arctis_manager.device_manager import DeviceManager
+
+DEVICES_PACKAGE = 'arctis_manager.devices'
+MANIFEST_MODULE = '_manifest'
+MANIFEST_PATH = Path(arctis_manager.devices.__path__[0]) / f'{MANIFEST_MODULE}.py'
+
+# Methods returning the device identification, set by device_manager_factory on the decorated classes
+IDENTIFICATION_METHODS = ('get_device_vendor_id', 'get_device_product_id', 'get_device_name')
+
+
+@dataclass(frozen=True)
+class DeviceEntry:
+    vendor_id: int
+    product_id: int
+    name: str
+    '''Module in the arctis_manager.devices package'''
+    module: str
+    class_name: str
+
+    def load(self) -> type[DeviceManager]:
+        '''
+        Import the device manager's module (only the first call actually imports it) and return its class.
+        '''
+        return getattr(importlib.import_module(f'{DEVICES_PACKAGE}.{self.module}'), self.class_name)
+
+
+@dataclass
+class _ClassInfo:
+    module: str
+    name: str
+    bases: list[tuple[str, str]]
+    '''Identification methods' literal return values'''
+    values: dict[str, object]
+    methods: set[str]
+
+
+def get_device_modules() -> list[str]:
+    return sorted(name for _, name, _ in pkgutil.iter_modules(arctis_manager.devices.__path__) if not name.startswith('_'))
+
+
+def _parse_module(module: str, source: str) -> list[_ClassInfo]:
+    tree = ast.parse(source)
+
+    # Names imported from the other device modules, or the DeviceManager base class
+    imports = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module is not None:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = (node.module.removeprefix(f'{DEVICES_PACKAGE}.'), alias.name)
+
+    classes = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        bases = [imports.get(base.id, (module, base.id)) for base in node.bases if isinstance(base, ast.Name)]
+        methods = set(item.name for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)))
+
+        values = {}
+        for item in node.body:
+            if isinstance(item, ast.FunctionDef) and item.name in IDENTIFICATION_METHODS:
+                returns = [statement for statement in item.body if isinstance(statement, ast.Return)]
+                if len(returns) == 1 and returns[0].value is not None:
+                    try:
+                        values[item.name] = ast.literal_eval(returns[0].value)
+                    except ValueError:
+                        pass
+
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name) and decorator.func.id == 'device_manager_factory':
+                product_id, device_name = (ast.literal_eval(arg) for arg in decorator.args)
+                values['get_device_product_id'] = product_id
+                values['get_device_name'] = device_name
+                methods.update(('get_device_product_id', 'get_device_name'))
+
+        classes.append(_ClassInfo(module, node.name, bases, values, methods))
+
+    return classes
+
+
+def scan_device_modules(path: Path = Path(arctis_manager.devices.__path__[0])) -> list[DeviceEntry]:
+    '''
+    Find the device managers by reading the device modules' source, without importing them: the identification comes from
+    the device_manager_factory decorators and from the literal values returned by the identification methods, following
+    the base classes. Abstract classes (missing some of DeviceManager's abstract methods) are skipped.
+    '''
+
+    classes: dict[tuple[str, str], _ClassInfo] = {}
+    for module in get_device_modules():
+        for class_info in _parse_module(module, (path / f'{module}.py').read_text()):
+            classes[(class_info.module, class_info.name)] = class_info
+
+    default_values = {'get_device_vendor_id': DeviceManager.get_device_vendor_id(None)}
+
+    def resolve(class_info: _ClassInfo) -> Optional[tuple[dict[str, object], set[str]]]:
+        '''Values and methods, including the inherited ones. None if the class doesn't extend DeviceManager.'''
+        values, methods, is_device_manager = {}, set(), False
+        for base in class_info.bases:
+            if base[1] == DeviceManager.__name__:
+                values.update(default_values)
+                is_device_manager = True
+            elif base in classes:
+                inherited = resolve(classes[base])
+                if inherited is not None:
+                    values.update(inherited[0])
+                    methods.update(inherited[1])
+                    is_device_manager = True
+
+        if not is_device_manager:
+            return None
+
+        values.update(class_info.values)
+        methods.update(class_info.methods)
+
+        return values, methods
+
+    entries = []
+    for class_info in classes.values():
+        resolved = resolve(class_info)
+        if resolved is None:
+            continue
+
+        values, methods = resolved
+        if not DeviceManager.__abstractmethods__ <= methods or not all(method in values for method in IDENTIFICATION_METHODS):
+            continue
+
+        entries.append(DeviceEntry(
+            values['get_device_vendor_id'], values['get_device_product_id'], values['get_device_name'], class_info.module, class_info.name,
+        ))
+
+    return entries
+
+
+def is_manifest_stale(modules: list[str]) -> bool:
+    try:
+        manifest_mtime = MANIFEST_PATH.stat().st_mtime
+    except OSError:
+        return False
+
+    path = MANIFEST_PATH.parent
+
+    return any(os.stat(path / f'{module}.py').st_mtime > manifest_mtime for module in modules)
+
+
+def load_registry(log: Optional[logging.Logger] = None) -> dict[tuple[int, int], DeviceEntry]:
+    '''
+    Get the supported devices by (vendor ID, product ID), from the generated manifest. The device modules are scanned instead
+    if the manifest is missing or older than them. No device module is imported: see DeviceEntry.load.
+    A frozen build (PyInstaller) always uses its manifest: it has no device module sources to check it against, nor to scan.
+    '''
+
+    frozen = getattr(sys, 'frozen', False)
+    modules = None if frozen else get_device_modules()
+    entries = None
+    try:
+        from arctis_manager.devices._manifest import DEVICES, MODULES
+
+        if frozen or list(MODULES) == modules and not is_manifest_stale(modules):
+            entries = [DeviceEntry(*device) for device in DEVICES]
+    except ImportError:
+        pass
+
+    if entries is None:
+        if log is not None:
+            log.debug('The devices manifest is missing or outdated, scanning the device modules.')
+        entries = scan_device_modules()
+
+    registry = {}
+    for entry in entries:
+        # The first registered class wins
+        registry.setdefault((entry.vendor_id, entry.product_id), entry)
+
+    return registry
+
+
+def write_manifest(path: Path = MANIFEST_PATH) -> None:
+    entries = sorted(scan_device_modules(), key=lambda entry: (entry.module, entry.class_name))
+
+    lines = [
+        '# Generated by `python -m arctis_manager.device_registry`, do not edit.',
+        '# (vendor ID, product ID, device name, module, class)',
+        'MODULES = (',
+        *[f'    {module!r},' for module in get_device_modules()],
+        ')',
+        '',
+        'DEVICES = (',
+        *[f'    (0x{e.vendor_id:04x}, 0x{e.product_id:04x}, {e.name!r}, {e.module!r}, {e.class_name!r}),' for e in entries],
+        ')',
+        '',
+    ]
+
+    path.write_text('\n'.join(lines))
+
+
+if __name__ == '__main__':
+    write_manifest()
+    print(f'Written {MANIFEST_PATH}')
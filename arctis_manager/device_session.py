@@ -0,0 +1,508 @@
+import asyncio
+import errno
+import logging
+import re
+import time
+from typing import Callable, Optional
+
+import usb.core
+
+from arctis_manager.command_runner import CommandRunner
+from arctis_manager.device_manager import DeviceManager, DeviceState, DeviceStatus, InterfaceEndpoint
+from arctis_manager.device_manager.command_scheduler import CommandPriority
+from arctis_manager.latest_value_mailbox import LatestValueMailbox, MailboxClosed
+from arctis_manager.pulse_client import PulseClient, PulseError, SinkInfo
+from arctis_manager.sink_cache import SinkCache
+from arctis_manager.status_poll_scheduler import StatusPollScheduler
+from arctis_manager.status_report_cache import StatusReportCache
+from arctis_manager.volume_change_filter import DEFAULT_DEAD_ZONE_PERCENT, SETTLE_SECONDS, VolumeChangeFilter
+
+DEV_PA_NODES = {
+    'game': 'Arctis_Game',
+    'chat': 'Arctis_Chat',
+}
+NODES_READY_TIMEOUT_SECONDS = 5
+NODES_READY_POLL_SECONDS = 0.05
+# A plugged device's ALSA sink shows up shortly after the device itself
+SINK_READY_TIMEOUT_SECONDS = 5
+# A sink created by the session is indexed by the sink cache once the audio server announced it
+SINK_DESCRIPTION_TIMEOUT_SECONDS = 1
+COMMANDS_DRAIN_TIMEOUT_SECONDS = 1
+
+
+class AudioNodesError(Exception):
+    '''The session's audio nodes can't be set up: only the session is closed, the daemon keeps running.'''
+
+
+def get_pulseaudio_node_names(slot: int) -> dict[str, str]:
+    '''
+    Names of the ChatMix nodes of a session: the first device keeps the historical names, the next ones get
+    a numeric suffix (Arctis_Game_2, Arctis_Chat_2, ...).
+    '''
+
+    if slot == 0:
+        return dict(DEV_PA_NODES)
+
+    return {node_tag: f'{node_name}_{slot + 1}' for node_tag, node_name in DEV_PA_NODES.items()}
+
+
+def is_pulseaudio_node(sink_name: str) -> bool:
+    return any(sink_name == node_name or sink_name.startswith(f'{node_name}_') for node_name in DEV_PA_NODES.values())
+
+
+def get_usb_port_path(device: usb.core.Device) -> Optional[str]:
+    '''
+    Port chain of the device, as found in the sinks' device.bus-path property (e.g. "usb-0:2.3:" for pci-0000:00:14.0-usb-0:2.3:1.0).
+    '''
+
+    try:
+        port_numbers = device.port_numbers
+    except (NotImplementedError, usb.core.USBError):
+        return None
+
+    return f'usb-0:{'.'.join(str(port) for port in port_numbers)}:' if port_numbers else None
+
+
+class DeviceSession:
+    '''
+    Everything tied to an attached device: its transport and command queue, the endpoint listeners, the status polls,
+    the ChatMix audio nodes and the sink volumes. The session lives from the device's attach to its removal
+    (or the daemon's shutdown), while the daemon, its audio server connection and the UI stay up.
+    Each attached device has its own session, whose tasks run independently from the other sessions'. The session in
+    slot 0 owns the default sink.
+    '''
+
+    log: logging.Logger
+
+    device: usb.core.Device
+    device_manager: DeviceManager
+
+    slot: int
+    nodes: dict[str, str]
+    previous_sink: Optional[str]
+
+    command_runner: CommandRunner
+    pulse_client: PulseClient
+    sink_cache: SinkCache
+    volume_mailbox: LatestValueMailbox[str, int]
+    volume_filter: VolumeChangeFilter[str]
+    status_poll_scheduler: StatusPollScheduler
+    status_reports: StatusReportCache
+
+    def __init__(self, device: usb.core.Device, device_manager: DeviceManager, slot: int, pulse_client: PulseClient, sink_cache: SinkCache,
+                 status_callback: Callable[[DeviceManager, DeviceStatus], None],
+                 disconnect_callback: Callable[['DeviceSession'], None],
+                 error_callback: Callable[['DeviceSession', str], None],
+                 log_level: int = logging.INFO, volume_dead_zone: int = DEFAULT_DEAD_ZONE_PERCENT):
+        self.log = logging.getLogger('DeviceSession')
+        self.log.setLevel(log_level)
+
+        self.device = device
+        self.device_manager = device_manager
+        # very important, otherwise the manager won't be able to communicate to the device at init stage
+        self.device_manager.set_device(device)
+
+        self.slot = slot
+        self.nodes = get_pulseaudio_node_names(slot)
+        self.previous_sink = None
+
+        self.command_runner = CommandRunner.get_instance(log_level=log_level)
+        self.pulse_client = pulse_client
+        self.sink_cache = sink_cache
+        self.volume_mailbox = LatestValueMailbox()
+        self.volume_filter = VolumeChangeFilter(volume_dead_zone)
+        self.status_poll_scheduler = StatusPollScheduler(log_level=log_level)
+        self.status_reports = StatusReportCache()
+
+        self.status_callback = status_callback
+        self.disconnect_callback = disconnect_callback
+        self.error_callback = error_callback
+
+        self._closed = False
+        self._nodes_registered = False
+        self._task: Optional[asyncio.Task] = None
+        self._volume_settle_timer: Optional[asyncio.TimerHandle] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self) -> None:
+        try:
+            transport = self.device_manager.open_transport()
+            self.log.debug(f'Using {type(transport).__name__}.')
+        except Exception:
+            self.log.error('Failed to open the device.', exc_info=True)
+            self.error_callback(self, 'opening the device')
+            return
+
+        try:
+            await self._run_tasks()
+        except Exception as e:
+            self.log.error(f'{self.device_manager.get_device_name()} session failed.', exc_info=True)
+            # The daemon closes this session only, the other devices' ones keep running
+            is_audio_error = isinstance(e, AudioNodesError) or isinstance(e, ExceptionGroup) and e.subgroup(AudioNodesError) is not None
+            self.error_callback(self, 'audio nodes setup' if is_audio_error else 'device session')
+
+    async def _run_tasks(self) -> None:
+        async with asyncio.TaskGroup() as tg:
+            # The listeners start first: the device's responses to the init sequence are read by them
+            for interface_endpoint in self.device_manager.get_endpoint_addresses_to_listen():
+                interface = interface_endpoint.interface
+                endpoint = interface_endpoint.endpoint
+
+                self.log.info(f"Starting to listen on device's {interface:02d}.{endpoint:02d}.")
+                tg.create_task(self.listen_usb_endpoint(interface_endpoint))
+
+            tg.create_task(self.sink_volume_writer_loop())
+
+            # The device is initialized while the audio graph is set up
+            self.log.debug('Initializing device.')
+            init_task = tg.create_task(self.device_manager.init_device())
+
+            self.log.info('Registering PulseAudio nodes.')
+            await self.register_pulseaudio_nodes()
+
+            if self.slot == 0:
+                await self.set_default_audio_sink()
+
+            await init_task
+            tg.create_task(self.request_headset_state_loop())
+
+            self.log.debug('Device session started.')
+
+    async def close(self) -> None:
+        '''
+        Stop the session's tasks, release the device and remove the audio nodes.
+        '''
+
+        if self._closed:
+            return
+        self._closed = True
+
+        self.volume_mailbox.close()
+        if self._volume_settle_timer is not None:
+            self._volume_settle_timer.cancel()
+        if self._task is not None and not self._task.done() and self._task is not asyncio.current_task():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+        self.log.debug(f'Sink volume updates: {self.volume_mailbox.get_stats()}, suppressed: {self.volume_filter.suppressed}')
+        self.log.debug(f'Status polls: {self.status_poll_scheduler.polls}, {self.status_poll_scheduler.unchanged} unchanged, '
+                       f'last interval {self.status_poll_scheduler.interval}s')
+        self.log.debug(f'Status reports cache: {self.status_reports}')
+        if self.device_manager.commands is not None:
+            try:
+                await asyncio.wait_for(self.device_manager.commands.drain(), COMMANDS_DRAIN_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self.device_manager.commands.close()
+            self.log.debug(f'Device commands: {self.device_manager.commands.stats}')
+        if self.device_manager.transport is not None:
+            buffers = self.device_manager.transport.buffers
+            self.log.debug(f'Report buffers: {buffers.acquired} reports, {buffers.overflows} read outside of the ring.')
+            await self.device_manager.transport.aclose()
+
+        if self._nodes_registered:
+            self.log.info('Removing PulseAudio nodes.')
+            try:
+                await self.cleanup_pulseaudio_nodes()
+                await self.restore_default_audio_sink()
+            except Exception:
+                self.log.error('Failed to clean up.', exc_info=True)
+
+    async def cleanup_pulseaudio_nodes(self) -> None:
+        # Blindly try to cleanup dirty nodes by removing the ones we're going to create
+        self.log.debug('Cleaning up PulseAudio nodes.')
+        await asyncio.gather(*[self.command_runner.run('pw-cli', 'destroy', node) for node in self.nodes.values()])
+
+    def get_arctis_sink(self) -> str:
+        '''
+        Find the session device's sink: the sinks carrying its vendor and product IDs, preferring the one on its USB port
+        when identical devices are attached. Otherwise, grab the first sink that is Arctis, apart from our own nodes.
+        '''
+
+        sinks = [sink for sink in self.sink_cache.get_sinks() if not is_pulseaudio_node(sink.name)]
+
+        device_sinks = [
+            sink for sink in sinks
+            if self._get_id_property(sink, 'device.vendor.id') == self.device.idVendor
+            and self._get_id_property(sink, 'device.product.id') == self.device.idProduct
+        ]
+        if device_sinks:
+            port_path = get_usb_port_path(self.device)
+
+            return next((
+                sink.name for sink in device_sinks
+                if port_path is not None and port_path in sink.properties.get('device.bus-path', sink.properties.get('device.bus_path', ''))
+            ), device_sinks[0].name)
+
+        arctis = re.compile('.*[aA]rctis.*')
+
+        return next(sink.name for sink in sinks if arctis.match(sink.name))
+
+    @staticmethod
+    def _get_id_property(sink: SinkInfo, key: str) -> Optional[int]:
+        # PipeWire sets "0x1038", PulseAudio "1038"
+        try:
+            return int(sink.properties[key], 16)
+        except (KeyError, ValueError):
+            return None
+
+    async def wait_arctis_sink(self, timeout: float = SINK_READY_TIMEOUT_SECONDS) -> str:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.get_arctis_sink()
+            except StopIteration:
+                # StopIteration can't go through a coroutine
+                if time.monotonic() > deadline:
+                    raise LookupError(f'No sink found for {self.device_manager.get_device_name()} after {timeout}s')
+
+            await asyncio.sleep(NODES_READY_POLL_SECONDS)
+
+    async def create_pulseaudio_node(self, node_tag: str, node_name: str) -> None:
+        result = await self.command_runner.run('pw-cli', 'create-node', 'adapter', f'''{{
+            factory.name=support.null-audio-sink
+            node.name={node_name}
+            node.description="{self.device_manager.get_device_name()} {node_tag.title()}"
+            media.class=Audio/Sink
+            monitor.channel-volumes=true
+            object.linger=true
+            audio.position=[{' '.join([p.value for p in self.device_manager.get_audio_position()])}]
+        }}''')
+
+        if not result.ok:
+            raise Exception(f'pw-cli create-node exited with code {result.returncode} for node {node_name}')
+
+    async def wait_pulseaudio_ports(self, ports: set[str], timeout: float = NODES_READY_TIMEOUT_SECONDS) -> None:
+        '''
+        Wait until all the given output ports exist in the PipeWire graph (nodes are created asynchronously by the server).
+        '''
+
+        deadline = time.monotonic() + timeout
+        while True:
+            result = await self.command_runner.run('pw-link', '--output')
+            missing = ports - set(line.strip() for line in result.stdout.splitlines())
+            if not missing:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Ports not available after {timeout}s: {', '.join(sorted(missing))}')
+
+            await asyncio.sleep(NODES_READY_POLL_SECONDS)
+
+    async def link_pulseaudio_ports(self, output_port: str, input_port: str) -> None:
+        self.log.debug(f'Setting "{output_port}" > "{input_port}"')
+        result = await self.command_runner.run('pw-link', output_port, input_port)
+        if not result.ok:
+            self.log.warning(f'Failed to link "{output_port}" > "{input_port}" (pw-link exit code {result.returncode}).')
+
+    async def register_pulseaudio_nodes(self) -> None:
+        '''
+        Build the audio graph: the game and chat null sinks are created concurrently, and once their monitor ports exist
+        all the channel links towards the Arctis sink are issued in parallel.
+        '''
+
+        timings = {}
+        step_start = time.monotonic()
+
+        def end_step(step: str):
+            nonlocal step_start
+            now = time.monotonic()
+            timings[step] = now - step_start
+            step_start = now
+
+        await self.cleanup_pulseaudio_nodes()
+        end_step('cleanup')
+
+        self.log.debug('Getting Arctis sink.')
+        try:
+            default_sink = await self.wait_arctis_sink()
+            self.log.debug(f"Arctis sink identified as {default_sink}")
+        except Exception as e:
+            raise AudioNodesError('Failed to get the Arctis sink.') from e
+
+        positions = [p.value for p in self.device_manager.get_audio_position()]
+
+        # Create the game and chat nodes
+        self.log.info('Creating PulseAudio Audio/Sink nodes.')
+        self._nodes_registered = True
+        try:
+            await asyncio.gather(*[self.create_pulseaudio_node(node_tag, node_name) for node_tag, node_name in self.nodes.items()])
+            end_step('node creation')
+
+            await self.wait_pulseaudio_ports(set(f'{node}:monitor_{position}' for node in self.nodes.values() for position in positions))
+            end_step('node readiness')
+        except Exception as e:
+            raise AudioNodesError('Failed to create the PulseAudio nodes.') from e
+
+        self.log.info('Setting PulseAudio channel links.')
+        try:
+            await asyncio.gather(*[
+                self.link_pulseaudio_ports(f'{node}:monitor_{position}', f'{default_sink}:playback_{position}')
+                for node in self.nodes.values() for position in positions
+            ])
+            end_step('links')
+        except Exception as e:
+            raise AudioNodesError('Failed to set the nodes\' audio positions.') from e
+
+        self.log.info(f'PulseAudio nodes ready in {sum(timings.values()):.3f}s '
+                      f'({', '.join(f'{step}: {duration:.3f}s' for step, duration in timings.items())}).')
+
+    async def set_default_audio_sink(self) -> None:
+        default_sink = self.nodes['game']
+        self.log.info(f'Setting PulseAudio\'s default sink to {default_sink}.')
+        self.previous_sink = self.sink_cache.default_sink_name
+        await self.set_pa_audio_sink(default_sink)
+
+    async def restore_default_audio_sink(self) -> None:
+        '''
+        Give the default sink back to the one in use before the session started, as our nodes are going away.
+        '''
+
+        if self.previous_sink is None or is_pulseaudio_node(self.previous_sink):
+            return
+
+        await self.set_pa_audio_sink(self.previous_sink)
+
+    async def set_pa_audio_sink(self, sink: str) -> None:
+        result = await self.command_runner.run('pactl', 'set-default-sink', sink)
+        if not result.ok:
+            self.log.warning(f'Failed to set the default sink to {sink} (pactl exit code {result.returncode}).')
+            return
+
+        self.log.notify('Audio sink manager', f'Default audio sink set to "{await self.wait_sink_description(sink)}".')
+
+    async def wait_sink_description(self, sink: str, timeout: float = SINK_DESCRIPTION_TIMEOUT_SECONDS) -> str:
+        '''
+        Returns the sink's description, waiting for the sink cache to index it (e.g. right after the node creation).
+        Falls back to the sink's name.
+        '''
+
+        deadline = time.monotonic() + timeout
+        while True:
+            sink_info = self.sink_cache.get(sink)
+            if sink_info is not None:
+                return sink_info.description
+            if time.monotonic() > deadline:
+                self.log.debug(f'Sink {sink} not indexed after {timeout}s.')
+                return sink
+
+            await asyncio.sleep(NODES_READY_POLL_SECONDS)
+
+    @staticmethod
+    def _normalize_audio(volume, mix):
+        return int(round((volume * mix) * 100, 0))
+
+    async def listen_usb_endpoint(self, interface_endpoint: InterfaceEndpoint) -> None:
+        transport = self.device_manager.transport
+        # Responses to the status request start like the request itself
+        _, status_request = self.device_manager.get_request_device_status()
+        status_prefix = bytes(status_request[:2]) if status_request is not None else None
+
+        while not self._closed:
+            try:
+                read_input = await transport.read(interface_endpoint)
+                self.device_manager.responses.resolve(read_input)
+
+                is_status = status_prefix is not None and read_input[:len(status_prefix)] == status_prefix
+                if is_status:
+                    cached_status = self.status_reports.get(interface_endpoint, read_input)
+                    if cached_status is not None:
+                        # Same report as the previous one: nothing to decode nor to propagate
+                        self.status_poll_scheduler.on_status(cached_status)
+                        continue
+
+                device_state = self.device_manager.manage_input_data(read_input, interface_endpoint)
+
+                if is_status:
+                    if device_state.device_status is not None:
+                        self.status_reports.put(interface_endpoint, read_input, device_state.device_status)
+                        self.status_poll_scheduler.on_status(device_state.device_status)
+                else:
+                    self.status_poll_scheduler.on_unsolicited_report()
+
+                # Hand the changed volumes over to the sink volume writer, without waiting for the audio server
+                self.post_sinks_volume(device_state)
+
+                # Propagate the device status to any registered listener
+                if device_state.device_status is not None:
+                    self.status_callback(self.device_manager, device_state.device_status)
+
+            except Exception as e:
+                if not isinstance(e, usb.core.USBTimeoutError):
+                    if getattr(e, 'errno', None) == errno.ENODEV:  # device not found
+                        self.disconnect_callback(self)
+                    else:
+                        self.log.error('Failed to manage input data.', exc_info=True)
+                        self.error_callback(self, 'USB input management')
+
+                    return
+
+    def post_sinks_volume(self, device_state: DeviceState) -> None:
+        volumes = {
+            'game': self._normalize_audio(device_state.game_volume, device_state.game_mix),
+            'chat': self._normalize_audio(device_state.chat_volume, device_state.chat_mix),
+        }
+
+        for node_tag, volume in volumes.items():
+            if self.volume_filter.accept(node_tag, volume):
+                self.volume_mailbox.post(node_tag, volume)
+
+        # Every report pushes the settle deadline back: the suppressed volumes are applied once the dial stops
+        if self._volume_settle_timer is not None:
+            self._volume_settle_timer.cancel()
+            self._volume_settle_timer = None
+        if self.volume_filter.has_suppressed():
+            self._volume_settle_timer = asyncio.get_running_loop().call_later(SETTLE_SECONDS, self._settle_sinks_volume)
+
+    def _settle_sinks_volume(self) -> None:
+        self._volume_settle_timer = None
+
+        for node_tag in self.nodes:
+            volume = self.volume_filter.settle(node_tag)
+            if volume is not None:
+                self.volume_mailbox.post(node_tag, volume)
+
+    async def sink_volume_writer_loop(self) -> None:
+        '''
+        Apply the latest pending volume of each sink. Intermediate volumes posted while the audio server
+        was busy are skipped (see LatestValueMailbox).
+        '''
+
+        channels = len(self.device_manager.get_audio_position())
+
+        while not self._closed:
+            try:
+                node_tag, volume = await self.volume_mailbox.take()
+            except MailboxClosed:
+                return
+
+            sink = self.nodes[node_tag]
+            try:
+                await self.pulse_client.set_sink_volume(sink, volume, channels)
+            except (PulseError, OSError, asyncio.TimeoutError) as e:
+                self.log.warning(f'Failed to set {sink} volume to {volume}% ({e}).')
+                # Let the next report retry, even if it carries the same volume
+                self.volume_filter.invalidate(node_tag)
+
+    def on_pulse_client_connect(self) -> None:
+        # A (re)started audio server has no memory of the volumes we applied
+        self.volume_filter.invalidate()
+
+    async def request_headset_state_loop(self) -> None:
+        '''
+        Send the headset status request, if configured by the device manager, as often as the status poll scheduler says.
+        Otherwise exit immediately and do nothing.
+        It is expected to read the response from the device in the device manager's manage_input_data function.
+        '''
+
+        interface_endpoint, message = self.device_manager.get_request_device_status()
+        if interface_endpoint is None or message is None:
+            return
+
+        self.device_manager.register_settings_change_callback(self.status_poll_scheduler.on_settings_change)
+
+        # Write errors are reported by the command scheduler, a disconnection is detected by the endpoint listeners
+        while not self._closed:
+            self.device_manager.send_command(interface_endpoint, message, CommandPriority.POLL)
+            await self.status_poll_scheduler.wait()
@@ -0,0 +1,18 @@
+# Generated by `python -m arctis_manager.device_registry`, do not edit.
+# (vendor ID, product ID, device name, module, class)
+MODULES = (
+    'device_arctis_7_plus',
+    'device_arctis_7_plus_alt',
+    'device_arctis_nova_pro_wireless',
+    'device_arctis_nova_pro_wireless_alt',
+    'device_arctis_pro_wired',
+)
+
+DEVICES = (
+    (0x1038, 0x220e, 'Arctis 7+', 'device_arctis_7_plus', 'Arctis7PlusDevice'),
+    (0x1038, 0x2236, 'Arctis 7+ (Destiny)', 'device_arctis_7_plus_alt', 'Arctis7PlusDeviceDestiny'),
+    (0x1038, 0x2212, 'Arctis 7+ (PS5)', 'device_arctis_7_plus_alt', 'Arctis7PlusDevicePS5'),
+    (0x1038, 0x2216, 'Arctis 7+ (Xbox)', 'device_arctis_7_plus_alt', 'Arctis7PlusDeviceXBOX'),
+    (0x1038, 0x12e0, 'Arctis Nova Pro Wireless', 'device_arctis_nova_pro_wireless', 'ArctisNovaProWirelessDevice'),
+    (0x1038, 0x12e5, 'Arctis Nova Pro Wireless X', 'device_arctis_nova_pro_wireless_alt', 'ArctisNovaProWirelessDeviceX'),
+)
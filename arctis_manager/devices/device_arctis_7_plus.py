@@ -1,5 +1,6 @@
 from arctis_manager.device_manager import (DeviceState, DeviceManager,
-                                           DeviceStatus, InterfaceEndpoint)
+                                           InterfaceEndpoint)
+from arctis_manager.device_manager.device_status import EMPTY_DEVICE_STATUS
 
 BATTERY_MIN = 0x00
 BATTERY_MAX = 0x04
@@ -12,12 +13,17 @@ class Arctis7PlusDevice(DeviceManager):
     def get_device_name(self) -> str:
         return 'Arctis 7+'
 
-    def manage_input_data(self, data: list[int], endpoint: InterfaceEndpoint) -> DeviceState:
-        if endpoint == self.utility_guess_endpoint(7, 'in'):
-            # This probably needs some more work. Taken from original project.
-            # see https://github.com/Sapd/HeadsetControl/blob/master/src/devices/steelseries_arctis_7_plus.c#L103
+    def register_report_handlers(self) -> None:
+        # This probably needs some more work. Taken from original project.
+        # see https://github.com/Sapd/HeadsetControl/blob/master/src/devices/steelseries_arctis_7_plus.c#L103
+        # Any report of the endpoint: the game and chat volumes follow the first byte
+        self.reports.register(self.utility_guess_endpoint(7, 'in'), None, None, 'x2B', self._on_volume_report)
 
-            return DeviceState(data[1] / 100, data[2] / 100, 1, 1, DeviceStatus())
+    def _on_volume_report(self, game_volume: int, chat_volume: int) -> DeviceState:
+        return DeviceState(game_volume / 100, chat_volume / 100, 1, 1, EMPTY_DEVICE_STATUS)
+
+    def manage_input_data(self, data: memoryview, endpoint: InterfaceEndpoint) -> DeviceState:
+        return self.dispatch_report(data, endpoint)
 
     def get_endpoint_addresses_to_listen(self) -> list[InterfaceEndpoint]:
         return [self.utility_guess_endpoint(7, 'in')]
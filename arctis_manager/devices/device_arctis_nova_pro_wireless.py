@@ -3,6 +3,8 @@ from typing import Optional
 from arctis_manager.config_manager import ConfigManager
 from arctis_manager.device_manager import (DeviceState, DeviceManager,
                                            DeviceStatus, InterfaceEndpoint)
+from arctis_manager.device_manager.command_scheduler import CommandPriority
+from arctis_manager.device_manager.init_pipeline import InitCommand, InitPipeline
 from arctis_manager.device_manager.device_settings import (DeviceSetting,
                                                            SliderSetting,
                                                            ToggleSetting)
@@ -19,6 +21,40 @@ INACTIVE_TIME_MINUTES = {
 }
 
 STATUS_REQUEST_MESSAGE = [0x06, 0xb0]
+REPORTS_ENDPOINT = InterfaceEndpoint(7, 0)
+
+# Command byte setting each of the local settings (followed by the value)
+SETTING_COMMANDS = {
+    'wireless_mode': 0xc3,
+    'pm_shutdown': 0xc1,
+    'mic_volume': 0x37,
+    'mic_gain': 0x27,
+    'mic_side_tone': 0x39,
+    'mic_led_brightness': 0xbf,
+}
+# Local settings reported by the device, and the decoded status' field reporting each of them
+STATUS_SETTING_FIELDS = {
+    'mic_led_brightness': 'mic_led_brightness',
+    'pm_shutdown': 'auto_off_time_minutes',
+    'wireless_mode': 'wireless_mode',
+}
+
+
+# Status values' mappers, shared by all the decoded status reports
+def map_battery_charge(value: int) -> float:
+    return round(value / 8, 2)
+
+
+def map_noise_cancelling_level(value: int) -> float:
+    return round(value / 10, 0)
+
+
+def map_mic_led_brightness(value: int) -> float:
+    return value / 10
+
+
+def map_inactive_time_minutes(value: int) -> int:
+    return INACTIVE_TIME_MINUTES[value]
 
 
 class ArctisNovaProWirelessDevice(DeviceManager):
@@ -44,6 +80,21 @@ class ArctisNovaProWirelessDevice(DeviceManager):
 
     def save_local_settings(self) -> None:
         ConfigManager.get_instance().save_config(self.get_device_vendor_id(), self.get_device_product_id(), self._local_config)
+        self.save_applied_settings()
+
+    def get_applied_settings(self) -> Optional[dict[str, int]]:
+        '''
+        Returns the settings sent to the device since it was attached, None if it has not been initialized yet.
+        They are kept in the session's runtime directory, cleared at logout: only a daemon restart within the same
+        session finds them, a new session (or a re-plugged device) runs the full initialization.
+        '''
+
+        return ConfigManager.get_instance().get_runtime_state(
+            self.get_device_vendor_id(), self.get_device_product_id(), self.device.bus, self.device.address)
+
+    def save_applied_settings(self) -> None:
+        ConfigManager.get_instance().save_runtime_state(
+            self.get_device_vendor_id(), self.get_device_product_id(), self.device.bus, self.device.address, self._local_config)
 
     def get_device_name(self):
         return 'Arctis Nova Pro Wireless'
@@ -57,107 +108,142 @@ class ArctisNovaProWirelessDevice(DeviceManager):
     def get_request_device_status(self):
         return self.utility_guess_endpoint(7, 'out'), STATUS_REQUEST_MESSAGE
 
-    def init_device(self):
+    def get_transport_type(self):
+        # Interface 7 is a HID one: keep it bound to the kernel driver and read it through hidraw
+        return 'hidraw'
+
+    async def init_device(self):
         '''
         Initializes the GameDAC Gen2, enabling the mixer.
         Kinda obscure, but seems to work on my machine (tm).
         (Packets and sequence taken from the Arctis Nova Pro Wireless via Wireshark)
+
+        If the daemon already initialized the device since it was attached, in the same session (e.g. after a restart,
+        see get_applied_settings), only the settings which differ from the local ones are sent.
         '''
 
         local_settings = self.get_local_settings()
+        endpoint, _ = self.get_request_device_status()
+        pipeline = InitPipeline(self, endpoint, log_level=self.log.level)
 
-        commands = [
-            # Command, expects response
+        applied_settings = self.get_applied_settings()
+        if applied_settings is not None:
+            response = (await pipeline.run([InitCommand(self.packet_0_filler(STATUS_REQUEST_MESSAGE, 64), expects_response=True)]))[0]
+            status = self.dispatch_report(memoryview(response), REPORTS_ENDPOINT) if response is not None else None
+            if isinstance(status, DeviceStatus):
+                # Settings not reported by the device are assumed to be the ones applied last
+                current_settings = {**applied_settings, **{name: getattr(status, field).value for name, field in STATUS_SETTING_FIELDS.items()}}
+                changed = [name for name in SETTING_COMMANDS if current_settings.get(name, None) != local_settings[name]]
+
+                self.log.info(f'Device already initialized, updating {len(changed)} settings.')
+                await pipeline.run([
+                    InitCommand(self.packet_0_filler([0x06, SETTING_COMMANDS[name], local_settings[name]], 64)) for name in changed
+                ])
+                self.save_applied_settings()
 
+                return
+
+            self.log.info('Device status not available, running the full initialization.')
+
+        commands = [
             # Series of queries / responses
-            ([0x06, 0x20], True),
-            ([0x06, 0x20], True),
-            ([0x06, 0x10], True),
-            ([0x06, 0x10], True),
-            ([0x06, 0x10], True),
-            ([0x06, 0x3b], False),  # Correction?
-            ([0x06, 0x8d, 0x01], True),
-            ([0x06, 0x20], True),
-            ([0x06, 0x20], True),
-            ([0x06, 0x20], True),
-            ([0x06, 0x80], True),
-            ([0x06, 0x3b], False),  # Correction?
+            InitCommand([0x06, 0x20], expects_response=True),
+            InitCommand([0x06, 0x20], expects_response=True),
+            InitCommand([0x06, 0x10], expects_response=True),
+            InitCommand([0x06, 0x10], expects_response=True),
+            InitCommand([0x06, 0x10], expects_response=True),
+            InitCommand([0x06, 0x3b]),  # Correction?
+            InitCommand([0x06, 0x8d, 0x01], expects_response=True),
+            InitCommand([0x06, 0x20], expects_response=True),
+            InitCommand([0x06, 0x20], expects_response=True),
+            InitCommand([0x06, 0x20], expects_response=True),
+            InitCommand([0x06, 0x80], expects_response=True),
+            InitCommand([0x06, 0x3b]),  # Correction?
             # Burst of commands (device init?)
-            ([0x06, 0x8d, 0x01], False),
-            ([0x06, 0x33, 0x14, 0x14, 0x14], False),  # Equalizer with 3 bands
-            ([0x06, 0xc3, local_settings['wireless_mode']], False),  # 2.4G mode (0x00: speed, 0x01: range)
-            ([0x06, 0x2e, 0x00], False),  # Set equalizer preset (0)
-            ([0x06, 0xc1, local_settings['pm_shutdown']], False),  # Set inactive time (to 30 minutes, see INACTIVE_TIME_MINUTES)
-            ([0x06, 0x85, 0x0a], False),
-            ([0x06, 0x37, local_settings['mic_volume']], False),  # Mic volume 100% (01 (mute) - a0 (100%))
-            ([0x06, 0xb2], False),
-            ([0x06, 0x47, 0x64, 0x00, 0x64], False),
-            ([0x06, 0x83, 0x01], False),
-            ([0x06, 0x89, 0x00], False),
-            ([0x06, 0x27, local_settings['mic_gain']], False),  # Gain (0x01: low, 0x02: high)
-            ([0x06, 0xb3, 0x00], False),
-            ([0x06, 0x39, local_settings['mic_side_tone']], False),  # Set the sidetone to 0 (off) -> possible values: 0 (off), 1 (low), 2 (medium), 3 (high)
-            ([0x06, 0xbf, local_settings['mic_led_brightness']], False),  # Mute mic led brightness (out of 10)
-            ([0x06, 0x43, 0x01], False),
-            ([0x06, 0x69, 0x00], False),
-            ([0x06, 0x3b, 0x00], False),
-            ([0x06, 0x8d, 0x01], False),
-            ([0x06, 0x49, 0x01], False),
-            ([0x06, 0xb7, 0x00], False),
+            InitCommand([0x06, 0x8d, 0x01]),
+            InitCommand([0x06, 0x33, 0x14, 0x14, 0x14]),  # Equalizer with 3 bands
+            InitCommand([0x06, 0xc3, local_settings['wireless_mode']]),  # 2.4G mode (0x00: speed, 0x01: range)
+            InitCommand([0x06, 0x2e, 0x00]),  # Set equalizer preset (0)
+            InitCommand([0x06, 0xc1, local_settings['pm_shutdown']]),  # Set inactive time (to 30 minutes, see INACTIVE_TIME_MINUTES)
+            InitCommand([0x06, 0x85, 0x0a]),
+            InitCommand([0x06, 0x37, local_settings['mic_volume']]),  # Mic volume 100% (01 (mute) - a0 (100%))
+            InitCommand([0x06, 0xb2]),
+            InitCommand([0x06, 0x47, 0x64, 0x00, 0x64]),
+            InitCommand([0x06, 0x83, 0x01]),
+            InitCommand([0x06, 0x89, 0x00]),
+            InitCommand([0x06, 0x27, local_settings['mic_gain']]),  # Gain (0x01: low, 0x02: high)
+            InitCommand([0x06, 0xb3, 0x00]),
+            InitCommand([0x06, 0x39, local_settings['mic_side_tone']]),  # Set the sidetone to 0 (off) -> possible values: 0 (off), 1 (low), 2 (medium), 3 (high)
+            InitCommand([0x06, 0xbf, local_settings['mic_led_brightness']]),  # Mute mic led brightness (out of 10)
+            InitCommand([0x06, 0x43, 0x01]),
+            InitCommand([0x06, 0x69, 0x00]),
+            InitCommand([0x06, 0x3b, 0x00]),
+            InitCommand([0x06, 0x8d, 0x01]),
+            InitCommand([0x06, 0x49, 0x01]),
+            InitCommand([0x06, 0xb7, 0x00]),
 
             # Another series of queries (perhaps for confirmation?)
-            ([0x06, 0xb7, 0x00], True),
-            ([0x06, 0xb7, 0x00], True),
-            (STATUS_REQUEST_MESSAGE, True),  # Get device status
-            ([0x06, 0x20, 0x00], True),
-            ([0x06, 0xb7, 0x00], True),
+            InitCommand([0x06, 0xb7, 0x00], expects_response=True),
+            InitCommand([0x06, 0xb7, 0x00], expects_response=True),
+            InitCommand(STATUS_REQUEST_MESSAGE, expects_response=True),  # Get device status
+            InitCommand([0x06, 0x20, 0x00], expects_response=True),
+            InitCommand([0x06, 0xb7, 0x00], expects_response=True),
         ]
 
-        endpoint, _ = self.get_request_device_status()
-        self.kernel_detach(endpoint)
-
-        for command in commands:
-            self.send_06_command(command[0], False)
+        commands = [InitCommand(self.packet_0_filler(command.data, 64), command.expects_response) for command in commands]
+
+        await pipeline.run(commands)
+        self.save_applied_settings()
+
+    def register_report_handlers(self) -> None:
+        endpoint = REPORTS_ENDPOINT
+
+        # Volume control is managed by the GameDAC
+        self.reports.register(endpoint, 0x07, 0x25, '2x', self._on_volume_report)
+        self.reports.register(endpoint, 0x07, 0x45, '2x2B', self._on_chat_mix_report)
+        self.reports.register(endpoint, 0x06, 0xb0, '2x14B', self._on_status_report)
+
+    def _on_volume_report(self) -> None:
+        # Volume is data[2]. If needed for any other purpose, it ranges between -56 (0%) and 0 (100%).
+        return None
+
+    def _on_chat_mix_report(self, game_mix: int, chat_mix: int) -> None:
+        self.log.debug('Received volume control data.')
+        self.game_mix = game_mix / 100  # Ranges from 0 to 100
+        self.chat_mix = chat_mix / 100  # Ranges from 0 to 100
+
+        return None
+
+    def _on_status_report(self, bluetooth_powerup_state: int, bluetooth_auto_mute: int, bluetooth_power_status: int, bluetooth_connection: int,
+                          headset_battery_charge: int, charge_slot_battery_charge: int, transparent_noise_cancelling_level: int, mic_status: int,
+                          noise_cancelling: int, mic_led_brightness: int, auto_off_time_minutes: int, wireless_mode: int, wireless_pairing: int,
+                          headset_power_status: int) -> DeviceStatus:
+        # https://github.com/Sapd/HeadsetControl/blob/master/src/devices/steelseries_arctis_nova_pro_wireless.c#L242
+        return DeviceStatus(
+            bluetooth_powerup_state=DeviceStatusValue(bluetooth_powerup_state, 'on_off.off' if bluetooth_powerup_state == 0x00 else 'on_off.on'),
+            bluetooth_auto_mute=DeviceStatusValue(bluetooth_auto_mute, 'on_off.off' if bluetooth_auto_mute ==
+                                                  0x00 else 'db.-12db' if bluetooth_auto_mute == 0x01 else 'on_off.on'),
+            bluetooth_power_status=DeviceStatusValue(bluetooth_power_status, 'on_off.off' if bluetooth_power_status == 0x01 else 'on_off.on'),
+            bluetooth_connection=DeviceStatusValue(bluetooth_connection, 'on_off.off' if bluetooth_connection ==
+                                                   0x00 else 'connection.connected' if bluetooth_connection == 0x01 else 'connection.disconnected'),
+            headset_battery_charge=DeviceStatusValue(headset_battery_charge, mapped_val=map_battery_charge),
+            charge_slot_battery_charge=DeviceStatusValue(charge_slot_battery_charge, mapped_val=map_battery_charge),
+            transparent_noise_cancelling_level=DeviceStatusValue(transparent_noise_cancelling_level, mapped_val=map_noise_cancelling_level),
+            mic_status=DeviceStatusValue(mic_status, 'mic_status.unmuted' if mic_status == 0x00 else 'mic_status.muted'),
+            noise_cancelling=DeviceStatusValue(noise_cancelling, 'on_off.off' if noise_cancelling ==
+                                               0x00 else 'anc.transparent' if noise_cancelling == 0x01 else 'on_off.on'),
+            mic_led_brightness=DeviceStatusValue(mic_led_brightness, mapped_val=map_mic_led_brightness),
+            auto_off_time_minutes=DeviceStatusValue(auto_off_time_minutes, mapped_val=map_inactive_time_minutes),
+            wireless_mode=DeviceStatusValue(wireless_mode, 'wireless_mode.speed' if wireless_mode == 0x00 else 'wireless_mode.range'),
+            wireless_pairing=DeviceStatusValue(wireless_pairing, 'pairing.not_paired' if wireless_pairing ==
+                                               0x01 else 'pairing.paired_offline' if wireless_mode == 0x04 else 'connection.connected'),
+            headset_power_status=DeviceStatusValue(headset_power_status, 'connection.offline' if headset_power_status ==
+                                                   0x01 else 'connection.cable_charging' if wireless_pairing == 0x02 else 'connection.online'),
+        )
 
-    def manage_input_data(self, data: list[int], endpoint: InterfaceEndpoint) -> DeviceState:
+    def manage_input_data(self, data: memoryview, endpoint: InterfaceEndpoint) -> DeviceState:
         volume = 1
-        device_status = None
-
-        if endpoint == InterfaceEndpoint(7, 0):
-            # Volume control is managed by the GameDAC
-            if len(data) >= 2 and data[0] == 0x07 and data[1] == 0x25:
-                # Volume is data[2]. If needed for any other purpose, it ranges between -56 (0%) and 0 (100%).
-                pass
-
-            elif len(data) >= 4 and data[0] == 0x07 and data[1] == 0x45:
-                self.log.debug('Received volume control data.')
-                self.game_mix = data[2] / 100  # Ranges from 0 to 100
-                self.chat_mix = data[3] / 100  # Ranges from 0 to 100
-            elif len(data) >= 16 and data[0] == 0x06 and data[1] == 0xb0:
-                # https://github.com/Sapd/HeadsetControl/blob/master/src/devices/steelseries_arctis_nova_pro_wireless.c#L242
-                device_status = DeviceStatus(
-                    bluetooth_powerup_state=DeviceStatusValue(data[2], 'on_off.off' if data[2] == 0x00 else 'on_off.on'),
-                    bluetooth_auto_mute=DeviceStatusValue(data[3], 'on_off.off' if data[3] == 0x00 else 'db.-12db' if data[3] == 0x01 else 'on_off.on'),
-                    bluetooth_power_status=DeviceStatusValue(data[4], 'on_off.off' if data[4] == 0x01 else 'on_off.on'),
-                    bluetooth_connection=DeviceStatusValue(data[5], 'on_off.off' if data[5] ==
-                                                           0x00 else 'connection.connected' if data[5] == 0x01 else 'connection.disconnected'),
-                    headset_battery_charge=DeviceStatusValue(data[6], mapped_val=lambda x: round(x / 8, 2)),
-                    charge_slot_battery_charge=DeviceStatusValue(data[7], mapped_val=lambda x: round(x / 8, 2)),
-                    transparent_noise_cancelling_level=DeviceStatusValue(data[8], mapped_val=lambda x: round(x / 10, 0)),
-                    mic_status=DeviceStatusValue(data[9], 'mic_status.unmuted' if data[9] == 0x00 else 'mic_status.muted'),
-                    noise_cancelling=DeviceStatusValue(data[10], 'on_off.off' if data[10] == 0x00 else 'anc.transparent' if data[10] == 0x01 else 'on_off.on'),
-                    mic_led_brightness=DeviceStatusValue(data[11], mapped_val=lambda x: x / 10),
-                    auto_off_time_minutes=DeviceStatusValue(data[12], mapped_val=lambda x: INACTIVE_TIME_MINUTES[x]),
-                    wireless_mode=DeviceStatusValue(data[13], 'wireless_mode.speed' if data[13] == 0x00 else 'wireless_mode.range'),
-                    wireless_pairing=DeviceStatusValue(data[14], 'pairing.not_paired' if data[14] ==
-                                                       0x01 else 'pairing.paired_offline' if data[13] == 0x04 else 'connection.connected'),
-                    headset_power_status=DeviceStatusValue(data[15], 'connection.offline' if data[15] ==
-                                                           0x01 else 'connection.cable_charging' if data[14] == 0x02 else 'connection.online'),
-                )
-            else:
-                self.log.debug(f'Incoming data from {endpoint.interface}, {endpoint.endpoint}: [{':'.join(hex(x)[2:] for x in data)}]')
-        else:
-            self.log.debug(f'Incoming data from {endpoint.interface}, {endpoint.endpoint}: [{':'.join(hex(x)[2:] for x in data)}]')
+        device_status = self.dispatch_report(data, endpoint)
 
         return DeviceState(
             game_volume=volume,
@@ -244,10 +330,7 @@ class ArctisNovaProWirelessDevice(DeviceManager):
 
         self.send_06_command(STATUS_REQUEST_MESSAGE)
 
-    def send_06_command(self, command: list[int], kernel_detach: bool = False) -> None:
+    def send_06_command(self, command: list[int], priority: CommandPriority = CommandPriority.USER) -> None:
         endpoint, _ = self.get_request_device_status()
-        commands_endpoint_address = self.device[0].interfaces()[endpoint.interface].endpoints()[endpoint.endpoint].bEndpointAddress
-        if kernel_detach:
-            self.kernel_detach(endpoint)
 
-        self.device.write(commands_endpoint_address, self.packet_0_filler(command, 64))
+        self.send_command(endpoint, self.packet_0_filler(command, 64), priority)
@@ -2,6 +2,15 @@ from typing import Callable
 from arctis_manager.device_manager.device_status import DeviceStatus
 from arctis_manager.translations import TranslatableText
 
+# Device status fields rendered by get_translated_menu_entries
+MENU_STATUS_FIELDS = (
+    'headset_power_status', 'headset_battery_charge', 'charge_slot_battery_charge',
+    'mic_status', 'mic_led_brightness',
+    'noise_cancelling', 'transparent_noise_cancelling_level',
+    'wireless_pairing', 'wireless_mode',
+    'bluetooth_powerup_state', 'bluetooth_power_status', 'bluetooth_auto_mute', 'bluetooth_connection',
+)
+
 
 def str_or_none(v):
     return str(v) if v is not None else None
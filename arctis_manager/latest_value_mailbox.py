@@ -0,0 +1,82 @@
+import asyncio
+from typing import Generic, TypeVar
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class MailboxClosed(Exception):
+    pass
+
+
+class LatestValueMailbox(Generic[K, V]):
+    '''
+    Coalescing hand-off between a fast producer and a slow consumer.
+    Every key holds at most one pending value: posting a newer value replaces the pending one (latest value wins),
+    so the consumer only ever applies the most recent state and the producer never waits for it.
+    '''
+
+    posted: dict[K, int]
+    skipped: dict[K, int]
+    taken: dict[K, int]
+
+    def __init__(self):
+        self._pending: dict[K, V] = {}
+        self._event = asyncio.Event()
+        self._closed = False
+
+        self.posted = {}
+        self.skipped = {}
+        self.taken = {}
+
+    def post(self, key: K, value: V) -> None:
+        '''
+        Store the value as the pending one for the key, replacing (and counting as skipped) any value not yet taken.
+        '''
+
+        if self._closed:
+            return
+
+        if key in self._pending:
+            self.skipped[key] = self.skipped.get(key, 0) + 1
+
+        self.posted[key] = self.posted.get(key, 0) + 1
+        self._pending[key] = value
+        self._event.set()
+
+    async def take(self) -> tuple[K, V]:
+        '''
+        Wait for a pending value and return it, oldest key first.
+        Raises MailboxClosed once the mailbox has been closed.
+        '''
+
+        while not self._pending:
+            if self._closed:
+                raise MailboxClosed()
+            self._event.clear()
+            await self._event.wait()
+
+        key = next(iter(self._pending))
+        value = self._pending.pop(key)
+        self.taken[key] = self.taken.get(key, 0) + 1
+
+        return key, value
+
+    def close(self) -> None:
+        '''
+        Discard the pending values and wake up any consumer.
+        '''
+
+        self._closed = True
+        self._pending.clear()
+        self._event.set()
+
+    def get_stats(self) -> dict[K, dict[str, int]]:
+        return {
+            key: {
+                'posted': self.posted.get(key, 0),
+                'taken': self.taken.get(key, 0),
+                'skipped': self.skipped.get(key, 0),
+            }
+            for key in self.posted.keys()
+        }
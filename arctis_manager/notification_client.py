@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from dbus_next import Message, MessageType, Variant
+
+from arctis_manager.dbus_session import get_session_bus
+
+APP_NAME = 'Arctis Manager'
+EXPIRE_TIMEOUT_MS = 2000
+# Minimum time between two notifications of the same category: bursts are coalesced into the latest one
+MIN_INTERVAL_SECONDS = 1.0
+
+URGENCY_LEVELS = {'low': 0, 'normal': 1, 'critical': 2}
+
+
+@dataclass(frozen=True)
+class Notification:
+    summary: str
+    body: str
+    urgency: Literal['low', 'normal', 'critical']
+
+
+class NotificationClient:
+    '''
+    Client for the org.freedesktop.Notifications service, on the application's session bus.
+    Each category owns a single notification, which is updated in place (replaces_id) instead of stacking new ones,
+    and bursts of notifications of the same category are rate limited, only showing the latest one.
+    '''
+
+    log: logging.Logger
+
+    sent: int
+    coalesced: int
+
+    @staticmethod
+    def get_instance(log_level: int = logging.INFO) -> 'NotificationClient':
+        if not hasattr(NotificationClient, '_instance'):
+            NotificationClient._instance = NotificationClient(log_level=log_level)
+
+        return NotificationClient._instance
+
+    def __init__(self, log_level: int = logging.INFO):
+        self.log = logging.getLogger('NotificationClient')
+        self.log.setLevel(log_level)
+
+        self.sent = 0
+        self.coalesced = 0
+
+        self._notification_ids: dict[str, int] = {}
+        self._last_sent: dict[str, float] = {}
+        self._pending: dict[str, Notification] = {}
+        self._flush_tasks: dict[str, asyncio.Task] = {}
+        self._drain_event: Optional[asyncio.Event] = None
+
+    def notify(self, summary: str, body: str, urgency: Literal['low', 'normal', 'critical'] = 'normal', category: Optional[str] = None) -> bool:
+        '''
+        Queue the notification, returning False if it can't be delivered (no running event loop).
+        The category defaults to the summary.
+        '''
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        category = category or summary
+        if category in self._pending:
+            self.coalesced += 1
+        self._pending[category] = Notification(summary, body, urgency)
+
+        if category not in self._flush_tasks:
+            self._flush_tasks[category] = loop.create_task(self._flush(category))
+
+        return True
+
+    async def drain(self) -> None:
+        '''
+        Send the pending notifications right away, ignoring the rate limit.
+        '''
+
+        if self._drain_event is None:
+            self._drain_event = asyncio.Event()
+        self._drain_event.set()
+
+        await asyncio.gather(*self._flush_tasks.values(), return_exceptions=True)
+
+    async def _flush(self, category: str) -> None:
+        try:
+            # Notifications queued while sending are picked up by the next iteration
+            while category in self._pending:
+                wait = self._last_sent.get(category, 0) + MIN_INTERVAL_SECONDS - time.monotonic()
+                if wait > 0:
+                    if self._drain_event is None:
+                        self._drain_event = asyncio.Event()
+                    try:
+                        await asyncio.wait_for(self._drain_event.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+
+                notification = self._pending.pop(category, None)
+                if notification is not None:
+                    await self._send(category, notification)
+        finally:
+            if self._flush_tasks.get(category, None) is asyncio.current_task():
+                del self._flush_tasks[category]
+
+    async def _send(self, category: str, notification: Notification) -> None:
+        self._last_sent[category] = time.monotonic()
+
+        try:
+            bus = await get_session_bus()
+            reply = await bus.call(Message(
+                destination='org.freedesktop.Notifications',
+                path='/org/freedesktop/Notifications',
+                interface='org.freedesktop.Notifications',
+                member='Notify',
+                signature='susssasa{sv}i',
+                body=[
+                    APP_NAME, self._notification_ids.get(category, 0), '',
+                    notification.summary, notification.body, [],
+                    {'urgency': Variant('y', URGENCY_LEVELS.get(notification.urgency, 1))},
+                    EXPIRE_TIMEOUT_MS,
+                ],
+            ))
+        except Exception as e:
+            self.log.info(f'NOTIFICATION: {notification.summary} :: {notification.body} (not delivered: {e})')
+            return
+
+        if reply.message_type == MessageType.ERROR:
+            self.log.info(f'NOTIFICATION: {notification.summary} :: {notification.body} (not delivered: {reply.error_name})')
+            return
+
+        self._notification_ids[category] = reply.body[0]
+        self.sent += 1
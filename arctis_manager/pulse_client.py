@@ -0,0 +1,628 @@
+import asyncio
+import logging
+import os
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+# Native protocol commands (see pulsecore/native-common.h)
+COMMAND_ERROR = 0
+COMMAND_REPLY = 2
+COMMAND_AUTH = 8
+COMMAND_SET_CLIENT_NAME = 9
+COMMAND_GET_SERVER_INFO = 20
+COMMAND_GET_SINK_INFO = 21
+COMMAND_GET_SINK_INFO_LIST = 22
+COMMAND_SUBSCRIBE = 35
+COMMAND_SET_SINK_VOLUME = 36
+COMMAND_SUBSCRIBE_EVENT = 66
+
+# Subscription masks and event bits (see pulse/def.h)
+SUBSCRIPTION_MASK_SINK = 0x0001
+SUBSCRIPTION_MASK_SERVER = 0x0080
+SUBSCRIPTION_EVENT_FACILITY_MASK = 0x0F
+SUBSCRIPTION_EVENT_SINK = 0x00
+SUBSCRIPTION_EVENT_SERVER = 0x07
+SUBSCRIPTION_EVENT_TYPE_MASK = 0x30
+SUBSCRIPTION_EVENT_NEW = 0x00
+SUBSCRIPTION_EVENT_CHANGE = 0x10
+SUBSCRIPTION_EVENT_REMOVE = 0x20
+
+PROTOCOL_VERSION = 32
+CHANNEL_COMMAND = 0xFFFFFFFF
+INVALID_INDEX = 0xFFFFFFFF
+VOLUME_NORM = 0x10000
+COOKIE_LENGTH = 256
+
+FRAME_HEADER = struct.Struct('>IIIII')
+
+# Tagstruct type tags
+TAG_STRING = b't'
+TAG_STRING_NULL = b'N'
+TAG_U32 = b'L'
+TAG_U8 = b'B'
+TAG_U64 = b'R'
+TAG_USEC = b'U'
+TAG_BOOLEAN_TRUE = b'1'
+TAG_BOOLEAN_FALSE = b'0'
+TAG_ARBITRARY = b'x'
+TAG_SAMPLE_SPEC = b'a'
+TAG_CHANNEL_MAP = b'm'
+TAG_CVOLUME = b'v'
+TAG_VOLUME = b'V'
+TAG_PROPLIST = b'P'
+TAG_FORMAT_INFO = b'f'
+
+# Channel positions (see pulse/channelmap.h), as named by pactl
+CHANNEL_POSITION_NAMES = [
+    'mono', 'front-left', 'front-right', 'front-center', 'rear-center', 'rear-left', 'rear-right', 'lfe',
+    'front-left-of-center', 'front-right-of-center', 'side-left', 'side-right',
+    *[f'aux{i}' for i in range(32)],
+    'top-center', 'top-front-left', 'top-front-right', 'top-front-center', 'top-rear-left', 'top-rear-right', 'top-rear-center',
+]
+
+RECONNECT_MIN_DELAY_SECONDS = 0.5
+RECONNECT_MAX_DELAY_SECONDS = 30
+REQUEST_TIMEOUT_SECONDS = 5
+
+
+class PulseError(Exception):
+    '''Error returned by the audio server, or raised when the connection is unusable.'''
+
+    def __init__(self, message: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class TagStructWriter:
+    '''Serializer for the PulseAudio native protocol "tagstruct" payloads.'''
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def put_u32(self, value: int) -> 'TagStructWriter':
+        self._buffer += TAG_U32 + struct.pack('>I', value)
+        return self
+
+    def put_u8(self, value: int) -> 'TagStructWriter':
+        self._buffer += TAG_U8 + struct.pack('>B', value)
+        return self
+
+    def put_string(self, value: Optional[str]) -> 'TagStructWriter':
+        if value is None:
+            self._buffer += TAG_STRING_NULL
+        else:
+            self._buffer += TAG_STRING + value.encode('utf-8') + b'\0'
+        return self
+
+    def put_arbitrary(self, value: bytes) -> 'TagStructWriter':
+        self._buffer += TAG_ARBITRARY + struct.pack('>I', len(value)) + value
+        return self
+
+    def put_cvolume(self, volumes: list[int]) -> 'TagStructWriter':
+        self._buffer += TAG_CVOLUME + struct.pack(f'>B{len(volumes)}I', len(volumes), *volumes)
+        return self
+
+    def put_proplist(self, properties: dict[str, str]) -> 'TagStructWriter':
+        self._buffer += TAG_PROPLIST
+        for key, value in properties.items():
+            data = value.encode('utf-8') + b'\0'
+            self.put_string(key)
+            self.put_u32(len(data))
+            self.put_arbitrary(data)
+        self.put_string(None)
+        return self
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._buffer)
+
+
+class TagStructReader:
+    '''Deserializer for the PulseAudio native protocol "tagstruct" payloads.'''
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._offset = 0
+
+    def _expect(self, tag: bytes) -> None:
+        found = self._data[self._offset:self._offset + 1]
+        if found != tag:
+            raise PulseError(f'Unexpected tag {found!r} (expected {tag!r}) at offset {self._offset}.')
+        self._offset += 1
+
+    def get_u32(self) -> int:
+        self._expect(TAG_U32)
+        value, = struct.unpack_from('>I', self._data, self._offset)
+        self._offset += 4
+        return value
+
+    def get_u8(self) -> int:
+        self._expect(TAG_U8)
+        value = self._data[self._offset]
+        self._offset += 1
+        return value
+
+    def _get_u64(self, tag: bytes) -> int:
+        self._expect(tag)
+        value, = struct.unpack_from('>Q', self._data, self._offset)
+        self._offset += 8
+        return value
+
+    def get_u64(self) -> int:
+        return self._get_u64(TAG_U64)
+
+    def get_usec(self) -> int:
+        return self._get_u64(TAG_USEC)
+
+    def get_bool(self) -> bool:
+        tag = self._data[self._offset:self._offset + 1]
+        if tag not in (TAG_BOOLEAN_TRUE, TAG_BOOLEAN_FALSE):
+            raise PulseError(f'Unexpected tag {tag!r} (expected a boolean) at offset {self._offset}.')
+        self._offset += 1
+        return tag == TAG_BOOLEAN_TRUE
+
+    def get_volume(self) -> int:
+        self._expect(TAG_VOLUME)
+        value, = struct.unpack_from('>I', self._data, self._offset)
+        self._offset += 4
+        return value
+
+    def get_sample_spec(self) -> tuple[int, int, int]:
+        '''Returns (format, channels, rate)'''
+        self._expect(TAG_SAMPLE_SPEC)
+        value = struct.unpack_from('>BBI', self._data, self._offset)
+        self._offset += 6
+        return value
+
+    def get_channel_map(self) -> tuple[str, ...]:
+        self._expect(TAG_CHANNEL_MAP)
+        channels = self._data[self._offset]
+        positions = self._data[self._offset + 1:self._offset + 1 + channels]
+        self._offset += 1 + channels
+        return tuple(CHANNEL_POSITION_NAMES[p] if p < len(CHANNEL_POSITION_NAMES) else str(p) for p in positions)
+
+    def get_cvolume(self) -> tuple[int, ...]:
+        self._expect(TAG_CVOLUME)
+        channels = self._data[self._offset]
+        values = struct.unpack_from(f'>{channels}I', self._data, self._offset + 1)
+        self._offset += 1 + 4 * channels
+        return values
+
+    def get_arbitrary(self) -> bytes:
+        self._expect(TAG_ARBITRARY)
+        length, = struct.unpack_from('>I', self._data, self._offset)
+        value = self._data[self._offset + 4:self._offset + 4 + length]
+        self._offset += 4 + length
+        return value
+
+    def get_proplist(self) -> dict[str, str]:
+        self._expect(TAG_PROPLIST)
+        properties = {}
+        while True:
+            key = self.get_string()
+            if key is None:
+                return properties
+            self.get_u32()  # length, repeated by the arbitrary value
+            properties[key] = self.get_arbitrary().rstrip(b'\0').decode('utf-8', errors='replace')
+
+    def get_format_info(self) -> tuple[int, dict[str, str]]:
+        '''Returns (encoding, properties)'''
+        self._expect(TAG_FORMAT_INFO)
+        return self.get_u8(), self.get_proplist()
+
+    def get_string(self) -> Optional[str]:
+        if self._data[self._offset:self._offset + 1] == TAG_STRING_NULL:
+            self._offset += 1
+            return None
+
+        self._expect(TAG_STRING)
+        end = self._data.index(b'\0', self._offset)
+        value = self._data[self._offset:end].decode('utf-8')
+        self._offset = end + 1
+        return value
+
+    def eof(self) -> bool:
+        return self._offset >= len(self._data)
+
+
+@dataclass(frozen=True)
+class ServerInfo:
+    server_name: str
+    server_version: str
+    default_sink_name: Optional[str]
+    default_source_name: Optional[str]
+
+
+@dataclass(frozen=True)
+class SinkInfo:
+    index: int
+    name: str
+    description: str
+    '''Channel position names, for example ('front-left', 'front-right')'''
+    channel_map: tuple[str, ...]
+    '''Raw volume per channel (VOLUME_NORM is 100%)'''
+    volume: tuple[int, ...]
+    mute: bool
+    '''Property list, for example device.vendor.id or device.bus-path (empty before protocol version 13)'''
+    properties: dict[str, str] = field(default_factory=dict, compare=False, hash=False)
+
+    def get_volume_percentages(self) -> tuple[int, ...]:
+        return tuple(int(round(v * 100 / VOLUME_NORM)) for v in self.volume)
+
+
+def read_server_info(reader: TagStructReader) -> ServerInfo:
+    server_name = reader.get_string()
+    server_version = reader.get_string()
+    reader.get_string()  # user name
+    reader.get_string()  # host name
+    reader.get_sample_spec()
+    default_sink_name = reader.get_string()
+    default_source_name = reader.get_string()
+
+    return ServerInfo(server_name, server_version, default_sink_name, default_source_name)
+
+
+def read_sink_info(reader: TagStructReader, protocol_version: int) -> SinkInfo:
+    '''
+    Read one sink entry (see sink_fill_tagstruct in pulsecore/protocol-native.c), consuming all its fields
+    so that the reader is positioned on the next entry of a list reply.
+    '''
+
+    index = reader.get_u32()
+    name = reader.get_string()
+    description = reader.get_string()
+    reader.get_sample_spec()
+    channel_map = reader.get_channel_map()
+    reader.get_u32()  # owner module
+    volume = reader.get_cvolume()
+    mute = reader.get_bool()
+    reader.get_u32()  # monitor source index
+    reader.get_string()  # monitor source name
+    reader.get_usec()  # latency
+    reader.get_string()  # driver
+    reader.get_u32()  # flags
+
+    properties = {}
+    if protocol_version >= 13:
+        properties = reader.get_proplist()
+        reader.get_usec()  # configured latency
+
+    if protocol_version >= 15:
+        reader.get_volume()  # base volume
+        reader.get_u32()  # state
+        reader.get_u32()  # volume steps
+        reader.get_u32()  # card
+
+    if protocol_version >= 16:
+        for _ in range(reader.get_u32()):
+            reader.get_string()  # port name
+            reader.get_string()  # port description
+            reader.get_u32()  # port priority
+            if protocol_version >= 24:
+                reader.get_u32()  # port availability
+        reader.get_string()  # active port
+
+    if protocol_version >= 21:
+        for _ in range(reader.get_u8()):
+            reader.get_format_info()
+
+    return SinkInfo(index, name, description or name, channel_map, volume, mute, properties)
+
+
+def get_socket_path() -> Optional[str]:
+    '''
+    Resolve the native protocol socket, honoring PULSE_SERVER (unix sockets only) and falling back to the
+    per-user runtime socket, which is also served by pipewire-pulse.
+    '''
+
+    server = os.getenv('PULSE_SERVER')
+    if server:
+        for entry in server.split():
+            entry = entry.removeprefix('unix:')
+            if entry.startswith('/'):
+                return entry
+
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'pulse', 'native')
+
+    return None
+
+
+def get_auth_cookie() -> bytes:
+    '''
+    Read the authentication cookie. pipewire-pulse ignores it, PulseAudio requires it for non-anonymous clients.
+    '''
+
+    candidates = [
+        os.getenv('PULSE_COOKIE'),
+        os.path.join(os.getenv('XDG_CONFIG_HOME', os.path.expanduser('~/.config')), 'pulse', 'cookie'),
+        os.path.expanduser('~/.pulse-cookie'),
+    ]
+
+    for candidate in candidates:
+        if candidate is None:
+            continue
+        try:
+            cookie = Path(candidate).read_bytes()
+            if len(cookie) >= COOKIE_LENGTH:
+                return cookie[:COOKIE_LENGTH]
+        except OSError:
+            continue
+
+    return bytes(COOKIE_LENGTH)
+
+
+class PulseClient:
+    '''
+    Persistent client for the PulseAudio native protocol (served by both PulseAudio and pipewire-pulse).
+    Holds a single connection to the audio server and sends requests as protocol messages, reconnecting
+    in the background whenever the connection drops.
+    '''
+
+    log: logging.Logger
+
+    connect_callbacks: list[Callable[['PulseClient'], Awaitable[None]]]
+    subscription_callbacks: list[Callable[[int, int], None]]
+
+    def __init__(self, client_name: str = 'Arctis Manager', socket_path: Optional[str] = None, log_level: int = logging.INFO):
+        self.log = logging.getLogger('PulseClient')
+        self.log.setLevel(log_level)
+
+        self.client_name = client_name
+        self.socket_path = socket_path
+
+        self.connect_callbacks = []
+        self.subscription_callbacks = []
+
+        self.server_version: Optional[int] = None
+        self.protocol_version: Optional[int] = None
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+        self._next_tag = 0
+        self._pending: dict[int, asyncio.Future] = {}
+        self._closing = False
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def register_connect_callback(self, callback: Callable[['PulseClient'], Awaitable[None]]) -> None:
+        '''
+        Register a coroutine function that is awaited after each (re)connection, e.g. to restore server-side state.
+        '''
+        self.connect_callbacks.append(callback)
+
+    def register_subscription_callback(self, callback: Callable[[int, int], None]) -> None:
+        '''
+        Register a function receiving (event, index) for each subscription event sent by the server.
+        '''
+        self.subscription_callbacks.append(callback)
+
+    async def start(self) -> None:
+        '''
+        Connect, or keep trying in the background if the audio server is not available yet.
+        '''
+
+        try:
+            await self.connect()
+        except (PulseError, OSError) as e:
+            self.log.warning(f'Unable to connect to the audio server yet ({e}), retrying in background.')
+            if self._reconnect_task is None or self._reconnect_task.done():
+                self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def connect(self) -> None:
+        '''
+        Connect and authenticate, if not connected already.
+        '''
+
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.connected:
+                return
+
+            self._closing = False
+
+            socket_path = self.socket_path or get_socket_path()
+            if socket_path is None:
+                raise PulseError('Unable to locate the PulseAudio native socket.')
+
+            self.log.debug(f'Connecting to {socket_path}.')
+            self._reader, self._writer = await asyncio.open_unix_connection(socket_path)
+            self._read_task = asyncio.create_task(self._read_loop())
+
+            try:
+                reply = await self.request(
+                    COMMAND_AUTH,
+                    TagStructWriter().put_u32(PROTOCOL_VERSION).put_arbitrary(get_auth_cookie())
+                )
+                self.server_version = reply.get_u32() & 0xFFFF
+                self.protocol_version = min(PROTOCOL_VERSION, self.server_version)
+
+                await self.request(
+                    COMMAND_SET_CLIENT_NAME,
+                    TagStructWriter().put_proplist({'application.name': self.client_name})
+                )
+            except Exception:
+                self._drop_connection()
+                raise
+
+            self.log.info(f'Connected to the audio server (protocol version {self.protocol_version}).')
+
+        for callback in self.connect_callbacks:
+            try:
+                await callback(self)
+            except Exception:
+                self.log.error('Failed to run the connection callback.', exc_info=True)
+
+    async def close(self) -> None:
+        self._closing = True
+
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+        self._drop_connection()
+
+    async def request(self, command: int, payload: Optional[TagStructWriter] = None, timeout: float = REQUEST_TIMEOUT_SECONDS) -> TagStructReader:
+        '''
+        Send a command and wait for its reply, returning a reader positioned right after the command header.
+        '''
+
+        if self._writer is None:
+            raise PulseError('Not connected to the audio server.')
+
+        tag = self._next_tag
+        self._next_tag = (self._next_tag + 1) & 0xFFFFFFFF
+
+        header = TagStructWriter().put_u32(command).put_u32(tag).to_bytes()
+        body = header + (payload.to_bytes() if payload is not None else b'')
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = future
+
+        try:
+            self._writer.write(FRAME_HEADER.pack(len(body), CHANNEL_COMMAND, 0, 0, 0) + body)
+            await self._writer.drain()
+
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(tag, None)
+
+    async def set_sink_volume(self, sink_name: str, percentage: int, channels: int = 2) -> None:
+        '''
+        Set the volume of all the channels of the given sink, as "pactl set-sink-volume <sink> <percentage>%" would.
+        '''
+
+        await self.connect()
+
+        volume = int(round(percentage * VOLUME_NORM / 100))
+        await self.request(
+            COMMAND_SET_SINK_VOLUME,
+            TagStructWriter().put_u32(INVALID_INDEX).put_string(sink_name).put_cvolume([volume] * channels)
+        )
+
+    async def get_server_info(self) -> ServerInfo:
+        await self.connect()
+
+        return read_server_info(await self.request(COMMAND_GET_SERVER_INFO))
+
+    async def get_sink_info(self, index: int) -> SinkInfo:
+        await self.connect()
+
+        reply = await self.request(COMMAND_GET_SINK_INFO, TagStructWriter().put_u32(index).put_string(None))
+        return read_sink_info(reply, self.protocol_version)
+
+    async def get_sink_info_list(self) -> list[SinkInfo]:
+        await self.connect()
+
+        reply = await self.request(COMMAND_GET_SINK_INFO_LIST)
+        sinks = []
+        while not reply.eof():
+            sinks.append(read_sink_info(reply, self.protocol_version))
+
+        return sinks
+
+    async def subscribe(self, mask: int) -> None:
+        '''
+        Enable the server's subscription events for the given facilities (the subscription is lost on reconnection).
+        '''
+
+        await self.connect()
+
+        await self.request(COMMAND_SUBSCRIBE, TagStructWriter().put_u32(mask))
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                header = await self._reader.readexactly(FRAME_HEADER.size)
+                length, channel, _, _, _ = FRAME_HEADER.unpack(header)
+                payload = await self._reader.readexactly(length)
+
+                if channel != CHANNEL_COMMAND:
+                    # Memory block (stream data), not used by this client
+                    continue
+
+                self._on_packet(payload)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            if not self._closing:
+                self.log.warning(f'Lost connection to the audio server ({e}).')
+        except asyncio.CancelledError:
+            return
+        except Exception:
+            self.log.error('Failed to read from the audio server.', exc_info=True)
+
+        self._drop_connection(cancel_read_task=False)
+
+        if not self._closing:
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    def _on_packet(self, payload: bytes) -> None:
+        reader = TagStructReader(payload)
+        command = reader.get_u32()
+        tag = reader.get_u32()
+
+        future = self._pending.get(tag)
+        if future is None or future.done():
+            self.on_command(command, tag, reader)
+            return
+
+        if command == COMMAND_REPLY:
+            future.set_result(reader)
+        elif command == COMMAND_ERROR:
+            code = reader.get_u32()
+            future.set_exception(PulseError(f'Audio server error {code}.', code))
+        else:
+            self.on_command(command, tag, reader)
+
+    def on_command(self, command: int, tag: int, reader: TagStructReader) -> None:
+        '''
+        Handle a server-initiated command.
+        '''
+
+        if command != COMMAND_SUBSCRIBE_EVENT:
+            self.log.debug(f'Ignoring command {command} from the audio server.')
+            return
+
+        event = reader.get_u32()
+        index = reader.get_u32()
+        for callback in self.subscription_callbacks:
+            try:
+                callback(event, index)
+            except Exception:
+                self.log.error('Failed to handle the subscription event.', exc_info=True)
+
+    async def _reconnect_loop(self) -> None:
+        delay = RECONNECT_MIN_DELAY_SECONDS
+        while not self._closing:
+            await asyncio.sleep(delay)
+            try:
+                await self.connect()
+                return
+            except (PulseError, OSError) as e:
+                self.log.debug(f'Reconnection to the audio server failed ({e}), retrying in {delay}s.')
+                delay = min(delay * 2, RECONNECT_MAX_DELAY_SECONDS)
+
+    def _drop_connection(self, cancel_read_task: bool = True) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+        if cancel_read_task and self._read_task is not None and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(PulseError('Connection to the audio server lost.'))
+        self._pending.clear()
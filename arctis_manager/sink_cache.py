@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Optional
+
+from arctis_manager.pulse_client import (SUBSCRIPTION_EVENT_FACILITY_MASK,
+                                         SUBSCRIPTION_EVENT_REMOVE,
+                                         SUBSCRIPTION_EVENT_SERVER,
+                                         SUBSCRIPTION_EVENT_SINK,
+                                         SUBSCRIPTION_EVENT_TYPE_MASK,
+                                         SUBSCRIPTION_MASK_SERVER,
+                                         SUBSCRIPTION_MASK_SINK, PulseClient,
+                                         PulseError, SinkInfo)
+
+
+class SinkCache:
+    '''
+    In-memory index of the audio server's sinks and of its default sink.
+    It is filled once per connection and then kept current from the server's subscription events,
+    so that lookups never hit the audio server (nor spawn any process).
+    '''
+
+    log: logging.Logger
+    client: PulseClient
+
+    default_sink_name: Optional[str]
+
+    def __init__(self, client: PulseClient, log_level: int = logging.INFO):
+        self.log = logging.getLogger('SinkCache')
+        self.log.setLevel(log_level)
+
+        self.client = client
+        self.default_sink_name = None
+
+        self._sinks_by_name: dict[str, SinkInfo] = {}
+        self._names_by_index: dict[int, str] = {}
+
+        self._dirty_sinks: set[int] = set()
+        self._server_dirty = False
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.client.register_connect_callback(self._on_connect)
+        self.client.register_subscription_callback(self._on_subscription_event)
+
+    def get(self, sink_name: str) -> Optional[SinkInfo]:
+        return self._sinks_by_name.get(sink_name, None)
+
+    def get_sinks(self) -> list[SinkInfo]:
+        return list(self._sinks_by_name.values())
+
+    def get_description(self, sink_name: Optional[str]) -> str:
+        sink = self._sinks_by_name.get(sink_name, None) if sink_name is not None else None
+
+        return sink.description if sink is not None else 'Unknown'
+
+    def get_default_sink_description(self) -> str:
+        return self.get_description(self.default_sink_name)
+
+    async def _on_connect(self, client: PulseClient) -> None:
+        await client.subscribe(SUBSCRIPTION_MASK_SINK | SUBSCRIPTION_MASK_SERVER)
+
+        server_info = await client.get_server_info()
+        sinks = await client.get_sink_info_list()
+
+        self.default_sink_name = server_info.default_sink_name
+        self._sinks_by_name = {sink.name: sink for sink in sinks}
+        self._names_by_index = {sink.index: sink.name for sink in sinks}
+
+        self.log.debug(f'Indexed {len(sinks)} sinks, default sink: {self.default_sink_name}.')
+
+    def _on_subscription_event(self, event: int, index: int) -> None:
+        facility = event & SUBSCRIPTION_EVENT_FACILITY_MASK
+        event_type = event & SUBSCRIPTION_EVENT_TYPE_MASK
+
+        if facility == SUBSCRIPTION_EVENT_SINK:
+            if event_type == SUBSCRIPTION_EVENT_REMOVE:
+                self._dirty_sinks.discard(index)
+                name = self._names_by_index.pop(index, None)
+                if name is not None:
+                    self._sinks_by_name.pop(name, None)
+                return
+
+            self._dirty_sinks.add(index)
+        elif facility == SUBSCRIPTION_EVENT_SERVER:
+            self._server_dirty = True
+        else:
+            return
+
+        # A single task fetches all the entries which changed in the meantime
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        while self._dirty_sinks or self._server_dirty:
+            try:
+                if self._server_dirty:
+                    self._server_dirty = False
+                    self.default_sink_name = (await self.client.get_server_info()).default_sink_name
+
+                if self._dirty_sinks:
+                    index = self._dirty_sinks.pop()
+                    try:
+                        sink = await self.client.get_sink_info(index)
+                    except PulseError as e:
+                        if e.code is None:
+                            raise
+                        # The sink disappeared before we could fetch it (a removal event will follow)
+                        continue
+
+                    previous_name = self._names_by_index.get(index, None)
+                    if previous_name is not None and previous_name != sink.name:
+                        self._sinks_by_name.pop(previous_name, None)
+
+                    self._sinks_by_name[sink.name] = sink
+                    self._names_by_index[index] = sink.name
+            except (PulseError, OSError, asyncio.TimeoutError) as e:
+                # The cache gets rebuilt on reconnection
+                self.log.debug(f'Failed to refresh the sinks cache ({e}).')
+                return
@@ -0,0 +1,99 @@
+import dataclasses
+import logging
+from dataclasses import dataclass
+from typing import Callable, Generic, Iterable, Optional, TypeVar
+
+from arctis_manager.device_manager import DeviceManager, DeviceStatus
+from arctis_manager.device_manager.device_status import DeviceStatusValue
+
+T = TypeVar('T')
+
+STATUS_FIELDS = tuple(field.name for field in dataclasses.fields(DeviceStatus))
+
+
+@dataclass(frozen=True, slots=True)
+class StatusFieldChange(Generic[T]):
+    '''Change of a single field (a DeviceStatus attribute name) between two consecutive statuses of a device'''
+    field: str
+    '''None on the first status of the device'''
+    old: Optional[DeviceStatusValue[T]]
+    new: DeviceStatusValue[T]
+
+
+StatusChangeCallback = Callable[[DeviceManager, DeviceStatus, list[StatusFieldChange]], None]
+
+
+def diff_statuses(old: Optional[DeviceStatus], new: DeviceStatus, fields: Iterable[str] = STATUS_FIELDS) -> list[StatusFieldChange]:
+    '''
+    Get the fields which differ between the two statuses. Without a previous status, all the fields are changed.
+    '''
+
+    if old is None:
+        return [StatusFieldChange(field, None, getattr(new, field)) for field in fields]
+
+    if old is new:
+        return []
+
+    changes = []
+    for field in fields:
+        old_value, new_value = getattr(old, field), getattr(new, field)
+        if old_value != new_value:
+            changes.append(StatusFieldChange(field, old_value, new_value))
+
+    return changes
+
+
+class StatusDiffEngine:
+    '''
+    Compares each device's status with its previous one, and notifies the subscribers of the changed fields only:
+    a subscriber is called with the device manager, the new status and the changes of the fields it subscribed to,
+    and only if any of them changed.
+    '''
+
+    log: logging.Logger
+
+    def __init__(self, log_level: int = logging.INFO):
+        self.log = logging.getLogger('StatusDiffEngine')
+        self.log.setLevel(log_level)
+
+        self._statuses: dict[DeviceManager, DeviceStatus] = {}
+        self._subscribers: list[tuple[StatusChangeCallback, Optional[frozenset[str]]]] = []
+
+    def subscribe(self, callback: StatusChangeCallback, fields: Optional[Iterable[str]] = None) -> None:
+        '''
+        Register a function receiving the changes of the given DeviceStatus fields (by default, of all of them).
+        '''
+
+        if fields is not None:
+            fields = frozenset(fields)
+            unknown_fields = fields.difference(STATUS_FIELDS)
+            if unknown_fields:
+                raise ValueError(f'Unknown device status fields: {", ".join(sorted(unknown_fields))}')
+
+        self._subscribers.append((callback, fields))
+
+    def update(self, device_manager: DeviceManager, status: DeviceStatus) -> list[StatusFieldChange]:
+        '''
+        Record the device's new status and notify the subscribers of its changes, which are returned.
+        '''
+
+        changes = diff_statuses(self._statuses.get(device_manager, None), status)
+        self._statuses[device_manager] = status
+        if not changes:
+            return changes
+
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(f'{device_manager.get_device_name()} status changed: {", ".join(change.field for change in changes)}')
+
+        for callback, fields in self._subscribers:
+            subscribed_changes = changes if fields is None else [change for change in changes if change.field in fields]
+            if subscribed_changes:
+                callback(device_manager, status, subscribed_changes)
+
+        return changes
+
+    def forget(self, device_manager: DeviceManager) -> None:
+        '''
+        Drop the status of a detached device: its next status (if attached again) is a first one.
+        '''
+        self._statuses.pop(device_manager, None)
@@ -0,0 +1,114 @@
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Optional
+
+from arctis_manager.device_manager import DeviceStatus
+
+DEFAULT_INTERVAL_SECONDS = 5
+# Poll shortly after a setting change, to show its effect
+SETTINGS_CHANGE_INTERVAL_SECONDS = 1
+MAX_INTERVAL_SECONDS = 60
+MAX_OFFLINE_INTERVAL_SECONDS = 120
+BACKOFF_FACTOR = 2
+
+LOW_BATTERY_THRESHOLD = 0.25
+LOW_BATTERY_MAX_INTERVAL_SECONDS = 15
+
+
+class StatusPollScheduler:
+    '''
+    Decides when the next device status request is sent.
+    The interval doubles each time the status comes back unchanged (up to MAX_INTERVAL_SECONDS, or
+    MAX_OFFLINE_INTERVAL_SECONDS while the headset is offline), and is capped while the battery is low.
+    It goes back to the default interval as soon as the status changes or the device sends a report on its own
+    (the user is interacting with it), and a setting change triggers a poll right after it.
+    '''
+
+    log: logging.Logger
+
+    interval: float
+
+    polls: int
+    unchanged: int
+
+    def __init__(self, log_level: int = logging.INFO):
+        self.log = logging.getLogger('StatusPollScheduler')
+        self.log.setLevel(log_level)
+
+        self.interval = DEFAULT_INTERVAL_SECONDS
+
+        self.polls = 0
+        self.unchanged = 0
+
+        self._last_values: Optional[tuple] = None
+        self._last_poll_at = time.monotonic()
+        self._next_poll_at = self._last_poll_at
+        self._rescheduled: Optional[asyncio.Event] = None
+
+    async def wait(self) -> None:
+        '''
+        Wait until the next status request is due.
+        '''
+
+        if self._rescheduled is None:
+            self._rescheduled = asyncio.Event()
+
+        while True:
+            self._rescheduled.clear()
+            delay = self._next_poll_at - time.monotonic()
+            if delay <= 0:
+                break
+
+            try:
+                await asyncio.wait_for(self._rescheduled.wait(), delay)
+            except asyncio.TimeoutError:
+                break
+
+        self.polls += 1
+        self._last_poll_at = time.monotonic()
+        # Until the response arrives (if ever), the next poll keeps the current interval
+        self._next_poll_at = self._last_poll_at + self.interval
+
+    def on_status(self, status: DeviceStatus) -> None:
+        values = tuple(getattr(status, field.name).value for field in dataclasses.fields(status))
+
+        if values != self._last_values:
+            self.interval = DEFAULT_INTERVAL_SECONDS
+        else:
+            self.unchanged += 1
+            self.interval = min(self.interval * BACKOFF_FACTOR, MAX_OFFLINE_INTERVAL_SECONDS if self._is_offline(status) else MAX_INTERVAL_SECONDS)
+
+        if self._is_battery_low(status):
+            self.interval = min(self.interval, LOW_BATTERY_MAX_INTERVAL_SECONDS)
+
+        self._last_values = values
+        self._reschedule(self._last_poll_at + self.interval)
+
+    def on_unsolicited_report(self) -> None:
+        if self.interval > DEFAULT_INTERVAL_SECONDS:
+            self.interval = DEFAULT_INTERVAL_SECONDS
+            self._reschedule(min(self._next_poll_at, time.monotonic() + self.interval))
+
+    def on_settings_change(self) -> None:
+        self.interval = DEFAULT_INTERVAL_SECONDS
+        self._reschedule(min(self._next_poll_at, time.monotonic() + SETTINGS_CHANGE_INTERVAL_SECONDS))
+
+    def _reschedule(self, next_poll_at: float) -> None:
+        self._next_poll_at = next_poll_at
+
+        if self._rescheduled is not None:
+            self._rescheduled.set()
+
+    @staticmethod
+    def _is_offline(status: DeviceStatus) -> bool:
+        return status.headset_power_status.value_translation_key == 'connection.offline'
+
+    @staticmethod
+    def _is_battery_low(status: DeviceStatus) -> bool:
+        battery = status.headset_battery_charge
+        if battery.value is None or battery.mapped_val is None:
+            return False
+
+        return battery.mapped_val(battery.value) <= LOW_BATTERY_THRESHOLD
@@ -0,0 +1,43 @@
+from typing import Optional
+
+from arctis_manager.device_manager import DeviceStatus, InterfaceEndpoint
+
+
+class StatusReportCache:
+    '''
+    Last raw status report read on each endpoint, with the status it was decoded to.
+    Between two polls the status report is almost always identical: such a report is neither decoded
+    nor propagated to the status listeners again.
+    '''
+
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+        self._reports: dict[InterfaceEndpoint, tuple[bytes, DeviceStatus]] = {}
+
+    def get(self, endpoint: InterfaceEndpoint, data: memoryview) -> Optional[DeviceStatus]:
+        '''
+        Get the status decoded from the previous report of the endpoint, if the report didn't change.
+        '''
+
+        cached = self._reports.get(endpoint, None)
+        if cached is not None and cached[0] == data:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        return None
+
+    def put(self, endpoint: InterfaceEndpoint, data: memoryview, status: DeviceStatus) -> None:
+        # The data is a view over a reused buffer
+        self._reports[endpoint] = (bytes(data), status)
+
+    def __str__(self) -> str:
+        reports = self.hits + self.misses
+        rate = self.hits / reports if reports else 0
+
+        return f'{reports} status reports, {self.hits} unchanged ({rate:.0%}) not decoded nor propagated'
@@ -6,15 +6,17 @@ from typing import Any, Callable, Optional
 
 from PyQt6 import QtSvg
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QIcon, QImage, QPainter, QPalette, QPixmap
+from PyQt6.QtGui import QIcon, QImage, QPainter, QPalette, QPixmap
 from PyQt6.QtWidgets import QApplication, QMenu, QSystemTrayIcon
 
 from arctis_manager.device_manager import DeviceStatus
 from arctis_manager.device_manager.device_manager import DeviceManager
-from arctis_manager.i18n_helpers import get_translated_menu_entries
+from arctis_manager.i18n_helpers import MENU_STATUS_FIELDS, get_translated_menu_entries
 from arctis_manager.qt_utils import get_icon_pixmap
 from arctis_manager.settings_window import SettingsWindow
+from arctis_manager.status_diff import StatusFieldChange
 from arctis_manager.translations import Translations
+from arctis_manager.tray_menu_model import MenuEntry, MenuEntryKind, TrayMenuModel
 
 
 class SystrayApp:
@@ -23,7 +25,9 @@ class SystrayApp:
     app: QApplication
     tray_icon: QSystemTrayIcon
     menu: QMenu
+    menu_model: TrayMenuModel
     last_device_status: Optional[DeviceStatus] = None
+    device_statuses: dict[DeviceManager, DeviceStatus]
 
     def get_systray_icon_pixmap(self, path: Path) -> QPixmap:
         brush_color = QApplication.palette().color(QPalette.ColorRole.Text)
@@ -70,8 +74,14 @@ class SystrayApp:
         lang_code = lang_code.split('_')[0]
 
         self.menu = QMenu()
+        self.menu_model = TrayMenuModel(self.menu)
         self.tray_icon.setContextMenu(self.menu)
 
+        self.device_statuses = {}
+        self._device_menu_entries: dict[DeviceManager, list[MenuEntry]] = {}
+        self._has_settings: dict[DeviceManager, bool] = {}
+        self._settings_windows: dict[DeviceManager, SettingsWindow] = {}
+
     def setup_logger(self, log_level: int):
         self.log = logging.getLogger('SystrayApp')
         self.log.setLevel(log_level)
@@ -90,61 +100,98 @@ class SystrayApp:
         self.log.debug('Received shutdown signal, shutting down.')
         self.app.quit()
 
-    def on_device_status_update(self, device_manager: DeviceManager, status: DeviceStatus) -> None:
+    def on_device_status_update(self, device_manager: DeviceManager, status: DeviceStatus, changes: list[StatusFieldChange]) -> None:
+        '''
+        Called when any field of the device status changes. The latest status is always kept (e.g. the settings window is
+        opened with it), the menu and the settings window are only updated when a field they render (MENU_STATUS_FIELDS) changes.
+        '''
+
         if device_manager is None or status is None:
             return
 
-        self.menu.clear()
-        if not hasattr(self, '_menu_actions'):
-            self._menu_actions = {}
-
-        menu_sections = get_translated_menu_entries(status).values()
-        menu_sections_flatlist = [v for sublist in menu_sections for v in sublist]
-
-        has_previous_section = False
-        for section in menu_sections:
-            if has_previous_section:
-                self.menu.addSeparator()
-            has_previous_section = True
-
-            for item in section:
-                if item.dot_notation_key not in self._menu_actions:
-                    self._menu_actions[item.dot_notation_key] = QAction(str(item))
-                    self._menu_actions[item.dot_notation_key].setEnabled(False)
-                else:
-                    self._menu_actions[item.dot_notation_key].setText(str(item))
+        self.device_statuses[device_manager] = status
+        # The first attached device is the one exposed by the (device agnostic) D-Bus methods
+        if next(iter(self.device_statuses)) is device_manager:
+            self.last_device_status = status
 
-                self.menu.addAction(self._menu_actions[item.dot_notation_key])
-
-        if has_previous_section:
-            self.menu.addSeparator()
-
-        self._device_manager = device_manager
-        self.last_device_status = status
-
-        if len(device_manager.get_configurable_settings(self.last_device_status).keys()) > 0:
-            if not '_settings' in self._menu_actions:
-                self._menu_actions['_settings'] = QAction(Translations.get_instance().get_translation('app.settings_label'))
-                self._menu_actions['_settings'].triggered.connect(self.open_settings_window)
-            self.menu.addAction(self._menu_actions['_settings'])
+        if not any(change.field in MENU_STATUS_FIELDS for change in changes):
+            return
 
-        # Menu cleanup
-        expected_menu_keys = ['_settings', *[t.dot_notation_key for t in menu_sections_flatlist]]
-        for key in self._menu_actions.keys():
-            if key not in expected_menu_keys:
-                self.menu.removeAction(self._menu_actions[key])
-                del self._menu_actions[key]
+        self._device_menu_entries[device_manager] = self.get_device_menu_entries(device_manager, status)
+        self.update_menu()
 
         # Update values in (opened) settings window
-        if hasattr(self, '_settings_window'):
-            self._settings_window.update_status(self.last_device_status)
+        if device_manager in self._settings_windows:
+            self._settings_windows[device_manager].update_status(status)
+
+    def on_device_detach(self, device_manager: DeviceManager) -> None:
+        self.device_statuses.pop(device_manager, None)
+        self.last_device_status = next(iter(self.device_statuses.values()), None)
+        self._device_menu_entries.pop(device_manager, None)
+        self._has_settings.pop(device_manager, None)
+
+        settings_window = self._settings_windows.pop(device_manager, None)
+        if settings_window is not None:
+            settings_window.hide()
+            settings_window.deleteLater()
+
+        self.update_menu()
+
+    def get_device_menu_entries(self, device_manager: DeviceManager, status: DeviceStatus) -> list[MenuEntry]:
+        device_key = f'{device_manager.device.bus}-{device_manager.device.address}'
+        entries = []
+
+        for section, items in get_translated_menu_entries(status).items():
+            for item in items:
+                entries.append(MenuEntry(f'{device_key}.{item.dot_notation_key}', str(item)))
+            entries.append(MenuEntry(f'{device_key}.{section.dot_notation_key}._separator', kind=MenuEntryKind.SEPARATOR))
+
+        # The configurable settings don't depend on the status
+        if device_manager not in self._has_settings:
+            self._has_settings[device_manager] = len(device_manager.get_configurable_settings(status).keys()) > 0
+        if self._has_settings[device_manager]:
+            entries.append(MenuEntry(
+                f'{device_key}._settings', Translations.get_instance().get_translation('app.settings_label'), enabled=True,
+                on_triggered=lambda manager=device_manager: self.open_settings_window(manager),
+            ))
+
+        return entries
+
+    def update_menu(self) -> None:
+        '''
+        Update the menu from the devices' last entries (see get_device_menu_entries): only the changed texts are set,
+        and actions are only added or removed when the sections or the devices change.
+        '''
+
+        entries = []
+        # With several devices, each one gets its own titled section
+        has_device_sections = len(self._device_menu_entries) > 1
+
+        for device_manager, device_entries in self._device_menu_entries.items():
+            if has_device_sections:
+                device_key = f'{device_manager.device.bus}-{device_manager.device.address}'
+                entries.append(MenuEntry(f'{device_key}._section', device_manager.get_device_name(), MenuEntryKind.SECTION))
+            entries.extend(device_entries)
+
+        self.menu_model.update(entries)
+
+    def open_settings_window(self, device_manager: Optional[DeviceManager] = None):
+        '''
+        Open the settings of the given device (by default, the first attached one).
+        '''
+
+        if device_manager is None:
+            device_manager = next(iter(self.device_statuses), None)
+        if device_manager is None:
+            return
 
-    def open_settings_window(self):
-        if hasattr(self, '_settings_window') and self._settings_window.isVisible():
-            self._settings_window.raise_()
+        settings_window = self._settings_windows.get(device_manager, None)
+        if settings_window is not None and settings_window.isVisible():
+            settings_window.raise_()
             return
 
-        self._settings_window = SettingsWindow(self._device_manager, self.last_device_status)
-        self._settings_window.setWindowFlags(Qt.WindowType.Window)
+        settings_window = SettingsWindow(device_manager, self.device_statuses[device_manager])
+        settings_window.setWindowFlags(Qt.WindowType.Window)
+        self._settings_windows[device_manager] = settings_window
 
-        self._settings_window.show()
+        settings_window.show()
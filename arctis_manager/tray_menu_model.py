@@ -0,0 +1,83 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Optional
+
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QMenu
+
+
+class MenuEntryKind(Enum):
+    ACTION = 'action'
+    '''Titled separator'''
+    SECTION = 'section'
+    SEPARATOR = 'separator'
+
+
+@dataclass(frozen=True, slots=True)
+class MenuEntry:
+    '''Stable identifier of the entry, across the menu updates'''
+    key: str
+    text: str = ''
+    kind: MenuEntryKind = MenuEntryKind.ACTION
+    enabled: bool = False
+    '''Connected when the entry's action is created'''
+    on_triggered: Optional[Callable[[], None]] = field(default=None, compare=False)
+
+
+class TrayMenuModel:
+    '''
+    Keeps a QMenu in sync with a list of entries, without clearing it: each entry has its own action for as long as
+    its key is in the menu. An update only changes the text of the actions whose text changed, and only adds, removes
+    or moves actions when the entries' keys (e.g. the sections shown) change.
+    '''
+
+    menu: QMenu
+
+    def __init__(self, menu: QMenu):
+        self.menu = menu
+
+        self._actions: dict[str, QAction] = {}
+        self._texts: dict[str, str] = {}
+        self._keys: list[str] = []
+
+    def update(self, entries: list[MenuEntry]) -> None:
+        keys = [entry.key for entry in entries]
+
+        for entry in entries:
+            if entry.key not in self._actions:
+                self._actions[entry.key] = self._create_action(entry)
+            elif self._texts[entry.key] != entry.text:
+                self._actions[entry.key].setText(entry.text)
+            self._texts[entry.key] = entry.text
+
+        if keys != self._keys:
+            self._update_layout(keys)
+
+    def _create_action(self, entry: MenuEntry) -> QAction:
+        action = QAction(entry.text, self.menu)
+        action.setSeparator(entry.kind != MenuEntryKind.ACTION)
+        action.setEnabled(entry.enabled)
+        if entry.on_triggered is not None:
+            action.triggered.connect(lambda _=False, callback=entry.on_triggered: callback())
+
+        return action
+
+    def _update_layout(self, keys: list[str]) -> None:
+        expected_keys = set(keys)
+        for key in [key for key in self._actions if key not in expected_keys]:
+            action = self._actions.pop(key)
+            del self._texts[key]
+            self.menu.removeAction(action)
+            action.deleteLater()
+
+        # Only the actions out of place are (re)inserted
+        actions = self.menu.actions()
+        for index, key in enumerate(keys):
+            action = self._actions[key]
+            if index < len(actions) and actions[index] is action:
+                continue
+
+            self.menu.insertAction(actions[index] if index < len(actions) else None, action)
+            actions = self.menu.actions()
+
+        self._keys = keys
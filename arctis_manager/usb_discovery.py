@@ -0,0 +1,79 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import Mapping, Optional, TypeVar
+
+import usb.core
+
+SYSFS_USB_DEVICES = '/sys/bus/usb/devices'
+
+T = TypeVar('T')
+
+
+@dataclass(frozen=True)
+class UsbDeviceId:
+    vendor_id: int
+    product_id: int
+    bus: int
+    address: int
+
+
+def _read_sysfs_attribute(path: str, base: int) -> int:
+    with open(path, 'r') as attribute:
+        return int(attribute.read().strip(), base)
+
+
+def scan_sysfs(root: str = SYSFS_USB_DEVICES) -> Optional[list[UsbDeviceId]]:
+    '''
+    List the USB devices from sysfs, without opening them. Returns None if sysfs is not available.
+    '''
+
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return None
+
+    devices = []
+    for entry in entries:
+        # Interfaces ("1-2:1.0") have no device descriptor attributes
+        if ':' in entry.name:
+            continue
+
+        try:
+            devices.append(UsbDeviceId(
+                _read_sysfs_attribute(os.path.join(entry.path, 'idVendor'), 16),
+                _read_sysfs_attribute(os.path.join(entry.path, 'idProduct'), 16),
+                _read_sysfs_attribute(os.path.join(entry.path, 'busnum'), 10),
+                _read_sysfs_attribute(os.path.join(entry.path, 'devnum'), 10),
+            ))
+        except (OSError, ValueError):
+            # Removed while scanning, or not a device
+            continue
+
+    return devices
+
+
+def find_devices(registry: Mapping[tuple[int, int], T], log: Optional[logging.Logger] = None,
+                 sysfs_root: str = SYSFS_USB_DEVICES) -> list[tuple[T, usb.core.Device]]:
+    '''
+    Find the attached devices whose (vendor ID, product ID) is in the registry, returning them with their registry entry.
+    The bus is enumerated once, whatever the number of registered models: sysfs tells which (bus, address) are
+    supported devices, and libusb only enumerates if there's any. Without sysfs, libusb's single pass is filtered
+    on the registry.
+    '''
+
+    candidates = scan_sysfs(sysfs_root)
+    if candidates is not None:
+        addresses = set((device.bus, device.address) for device in candidates if (device.vendor_id, device.product_id) in registry)
+        if log is not None:
+            log.debug(f'Found {len(addresses)} supported devices out of {len(candidates)} USB devices in sysfs.')
+        if not addresses:
+            return []
+
+        def match(device: usb.core.Device) -> bool:
+            return (device.bus, device.address) in addresses
+    else:
+        def match(device: usb.core.Device) -> bool:
+            return (device.idVendor, device.idProduct) in registry
+
+    return [(registry[(device.idVendor, device.idProduct)], device) for device in usb.core.find(find_all=True, custom_match=match)]
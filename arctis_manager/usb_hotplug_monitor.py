@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import socket
+from dataclasses import dataclass
+from typing import Callable, Literal, Optional
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast group of the kernel's uevents (udev re-broadcasts them on group 2, in its own format)
+UEVENT_KERNEL_GROUP = 1
+UEVENT_BUFFER_SIZE = 16384
+
+
+@dataclass(frozen=True)
+class UsbHotplugEvent:
+    action: Literal['add', 'remove']
+    vendor_id: int
+    product_id: int
+    bus: int
+    address: int
+
+
+def parse_uevent(message: bytes) -> Optional[UsbHotplugEvent]:
+    '''
+    Parse a kernel uevent ("action@devpath" header, then KEY=VALUE entries, NUL-separated).
+    Only the add / remove events of whole USB devices (not their interfaces) are returned.
+    '''
+
+    entries = message.split(b'\0')
+    if not entries or b'@' not in entries[0]:
+        return None
+
+    properties = {}
+    for entry in entries[1:]:
+        key, separator, value = entry.partition(b'=')
+        if separator:
+            properties[key.decode('ascii', errors='replace')] = value.decode('ascii', errors='replace')
+
+    action = properties.get('ACTION', None)
+    if action not in ('add', 'remove') or properties.get('SUBSYSTEM', None) != 'usb' or properties.get('DEVTYPE', None) != 'usb_device':
+        return None
+
+    try:
+        # PRODUCT is "<vendor>/<product>/<bcdDevice>", in hexadecimal without leading zeros
+        vendor_id, product_id, _ = (int(value, 16) for value in properties['PRODUCT'].split('/'))
+        bus = int(properties['BUSNUM'])
+        address = int(properties['DEVNUM'])
+    except (KeyError, ValueError):
+        return None
+
+    return UsbHotplugEvent(action, vendor_id, product_id, bus, address)
+
+
+class UsbHotplugMonitor:
+    '''
+    Listens to the kernel's USB device add / remove events on a netlink socket, watched by the event loop.
+    '''
+
+    log: logging.Logger
+
+    def __init__(self, callback: Callable[[UsbHotplugEvent], None], log_level: int = logging.INFO):
+        self.log = logging.getLogger('UsbHotplugMonitor')
+        self.log.setLevel(log_level)
+
+        self.callback = callback
+
+        self._socket: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        '''
+        Start listening. Raises OSError if netlink sockets are not available (e.g. in some containers).
+        '''
+
+        self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC, NETLINK_KOBJECT_UEVENT)
+        # Port ID 0: assigned by the kernel
+        self._socket.bind((0, UEVENT_KERNEL_GROUP))
+
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._socket.fileno(), self._on_readable)
+
+        self.log.debug('Listening to USB hotplug events.')
+
+    def stop(self) -> None:
+        if self._socket is None:
+            return
+
+        self._loop.remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+
+    def _on_readable(self) -> None:
+        while self._socket is not None:
+            try:
+                message, (sender_pid, _) = self._socket.recvfrom(UEVENT_BUFFER_SIZE)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                # ENOBUFS: events were dropped while the loop was busy. Go on with the next ones
+                self.log.warning(f'Failed to read USB hotplug events ({e}).')
+                return
+
+            # Only trust the kernel (port ID 0)
+            if sender_pid != 0:
+                continue
+
+            event = parse_uevent(message)
+            if event is None:
+                continue
+
+            self.log.debug(f'USB device {event.action}: {event.vendor_id:04x}:{event.product_id:04x} on {event.bus:03d}/{event.address:03d}.')
+            try:
+                self.callback(event)
+            except Exception:
+                self.log.error('Failed to handle the USB hotplug event.', exc_info=True)
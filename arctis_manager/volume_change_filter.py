@@ -0,0 +1,79 @@
+from typing import Generic, Optional, TypeVar
+
+K = TypeVar('K')
+
+DEFAULT_DEAD_ZONE_PERCENT = 1
+# Time without volume changes after which the last volume suppressed by the dead zone is applied
+SETTLE_SECONDS = 0.3
+
+
+class VolumeChangeFilter(Generic[K]):
+    '''
+    Per-sink change suppression for volume writes.
+    A volume is accepted only when it differs from the last accepted one by more than the dead zone,
+    so repeated reports and dial jitter never reach the audio server. The boundaries (0% and 100%)
+    are always accepted when they differ, otherwise the dead zone could prevent muting or full volume.
+    The last volume suppressed by the dead zone is kept, so that it can be applied once the dial settles (see settle):
+    a slow turn, made of steps within the dead zone, still ends on the right volume.
+    '''
+
+    dead_zone: int
+    suppressed: dict[K, int]
+
+    def __init__(self, dead_zone: int = DEFAULT_DEAD_ZONE_PERCENT):
+        if dead_zone < 0:
+            raise ValueError('The dead zone must be a non-negative percentage')
+
+        self.dead_zone = dead_zone
+        self.suppressed = {}
+
+        self._last_accepted: dict[K, int] = {}
+        self._last_suppressed: dict[K, int] = {}
+
+    def accept(self, key: K, volume: int) -> bool:
+        '''
+        Check the volume against the last accepted one for the key, recording it when accepted.
+        '''
+
+        last = self._last_accepted.get(key, None)
+
+        if last is not None and (
+            volume == last
+            or (abs(volume - last) <= self.dead_zone and volume not in (0, 100))
+        ):
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            if volume == last:
+                self._last_suppressed.pop(key, None)
+            else:
+                self._last_suppressed[key] = volume
+            return False
+
+        self._last_accepted[key] = volume
+        self._last_suppressed.pop(key, None)
+        return True
+
+    def has_suppressed(self) -> bool:
+        return bool(self._last_suppressed)
+
+    def settle(self, key: K) -> Optional[int]:
+        '''
+        Accept the last volume suppressed by the dead zone for the key, if any, returning it (trailing flush).
+        '''
+
+        volume = self._last_suppressed.pop(key, None)
+        if volume is not None:
+            self._last_accepted[key] = volume
+
+        return volume
+
+    def invalidate(self, key: K = None) -> None:
+        '''
+        Forget the last accepted volume for the key (or all of them), e.g. when a write failed or the sinks were recreated.
+        '''
+
+        if key is None:
+            self._last_accepted.clear()
+            self._last_suppressed.clear()
+        else:
+            self._last_accepted.pop(key, None)
+            self._last_suppressed.pop(key, None)
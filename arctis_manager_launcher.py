@@ -1,5 +1,5 @@
 import asyncio
-import os
+import subprocess
 
 from dbus_next import Message, MessageType
 from dbus_next.aio import MessageBus
@@ -19,9 +19,10 @@ async def main():
 
     response = await bus.call(message)
     if response.message_type == MessageType.ERROR:
-        args = ['--app-name="Arctis Manager"', '--urgency=normal', '--expire-time=5000']
-        os.system(f'notify-send {' '.join(args)
-                                 } "Arctis Manager" "Arctis Manager service is not available. Please connect the device first and try opening the app again."')
+        subprocess.run([
+            'notify-send', '--app-name=Arctis Manager', '--urgency=normal', '--expire-time=5000',
+            'Arctis Manager', 'Arctis Manager service is not available. Please connect the device first and try opening the app again.'
+        ])
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+'''
+Input report decoding micro-benchmark, on the Arctis Nova Pro Wireless' reports: the opcode table (ReportDispatcher,
+one dict lookup and a struct layout per report) against the former if/elif chain on the first bytes of the report,
+calling the same handlers. The whole manage_input_data (decoding plus the DeviceState) is measured too.
+'''
+
+import random
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_PATH))
+
+from arctis_manager.device_manager import InterfaceEndpoint  # noqa: E402
+from arctis_manager.devices.device_arctis_nova_pro_wireless import ArctisNovaProWirelessDevice  # noqa: E402
+
+ENDPOINT = InterfaceEndpoint(7, 0)
+REPORT_SIZE = 64
+
+
+def make_reports(count: int, status_ratio: float, seed: int = 0) -> list[memoryview]:
+    '''
+    Volume and ChatMix reports (the dial being turned), with a share of status reports and of unhandled ones.
+    '''
+
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(count):
+        draw = rng.random()
+        if draw < status_ratio:
+            data = [0x06, 0xb0, 1, rng.randint(0, 2), 0, rng.randint(0, 2), rng.randint(0, 8), rng.randint(0, 8),
+                    rng.randint(0, 10), rng.randint(0, 1), rng.randint(0, 2), rng.randint(0, 10), rng.randint(0, 6), 0, 1, 8]
+        elif draw < 0.95:
+            data = [0x07, 0x45, rng.randint(0, 100), rng.randint(0, 100)] if rng.random() < 0.5 else [0x07, 0x25, rng.randint(200, 255)]
+        else:
+            data = [0x06, 0x37, 0x01]
+        reports.append(memoryview(bytes(data + [0] * (REPORT_SIZE - len(data)))))
+
+    return reports
+
+
+def legacy_dispatch(manager: ArctisNovaProWirelessDevice, data: memoryview, endpoint: InterfaceEndpoint):
+    if endpoint == ENDPOINT:
+        if len(data) >= 2 and data[0] == 0x07 and data[1] == 0x25:
+            return manager._on_volume_report()
+        elif len(data) >= 4 and data[0] == 0x07 and data[1] == 0x45:
+            return manager._on_chat_mix_report(data[2], data[3])
+        elif len(data) >= 16 and data[0] == 0x06 and data[1] == 0xb0:
+            return manager._on_status_report(data[2], data[3], data[4], data[5], data[6], data[7], data[8], data[9], data[10], data[11],
+                                             data[12], data[13], data[14], data[15])
+
+    return None
+
+
+def measure(function, reports: list[memoryview], repeat: int) -> float:
+    '''
+    Best time per report over the runs, in microseconds.
+    '''
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for report in reports:
+            function(report, ENDPOINT)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / len(reports) * 1_000_000
+
+
+if __name__ == '__main__':
+    args = ArgumentParser(description='Benchmark the input reports decoding.')
+    args.add_argument('--reports', type=int, default=20000)
+    args.add_argument('--status-ratio', type=float, default=0.1, help='Share of status reports')
+    args.add_argument('--repeat', type=int, default=15, help='Runs per benchmark, the best one is kept')
+    args = args.parse_args()
+
+    manager = ArctisNovaProWirelessDevice()
+    manager.register_report_handlers()
+    reports = make_reports(args.reports, args.status_ratio)
+
+    # Both decoders must agree before being compared
+    for report in reports:
+        assert manager.reports.dispatch(ENDPOINT, report)[1] == legacy_dispatch(manager, report, ENDPOINT)
+
+    dispatch = manager.reports.dispatch
+    decoders = {
+        'opcode table': lambda report, endpoint: dispatch(endpoint, report),
+        'if/elif chain': lambda report, endpoint: legacy_dispatch(manager, report, endpoint),
+    }
+    kinds = {
+        'all': reports,
+        **{f'{report_id:02x}:{opcode:02x}': [report for report in reports if report[0] == report_id and report[1] == opcode]
+           for report_id, opcode in ((0x07, 0x25), (0x07, 0x45), (0x06, 0xb0), (0x06, 0x37))},
+    }
+
+    print(f'{"us per report":>14}' + ''.join(f'{name:>15}' for name in decoders))
+    for kind, kind_reports in kinds.items():
+        print(f'{kind:>14}' + ''.join(f'{measure(decoder, kind_reports, args.repeat):15.2f}' for decoder in decoders.values()))
+
+    elapsed = measure(manager.manage_input_data, reports, args.repeat)
+    print(f'manage_input_data: {elapsed:.2f}us per report, {1_000_000 / elapsed / 1000:.1f}k reports/s')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+'''
+Memory allocated per decoded report, measured with tracemalloc on the Arctis Nova Pro Wireless' reports (see report_dispatch.py):
+the blocks and bytes still allocated by the kept DeviceStates (e.g. the latest statuses held by the tray and the status diff).
+'''
+
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_PATH))
+
+from arctis_manager.devices.device_arctis_nova_pro_wireless import ArctisNovaProWirelessDevice  # noqa: E402
+from report_dispatch import ENDPOINT, make_reports  # noqa: E402
+
+
+def measure(manager: ArctisNovaProWirelessDevice, reports: list) -> tuple[float, float]:
+    '''
+    Decode the reports, keeping the states. Returns the retained blocks and bytes per report.
+    '''
+
+    states = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    for report in reports:
+        states.append(manager.manage_input_data(report, ENDPOINT))
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Only the allocations of the decoding (and the states list), not tracemalloc's own
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    differences = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'filename')
+    blocks = sum(difference.count_diff for difference in differences)
+    size = sum(difference.size_diff for difference in differences)
+
+    return blocks / len(reports), size / len(reports)
+
+
+if __name__ == '__main__':
+    args = ArgumentParser(description='Measure the memory allocated per decoded report.')
+    args.add_argument('--reports', type=int, default=10000)
+    args = args.parse_args()
+
+    manager = ArctisNovaProWirelessDevice()
+    manager.register_report_handlers()
+    # Warm up: the first reports intern the translation keys and fill the caches
+    for report in make_reports(100, 0.5):
+        manager.manage_input_data(report, ENDPOINT)
+
+    print(f'{"per report":>16}{"blocks":>10}{"bytes":>10}')
+    for name, status_ratio in (('status', 1.0), ('volume/ChatMix', 0.0)):
+        reports = [report for report in make_reports(args.reports, status_ratio, seed=1) if report[1] in (0xb0, 0x25, 0x45)]
+        blocks, size = measure(manager, reports)
+        print(f'{name:>16}{blocks:10.1f}{size:10.0f}')
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+'''
+Tray menu updates per second, on Qt's offscreen platform: a Nova Pro Wireless' battery level changes on every status,
+and the menu is updated in place by SystrayApp (TrayMenuModel), or cleared and rebuilt as the former update_menu did
+(every text set again, separators recreated; reading the device's settings on every update, as it also did, is left out).
+Statuses changing no rendered field are measured too.
+'''
+
+import dataclasses
+import logging
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT_PATH = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_PATH))
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtGui import QAction  # noqa: E402
+from PyQt6.QtWidgets import QApplication, QMenu  # noqa: E402
+
+from arctis_manager.device_manager import DeviceStatus  # noqa: E402
+from arctis_manager.device_manager.device_status import DeviceStatusValue  # noqa: E402
+from arctis_manager.devices.device_arctis_nova_pro_wireless import ArctisNovaProWirelessDevice  # noqa: E402
+from arctis_manager.status_diff import diff_statuses  # noqa: E402
+from arctis_manager.systray_app import SystrayApp  # noqa: E402
+from arctis_manager.tray_menu_model import MenuEntry, MenuEntryKind  # noqa: E402
+from report_dispatch import ENDPOINT, make_reports  # noqa: E402
+
+
+def make_statuses(manager: ArctisNovaProWirelessDevice, count: int, field: str) -> list[DeviceStatus]:
+    '''
+    Statuses of the device, only the given field changing from one to the next.
+    '''
+
+    status = next(state.device_status for state in map(lambda report: manager.manage_input_data(report, ENDPOINT), make_reports(100, 1.0))
+                  if state.device_status is not None)
+    value = getattr(status, field)
+
+    return [dataclasses.replace(status, **{field: DeviceStatusValue(index % 9, value.value_translation_key, value.mapped_val)})
+            for index in range(count)]
+
+
+def rebuild_menu(menu: QMenu, actions: dict[str, QAction], entries: list[MenuEntry]) -> None:
+    menu.clear()
+    for entry in entries:
+        if entry.kind != MenuEntryKind.ACTION:
+            menu.addSeparator()
+            continue
+
+        if entry.key not in actions:
+            actions[entry.key] = QAction(entry.text)
+            actions[entry.key].setEnabled(entry.enabled)
+        else:
+            actions[entry.key].setText(entry.text)
+        menu.addAction(actions[entry.key])
+
+
+def benchmark(name: str, update, statuses: list[DeviceStatus]) -> None:
+    previous = None
+    start = time.perf_counter()
+    for status in statuses:
+        update(status, diff_statuses(previous, status))
+        previous = status
+    elapsed = time.perf_counter() - start
+
+    print(f'{name:>24}: {len(statuses) / elapsed:8.0f} updates/s')
+
+
+if __name__ == '__main__':
+    args = ArgumentParser(description='Benchmark the tray menu updates.')
+    args.add_argument('--updates', type=int, default=5000)
+    args = args.parse_args()
+
+    app = QApplication(sys.argv)
+    systray_app = SystrayApp(app, logging.WARNING)
+
+    manager = ArctisNovaProWirelessDevice(logging.WARNING)
+    manager.device = SimpleNamespace(bus=1, address=4)
+    manager.register_report_handlers()
+
+    battery_statuses = make_statuses(manager, args.updates, 'headset_battery_charge')
+    hidden_statuses = make_statuses(manager, args.updates, 'auto_off_time_minutes')
+
+    benchmark('in place', lambda status, changes: systray_app.on_device_status_update(manager, status, changes), battery_statuses)
+    benchmark('in place, hidden field', lambda status, changes: systray_app.on_device_status_update(manager, status, changes), hidden_statuses)
+
+    menu, actions = QMenu(), {}
+    benchmark('rebuild', lambda status, changes: rebuild_menu(menu, actions, systray_app.get_device_menu_entries(manager, status)),
+              battery_statuses)
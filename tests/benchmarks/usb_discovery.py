@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Startup device discovery on a synthetic sysfs tree (see arctis_manager.usb_discovery): compares the single sysfs scan
+and libusb pass with the former per-model lookups (one libusb enumeration per registered model).
+libusb is replaced by an in-memory bus built from the same tree: the times only include the sysfs reads and the
+matching, libusb's own cost (reading the descriptors of every device it goes through) is what the enumeration and visited
+devices counts stand for.
+'''
+
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+
+ROOT_PATH = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT_PATH))
+
+import usb.core  # noqa: E402
+
+from arctis_manager.device_registry import load_registry  # noqa: E402
+from arctis_manager.usb_discovery import find_devices  # noqa: E402
+
+UNSUPPORTED_VENDOR_ID = 0x1d6b
+
+
+class FakeBus:
+    '''
+    Replacement for usb.core.find, counting the enumerations and the devices they go through.
+    '''
+
+    def __init__(self, devices: list[SimpleNamespace]):
+        self.devices = devices
+        self.enumerations = 0
+        self.visited = 0
+
+    def find(self, find_all: bool = False, custom_match=None, **properties):
+        self.enumerations += 1
+        found = []
+        for device in self.devices:
+            self.visited += 1
+            if all(getattr(device, key) == value for key, value in properties.items()) and (custom_match is None or custom_match(device)):
+                found.append(device)
+
+        return found if find_all else next(iter(found), None)
+
+
+def write_sysfs_tree(root: str, device_ids: list[tuple[int, int]]) -> list[SimpleNamespace]:
+    '''
+    Write one sysfs entry per device (and one per interface, without attributes), returning the matching bus devices.
+    '''
+
+    devices = []
+    for index, (vendor_id, product_id) in enumerate(device_ids):
+        bus, address = index // 100 + 1, index % 100 + 2
+        name = f'{bus}-{index % 100 + 1}'
+        os.makedirs(os.path.join(root, name))
+        os.makedirs(os.path.join(root, f'{name}:1.0'))
+        for attribute, value in (('idVendor', f'{vendor_id:04x}'), ('idProduct', f'{product_id:04x}'), ('busnum', bus), ('devnum', address)):
+            with open(os.path.join(root, name, attribute), 'w') as file:
+                file.write(f'{value}\n')
+
+        devices.append(SimpleNamespace(idVendor=vendor_id, idProduct=product_id, bus=bus, address=address))
+
+    return devices
+
+
+def legacy_find_devices(registry: dict) -> list:
+    return [(entry, device) for (vendor_id, product_id), entry in registry.items()
+            for device in usb.core.find(find_all=True, idVendor=vendor_id, idProduct=product_id)]
+
+
+def benchmark(name: str, function, bus: FakeBus, repeat: int) -> None:
+    bus.enumerations = bus.visited = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = function()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    print(f'{name:>8}: {elapsed * 1000:7.3f}ms, {bus.enumerations / repeat:5.1f} libusb enumerations, '
+          f'{bus.visited / repeat:7.1f} devices visited, {len(found)} found')
+
+
+if __name__ == '__main__':
+    args = ArgumentParser(description='Benchmark the startup device discovery on a synthetic sysfs tree.')
+    args.add_argument('--devices', type=int, default=300, help='Number of USB devices in the tree')
+    args.add_argument('--supported', type=int, default=2, help='How many of them are supported devices')
+    args.add_argument('--repeat', type=int, default=50)
+    args = args.parse_args()
+
+    registry = load_registry()
+    supported = list(registry)[:args.supported]
+    device_ids = supported + [(UNSUPPORTED_VENDOR_ID, index) for index in range(args.devices - len(supported))]
+
+    with TemporaryDirectory() as root:
+        bus = FakeBus(write_sysfs_tree(root, device_ids))
+        print(f'{len(bus.devices)} USB devices, {len(supported)} supported, {len(registry)} registered models')
+
+        usb_find = usb.core.find
+        usb.core.find = bus.find
+        try:
+            benchmark('sysfs', lambda: find_devices(registry, sysfs_root=root), bus, args.repeat)
+            benchmark('legacy', lambda: legacy_find_devices(registry), bus, args.repeat)
+        finally:
+            usb.core.find = usb_find
@@ -0,0 +1,149 @@
+import asyncio
+import struct
+from dataclasses import dataclass, field
+from typing import Optional
+
+from arctis_manager.pulse_client import (CHANNEL_COMMAND, CHANNEL_POSITION_NAMES,
+                                         COMMAND_AUTH, COMMAND_ERROR,
+                                         COMMAND_GET_SINK_INFO, COMMAND_REPLY,
+                                         COMMAND_SET_CLIENT_NAME,
+                                         COMMAND_SET_SINK_VOLUME, FRAME_HEADER,
+                                         INVALID_INDEX, TAG_BOOLEAN_FALSE,
+                                         TAG_BOOLEAN_TRUE, TAG_CHANNEL_MAP,
+                                         TAG_FORMAT_INFO, TAG_SAMPLE_SPEC,
+                                         TAG_USEC, TAG_VOLUME, VOLUME_NORM,
+                                         TagStructReader, TagStructWriter)
+
+# Error codes (see pulse/def.h)
+ERROR_COMMAND = 2
+ERROR_NOENTITY = 5
+
+# pipewire-pulse's protocol version
+SERVER_PROTOCOL_VERSION = 35
+SAMPLE_FORMAT_S16LE = 3
+
+
+@dataclass
+class FakeSink:
+    index: int
+    name: str
+    description: str
+    channel_map: tuple[str, ...] = ('front-left', 'front-right')
+    volume: list[int] = field(default_factory=lambda: [VOLUME_NORM, VOLUME_NORM])
+    mute: bool = False
+    properties: dict[str, str] = field(default_factory=dict)
+
+
+def put_sink_info(writer: TagStructWriter, sink: FakeSink, protocol_version: int) -> None:
+    '''
+    Write a sink entry as the audio server does (see sink_fill_tagstruct in pulsecore/protocol-native.c).
+    '''
+
+    usec = TAG_USEC + struct.pack('>Q', 0)
+
+    writer.put_u32(sink.index).put_string(sink.name).put_string(sink.description)
+    writer._buffer += TAG_SAMPLE_SPEC + struct.pack('>BBI', SAMPLE_FORMAT_S16LE, len(sink.channel_map), 48000)
+    writer._buffer += TAG_CHANNEL_MAP + bytes([len(sink.channel_map), *[CHANNEL_POSITION_NAMES.index(p) for p in sink.channel_map]])
+    writer.put_u32(INVALID_INDEX)  # owner module
+    writer.put_cvolume(sink.volume)
+    writer._buffer += TAG_BOOLEAN_TRUE if sink.mute else TAG_BOOLEAN_FALSE
+    writer.put_u32(sink.index + 1000).put_string(f'{sink.name}.monitor')
+    writer._buffer += usec  # latency
+    writer.put_string('fake-driver').put_u32(0)  # driver, flags
+
+    if protocol_version >= 13:
+        writer.put_proplist(sink.properties)
+        writer._buffer += usec  # configured latency
+    if protocol_version >= 15:
+        writer._buffer += TAG_VOLUME + struct.pack('>I', VOLUME_NORM)  # base volume
+        writer.put_u32(0).put_u32(VOLUME_NORM + 1).put_u32(INVALID_INDEX)  # state, volume steps, card
+    if protocol_version >= 16:
+        writer.put_u32(1).put_string('analog-output').put_string('Analog Output').put_u32(100)
+        if protocol_version >= 24:
+            writer.put_u32(0)  # port availability
+        writer.put_string('analog-output')
+    if protocol_version >= 21:
+        writer.put_u8(1)
+        writer._buffer += TAG_FORMAT_INFO
+        writer.put_u8(1).put_proplist({})  # PCM
+
+
+class FakePulseServer:
+    '''
+    Minimal PulseAudio native protocol server on a Unix socket, for tests: answers AUTH, SET_CLIENT_NAME,
+    GET_SINK_INFO and SET_SINK_VOLUME, and replies with an error to any other command.
+    '''
+
+    def __init__(self, socket_path: str, sinks: list[FakeSink]):
+        self.socket_path = socket_path
+        self.sinks = sinks
+
+        self.client_names: list[str] = []
+        '''Commands received, in order'''
+        self.commands: list[int] = []
+
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: list[asyncio.StreamWriter] = []
+
+    def get_sink(self, index: int, name: Optional[str]) -> Optional[FakeSink]:
+        return next((sink for sink in self.sinks if sink.name == name or name is None and sink.index == index), None)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_unix_server(self._handle_client, self.socket_path)
+
+    async def close(self) -> None:
+        '''
+        Stop the server and drop the connected clients.
+        '''
+
+        for writer in self._writers:
+            writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.append(writer)
+        protocol_version = SERVER_PROTOCOL_VERSION
+
+        try:
+            while True:
+                length, channel, _, _, _ = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                payload = TagStructReader(await reader.readexactly(length))
+                if channel != CHANNEL_COMMAND:
+                    continue
+
+                command = payload.get_u32()
+                tag = payload.get_u32()
+                self.commands.append(command)
+
+                reply = TagStructWriter().put_u32(COMMAND_REPLY).put_u32(tag)
+                if command == COMMAND_AUTH:
+                    protocol_version = min(payload.get_u32() & 0xFFFF, SERVER_PROTOCOL_VERSION)
+                    payload.get_arbitrary()  # cookie
+                    reply.put_u32(SERVER_PROTOCOL_VERSION)
+                elif command == COMMAND_SET_CLIENT_NAME:
+                    self.client_names.append(payload.get_proplist().get('application.name'))
+                    reply.put_u32(len(self.client_names))  # client index
+                elif command == COMMAND_GET_SINK_INFO:
+                    sink = self.get_sink(payload.get_u32(), payload.get_string())
+                    if sink is None:
+                        reply = TagStructWriter().put_u32(COMMAND_ERROR).put_u32(tag).put_u32(ERROR_NOENTITY)
+                    else:
+                        put_sink_info(reply, sink, protocol_version)
+                elif command == COMMAND_SET_SINK_VOLUME:
+                    sink = self.get_sink(payload.get_u32(), payload.get_string())
+                    volume = payload.get_cvolume()
+                    if sink is None:
+                        reply = TagStructWriter().put_u32(COMMAND_ERROR).put_u32(tag).put_u32(ERROR_NOENTITY)
+                    else:
+                        sink.volume = list(volume)
+                else:
+                    reply = TagStructWriter().put_u32(COMMAND_ERROR).put_u32(tag).put_u32(ERROR_COMMAND)
+
+                data = reply.to_bytes()
+                writer.write(FRAME_HEADER.pack(len(data), CHANNEL_COMMAND, 0, 0, 0) + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+Import budget of the headless daemon (arctis-manager --daemon-only): the entry point, arctis_manager.py, is run with
+`python -X importtime` in a fresh interpreter, and stops once its arguments are parsed (--help), right before the daemon
+starts. Fails if the GUI toolkit is imported, or if the number of imported modules exceeds the budget.
+The cumulative import time is reported, but only checked against --max-import-time-ms when given: it depends on the
+machine and its load.
+'''
+
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional
+
+ROOT_PATH = Path(__file__).parent.parent
+
+ENTRY_POINT = ROOT_PATH.joinpath('arctis_manager.py')
+# Headless startup, stopping at the arguments parsing
+DAEMON_ARGS = ('--daemon-only', '--help')
+# Modules which are never imported in --daemon-only mode (the prefixes match their submodules)
+FORBIDDEN_MODULES = ('PyQt6', 'qasync', 'arctis_manager.systray_app', 'arctis_manager.settings_window', 'arctis_manager.dbus_manager',
+                     'arctis_manager.tray_menu_model', 'arctis_manager.qt_utils', 'arctis_manager.custom_widgets')
+
+MAX_MODULES = 300
+
+
+def measure_imports(args: tuple[str, ...] = DAEMON_ARGS) -> dict[str, int]:
+    '''
+    Run the entry point in a fresh interpreter, returning the imported modules with their own import time (microseconds).
+    '''
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', str(ENTRY_POINT), *args],
+        cwd=ROOT_PATH, capture_output=True, text=True, check=True,
+    )
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        self_time, _, name = line.removeprefix('import time:').split('|')
+        if not self_time.strip().isdigit():
+            continue
+        imports[name.strip()] = int(self_time)
+
+    return imports
+
+
+def check_import_budget(max_modules: int = MAX_MODULES, max_import_time_ms: Optional[float] = None) -> list[str]:
+    '''
+    Returns the budget violations (empty if the budget is respected). The import time is only checked if a budget is given.
+    '''
+
+    imports = measure_imports()
+    import_time_ms = sum(imports.values()) / 1000
+
+    errors = [f'{name} is imported' for name in imports if any(name == module or name.startswith(f'{module}.') for module in FORBIDDEN_MODULES)]
+    if len(imports) > max_modules:
+        errors.append(f'{len(imports)} modules imported (budget: {max_modules})')
+    if max_import_time_ms is not None and import_time_ms > max_import_time_ms:
+        errors.append(f'{import_time_ms:.1f}ms import time (budget: {max_import_time_ms}ms)')
+
+    return errors
+
+
+if __name__ == '__main__':
+    args = ArgumentParser(description='Check the import budget of the headless daemon.')
+    args.add_argument('--max-modules', type=int, default=MAX_MODULES)
+    args.add_argument('--max-import-time-ms', type=float, default=None, help='fail if the cumulative import time exceeds it (not checked by default)')
+    args = args.parse_args()
+
+    imports = measure_imports()
+    print(f'Headless daemon imports: {len(imports)} modules, {sum(imports.values()) / 1000:.1f}ms')
+    for name, self_time in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f'{self_time / 1000:8.1f}ms  {name}')
+
+    errors = check_import_budget(args.max_modules, args.max_import_time_ms)
+    for error in errors:
+        print(f'Import budget exceeded: {error}')
+
+    sys.exit(1 if errors else 0)
@@ -2,6 +2,15 @@
 
 set -e
 
+echo "Checking the headless daemon's import budget"
+echo
+python3 import_budget.py
+
+echo
+echo "Running the unit tests"
+echo
+(cd .. && python3 -m pytest -q)
+
 for file in *.sh; do
     if [ "$file" != "run_tests.sh" ]; then
         echo "Running ${file}"
@@ -0,0 +1,31 @@
+import sys
+
+from arctis_manager import device_registry
+from arctis_manager.device_registry import DeviceEntry, get_device_modules, load_registry, scan_device_modules
+from arctis_manager.devices._manifest import DEVICES, MODULES
+
+
+def test_manifest_is_up_to_date():
+    # Regenerate it with `python -m arctis_manager.device_registry`
+    assert list(MODULES) == get_device_modules()
+    assert set(DeviceEntry(*device) for device in DEVICES) == set(scan_device_modules())
+
+
+def test_registry_entries_are_loadable():
+    for entry in load_registry().values():
+        device_class = entry.load()
+        assert device_class.get_device_vendor_id(None) == entry.vendor_id
+        assert device_class.get_device_product_id(None) == entry.product_id
+        assert device_class.get_device_name(None) == entry.name
+
+
+def test_frozen_build_trusts_the_manifest(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('The device modules must not be looked up in a frozen build')
+
+    monkeypatch.setattr(sys, 'frozen', True, raising=False)
+    monkeypatch.setattr(device_registry, 'get_device_modules', fail)
+    monkeypatch.setattr(device_registry, 'is_manifest_stale', fail)
+    monkeypatch.setattr(device_registry, 'scan_device_modules', fail)
+
+    assert set(load_registry().values()) == set(DeviceEntry(*device) for device in DEVICES)
@@ -0,0 +1,55 @@
+import array
+import asyncio
+
+from arctis_manager.device_manager.device_transport import UsbTransport
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+ENDPOINT = InterfaceEndpoint(0, 0)
+
+
+class FakeDevice:
+    '''
+    pyusb device whose interrupt reads return the given reports, in turn.
+    '''
+
+    def __init__(self, reports: list[bytes]):
+        self.reports = reports
+
+    def read(self, address: int, buffer: array.array) -> int:
+        report = self.reports.pop(0)
+        buffer[:len(report)] = array.array('B', report)
+
+        return len(report)
+
+
+class FakeEndpointIndex:
+    def get_address(self, interface_endpoint: InterfaceEndpoint) -> int:
+        return 0x81
+
+
+def test_read():
+    transport = UsbTransport(FakeDevice([b'\x07\x45\x64\x00']), FakeEndpointIndex())
+
+    report = asyncio.run(transport.read(ENDPOINT))
+
+    assert bytes(report) == b'\x07\x45\x64\x00'
+    assert report.readonly
+    assert transport.buffers.acquired == transport.buffers.released == 1
+
+
+def test_read_with_exhausted_ring():
+    transport = UsbTransport(FakeDevice([b'\x06\xb0\x01', b'\x07\x25\xf0']), FakeEndpointIndex())
+    # Reports still in use: no buffer of the ring can be reused
+    for _ in range(len(transport.buffers) - transport.buffers.retained):
+        transport.buffers.acquire()
+    ring = [bytes(transport.buffers.buffer(index)) for index in range(len(transport.buffers))]
+
+    first = asyncio.run(transport.read(ENDPOINT))
+    second = asyncio.run(transport.read(ENDPOINT))
+
+    assert bytes(first) == b'\x06\xb0\x01'
+    assert bytes(second) == b'\x07\x25\xf0'
+    assert first.readonly
+    assert transport.buffers.overflows == 2
+    # The reports in use were not overwritten
+    assert [bytes(transport.buffers.buffer(index)) for index in range(len(transport.buffers))] == ring
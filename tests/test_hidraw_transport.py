@@ -0,0 +1,53 @@
+import asyncio
+import fcntl
+import os
+from types import SimpleNamespace
+
+from arctis_manager.device_manager import hidraw_transport
+from arctis_manager.device_manager.hidraw_transport import HidrawTransport
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+
+class FakeEndpointIndex:
+    def get_interface_number(self, interface_index: int) -> int:
+        return interface_index
+
+
+def test_only_listened_interfaces_are_read(tmp_path, monkeypatch):
+    # FIFOs stand for the hidraw nodes: the test keeps their other end open
+    nodes = [str(tmp_path / f'hidraw{interface_num}') for interface_num in range(2)]
+    for node in nodes:
+        os.mkfifo(node)
+    device_ends = [os.open(node, os.O_RDONLY | os.O_NONBLOCK) for node in nodes]
+    monkeypatch.setattr(hidraw_transport, 'find_hidraw_node', lambda bus, address, interface_num: nodes[interface_num])
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        transport = HidrawTransport(SimpleNamespace(bus=1, address=2), FakeEndpointIndex())
+        transport.open([0, 1], [InterfaceEndpoint(0, 0)])
+        fds = dict(transport._fds)
+
+        try:
+            assert fcntl.fcntl(fds[0], fcntl.F_GETFL) & os.O_ACCMODE == os.O_RDWR
+            assert fcntl.fcntl(fds[1], fcntl.F_GETFL) & os.O_ACCMODE == os.O_WRONLY
+            assert list(transport._queues) == [0]
+
+            # The listened interface's reports are read
+            writer = os.open(nodes[0], os.O_WRONLY | os.O_NONBLOCK)
+            os.write(writer, b'\x07\x45\x64\x00')
+            assert bytes(await asyncio.wait_for(transport.read(InterfaceEndpoint(0, 0)), 1)) == b'\x07\x45\x64\x00'
+            os.close(writer)
+
+            # Commands are still written to the other interface
+            transport.write(InterfaceEndpoint(1, 0), [0x06, 0xb0])
+            assert os.read(device_ends[1], 64) == b'\x06\xb0'
+
+            assert not loop.remove_reader(fds[1])
+        finally:
+            transport.close()
+
+    try:
+        asyncio.run(main())
+    finally:
+        for fd in device_ends:
+            os.close(fd)
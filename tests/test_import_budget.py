@@ -0,0 +1,5 @@
+from import_budget import check_import_budget
+
+
+def test_headless_daemon_import_budget():
+    assert check_import_budget() == []
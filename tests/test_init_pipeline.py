@@ -0,0 +1,59 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from arctis_manager.device_manager.init_pipeline import InitCommand, InitPipeline, ResponseWaiters
+from arctis_manager.device_manager.interface_endpoint import InterfaceEndpoint
+
+ENDPOINT = InterfaceEndpoint(7, 0)
+RESPONSE_TIMEOUT = 0.2
+
+
+class FakeScheduler:
+    '''
+    Command scheduler writing the commands immediately, the device answering the given queries.
+    '''
+
+    def __init__(self, responses: ResponseWaiters, answered: set[int]):
+        self.responses = responses
+        self.answered = answered
+        self.sent = []
+
+    def send(self, endpoint: InterfaceEndpoint, data: list[int], priority) -> asyncio.Future:
+        self.sent.append(list(data))
+        if data[1] in self.answered:
+            asyncio.get_running_loop().call_soon(self.responses.resolve, data)
+
+        written = asyncio.get_running_loop().create_future()
+        written.set_result(time.monotonic())
+
+        return written
+
+
+def run(commands: list[InitCommand], answered: set[int]) -> tuple[list, FakeScheduler, float]:
+    responses = ResponseWaiters()
+    scheduler = FakeScheduler(responses, answered)
+    pipeline = InitPipeline(SimpleNamespace(commands=scheduler, responses=responses), ENDPOINT, response_timeout=RESPONSE_TIMEOUT)
+
+    start = time.monotonic()
+    results = asyncio.run(pipeline.run(commands))
+
+    return results, scheduler, time.monotonic() - start
+
+
+def test_responses():
+    results, scheduler, _ = run([InitCommand([0x06, 0x20], expects_response=True), InitCommand([0x06, 0x3b]),
+                                 InitCommand([0x06, 0xb0], expects_response=True)], {0x20, 0xb0})
+
+    assert results == [b'\x06\x20', None, b'\x06\xb0']
+    assert scheduler.sent == [[0x06, 0x20], [0x06, 0x3b], [0x06, 0xb0]]
+
+
+def test_silent_device_fails_fast():
+    commands = [InitCommand([0x06, 0x20], expects_response=True) for _ in range(10)] + [InitCommand([0x06, 0xb0], expects_response=True)]
+    results, scheduler, elapsed = run(commands, {0xb0})
+
+    # A single timeout: the remaining queries are still sent, without waiting for their response
+    assert elapsed < 2 * RESPONSE_TIMEOUT
+    assert len(scheduler.sent) == len(commands)
+    assert results == [None] * len(commands)
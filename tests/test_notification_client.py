@@ -0,0 +1,127 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+from dbus_next.aio import MessageBus
+from dbus_next.service import ServiceInterface, method
+
+from arctis_manager import dbus_session
+from arctis_manager.notification_client import APP_NAME, NotificationClient
+
+
+class FakeNotificationsInterface(ServiceInterface):
+    '''
+    org.freedesktop.Notifications server, recording the notifications received.
+    '''
+
+    def __init__(self):
+        super().__init__('org.freedesktop.Notifications')
+
+        self.notifications: list[tuple[str, int, str, str, int]] = []
+
+    @method('Notify')
+    def notify(self, app_name: 's', replaces_id: 'u', app_icon: 's', summary: 's', body: 's',
+               actions: 'as', hints: 'a{sv}', expire_timeout: 'i') -> 'u':
+        self.notifications.append((app_name, replaces_id, summary, body, hints['urgency'].value))
+
+        return replaces_id or len(self.notifications)
+
+
+@pytest.fixture
+def session_bus_address(monkeypatch):
+    '''
+    Private session bus, used by the application's session bus connection.
+    '''
+
+    if shutil.which('dbus-daemon') is None:
+        pytest.skip('dbus-daemon is not available')
+
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address'], stdout=subprocess.PIPE, text=True)
+    try:
+        address = daemon.stdout.readline().strip()
+        monkeypatch.setenv('DBUS_SESSION_BUS_ADDRESS', address)
+        # Every test runs its own event loop: the connection is not shared across tests
+        monkeypatch.setattr(dbus_session, '_session_bus', None)
+        monkeypatch.setattr(dbus_session, '_session_bus_lock', None)
+
+        yield address
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        daemon.stdout.close()
+
+
+def run_with_notifications_server(test, address: str):
+    '''
+    Run the test coroutine with a fake notifications server on the bus, and a new client.
+    '''
+
+    async def main():
+        server_bus = await MessageBus(bus_address=address).connect()
+        interface = FakeNotificationsInterface()
+        server_bus.export('/org/freedesktop/Notifications', interface)
+        await server_bus.request_name('org.freedesktop.Notifications')
+
+        try:
+            await test(interface, NotificationClient())
+        finally:
+            server_bus.disconnect()
+            (await dbus_session.get_session_bus()).disconnect()
+
+    asyncio.run(main())
+
+
+def test_notify(session_bus_address):
+    async def test(server: FakeNotificationsInterface, client: NotificationClient):
+        assert client.notify('Headset', 'Connected', urgency='low')
+        await client.drain()
+
+        assert server.notifications == [(APP_NAME, 0, 'Headset', 'Connected', 0)]
+        assert client.sent == 1
+
+    run_with_notifications_server(test, session_bus_address)
+
+
+def test_notifications_are_replaced_in_place(session_bus_address):
+    async def test(server: FakeNotificationsInterface, client: NotificationClient):
+        client.notify('Battery', '50%', category='battery')
+        await client.drain()
+        client.notify('Battery', '40%', category='battery')
+        client.notify('Error', 'Device lost', urgency='critical')
+        await client.drain()
+
+        assert server.notifications == [
+            (APP_NAME, 0, 'Battery', '50%', 1),
+            (APP_NAME, 1, 'Battery', '40%', 1),
+            (APP_NAME, 0, 'Error', 'Device lost', 2),
+        ]
+
+    run_with_notifications_server(test, session_bus_address)
+
+
+def test_notification_bursts_are_coalesced(session_bus_address):
+    async def test(server: FakeNotificationsInterface, client: NotificationClient):
+        client.notify('Battery', '50%', category='battery')
+        await asyncio.sleep(0.2)
+        # Within the rate limit: only the latest one is sent
+        for percentage in (40, 30, 20):
+            client.notify('Battery', f'{percentage}%', category='battery')
+        await client.drain()
+
+        assert [notification[3] for notification in server.notifications] == ['50%', '20%']
+        assert client.coalesced == 2
+
+    run_with_notifications_server(test, session_bus_address)
+
+
+def test_notification_without_server(session_bus_address):
+    async def main():
+        client = NotificationClient()
+        client.notify('Headset', 'Connected')
+        await client.drain()
+
+        assert client.sent == 0
+        (await dbus_session.get_session_bus()).disconnect()
+
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+import asyncio
+
+from arctis_manager.device_manager.init_pipeline import InitCommand
+from arctis_manager.devices import device_arctis_nova_pro_wireless
+from arctis_manager.devices.device_arctis_nova_pro_wireless import ArctisNovaProWirelessDevice
+
+LOCAL_SETTINGS = {
+    'wireless_mode': 0x00,
+    'mic_volume': 0x0a,
+    'mic_side_tone': 0x00,
+    'mic_gain': 0x02,
+    'mic_led_brightness': 0x0a,
+    'pm_shutdown': 0x05,
+}
+
+
+class FakePipeline:
+    '''
+    Records the commands sent, answering the status request with the given report.
+    '''
+
+    sent: list[list[int]] = []
+
+    def __init__(self, status: bytes):
+        self.status = status
+
+    def __call__(self, device_manager, endpoint, log_level=None):
+        return self
+
+    async def run(self, commands: list[InitCommand]) -> list:
+        FakePipeline.sent.extend(list(command.data[:3]) for command in commands)
+
+        return [self.status if command.expects_response else None for command in commands]
+
+
+def make_status(mic_led_brightness: int, pm_shutdown: int, wireless_mode: int) -> bytes:
+    return bytes([0x06, 0xb0, 0, 0, 0, 0, 8, 8, 0, 0, 0, mic_led_brightness, pm_shutdown, wireless_mode, 0, 0] + [0] * 48)
+
+
+def init_device(monkeypatch, applied_settings: dict, status: bytes) -> list[list[int]]:
+    FakePipeline.sent = []
+    monkeypatch.setattr(device_arctis_nova_pro_wireless, 'InitPipeline', FakePipeline(status))
+
+    manager = ArctisNovaProWirelessDevice()
+    manager.register_report_handlers()
+    monkeypatch.setattr(manager, 'get_local_settings', lambda: LOCAL_SETTINGS)
+    monkeypatch.setattr(manager, 'get_applied_settings', lambda: applied_settings)
+    monkeypatch.setattr(manager, 'save_applied_settings', lambda: None)
+
+    asyncio.run(manager.init_device())
+
+    return FakePipeline.sent
+
+
+def test_only_changed_settings_are_sent(monkeypatch):
+    # The wireless mode changed on the device, the mic volume since it was last applied
+    sent = init_device(monkeypatch, {**LOCAL_SETTINGS, 'mic_volume': 0x05}, make_status(0x0a, 0x05, 0x01))
+
+    assert sent == [[0x06, 0xb0, 0x00], [0x06, 0xc3, 0x00], [0x06, 0x37, 0x0a]]
+
+
+def test_full_init_without_applied_settings(monkeypatch):
+    sent = init_device(monkeypatch, None, make_status(0x0a, 0x05, 0x00))
+
+    assert [0x06, 0x33, 0x14] in sent
+    assert len(sent) > 30
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from arctis_manager.pulse_client import (COMMAND_AUTH, COMMAND_GET_SINK_INFO,
+                                         COMMAND_SET_CLIENT_NAME,
+                                         COMMAND_SET_SINK_VOLUME,
+                                         PROTOCOL_VERSION, VOLUME_NORM,
+                                         PulseClient, PulseError,
+                                         TagStructReader, TagStructWriter)
+from fake_pulse_server import ERROR_COMMAND, ERROR_NOENTITY, FakePulseServer, FakeSink
+
+
+def make_sinks() -> list[FakeSink]:
+    return [
+        FakeSink(1, 'alsa_output.usb-SteelSeries_Arctis', 'Arctis Nova Pro Wireless', properties={
+            'device.vendor.id': '0x1038', 'device.product.id': '0x12e0', 'device.bus-path': 'pci-0000:00:14.0-usb-0:2:1.0',
+        }),
+        FakeSink(2, 'Arctis_Game', 'Arctis Game', volume=[VOLUME_NORM // 2] * 2),
+    ]
+
+
+def run_with_server(test, sinks: list[FakeSink] = None):
+    '''
+    Run the test coroutine with a fake audio server and a client connected to it.
+    '''
+
+    async def main(socket_path: str):
+        server = FakePulseServer(socket_path, sinks if sinks is not None else make_sinks())
+        await server.start()
+        client = PulseClient(client_name='Arctis Manager tests', socket_path=socket_path)
+        try:
+            await client.connect()
+            await test(server, client)
+        finally:
+            await client.close()
+            await server.close()
+
+    return main
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / 'native')
+
+
+def test_tagstruct_round_trip():
+    data = TagStructWriter().put_u32(0xdeadbeef).put_u8(7).put_string('Arctis').put_string(None) \
+        .put_arbitrary(b'\x00\x01').put_cvolume([VOLUME_NORM, 0]).put_proplist({'application.name': 'Arctis Manager'}).to_bytes()
+
+    reader = TagStructReader(data)
+    assert reader.get_u32() == 0xdeadbeef
+    assert reader.get_u8() == 7
+    assert reader.get_string() == 'Arctis'
+    assert reader.get_string() is None
+    assert reader.get_arbitrary() == b'\x00\x01'
+    assert reader.get_cvolume() == (VOLUME_NORM, 0)
+    assert reader.get_proplist() == {'application.name': 'Arctis Manager'}
+    assert reader.eof()
+
+
+def test_tagstruct_unexpected_tag():
+    with pytest.raises(PulseError):
+        TagStructReader(TagStructWriter().put_string('x').to_bytes()).get_u32()
+
+
+def test_connect(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        assert client.connected
+        assert client.protocol_version == PROTOCOL_VERSION
+        assert server.commands == [COMMAND_AUTH, COMMAND_SET_CLIENT_NAME]
+        assert server.client_names == ['Arctis Manager tests']
+
+    asyncio.run(run_with_server(test)(socket_path))
+
+
+def test_get_sink_info(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        sink = await client.get_sink_info(1)
+        assert sink.name == 'alsa_output.usb-SteelSeries_Arctis'
+        assert sink.description == 'Arctis Nova Pro Wireless'
+        assert sink.channel_map == ('front-left', 'front-right')
+        assert sink.get_volume_percentages() == (100, 100)
+        assert not sink.mute
+        assert sink.properties['device.bus-path'] == 'pci-0000:00:14.0-usb-0:2:1.0'
+
+        assert (await client.get_sink_info(2)).get_volume_percentages() == (50, 50)
+
+    asyncio.run(run_with_server(test)(socket_path))
+
+
+def test_get_missing_sink_info(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        with pytest.raises(PulseError) as error:
+            await client.get_sink_info(42)
+        assert error.value.code == ERROR_NOENTITY
+        # The connection is still usable
+        assert (await client.get_sink_info(1)).index == 1
+
+    asyncio.run(run_with_server(test)(socket_path))
+
+
+def test_set_sink_volume(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        await client.set_sink_volume('Arctis_Game', 75)
+        await client.set_sink_volume('Arctis_Game', 20, channels=1)
+
+        assert server.commands.count(COMMAND_SET_SINK_VOLUME) == 2
+        assert server.get_sink(0, 'Arctis_Game').volume == [round(20 * VOLUME_NORM / 100)]
+
+        with pytest.raises(PulseError) as error:
+            await client.set_sink_volume('Arctis_Chat', 50)
+        assert error.value.code == ERROR_NOENTITY
+
+    asyncio.run(run_with_server(test)(socket_path))
+
+
+def test_unsupported_command(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        with pytest.raises(PulseError) as error:
+            await client.get_sink_info_list()
+        assert error.value.code == ERROR_COMMAND
+
+    asyncio.run(run_with_server(test)(socket_path))
+
+
+def test_requests_fail_on_connection_loss(socket_path):
+    async def test(server: FakePulseServer, client: PulseClient):
+        await server.close()
+        # The request fails (the write or the reconnection fails) instead of waiting for a reply
+        with pytest.raises((PulseError, OSError)):
+            await asyncio.wait_for(client.get_sink_info(1), 1)
+        assert COMMAND_GET_SINK_INFO not in server.commands
+
+    asyncio.run(run_with_server(test)(socket_path))
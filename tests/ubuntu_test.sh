@@ -49,7 +49,7 @@ docker run --rm \
         sudo apt install -y /debs/arctis-manager-'"${software_version}"'-'"${software_release}"'.deb \
         && export LANG=en_US.UTF-8 \
         && env \
-        && arctis-manager --verbose --daemon-only; \
+        && arctis-manager --verbose --daemon-only --no-hotplug; \
         exit_code=$?; \
         kill $xvfb_pid; \
         exit $exit_code